@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+# Caché de procesado activa por defecto; ETL_CACHE=0 (o --no-cache) la desactiva
+CACHE_ENABLED = os.getenv("ETL_CACHE", "1").strip() != "0"
+
+# Se incrementa a mano si cambia el formato de las entradas de la caché
+_FORMAT = 1
+_HASH_BLOCK = 1 << 20
+# Perfil de datos de cada fichero (estadística "perfil"), aparte del índice
+_PROFILE = "profile.json"
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(_HASH_BLOCK):
+            h.update(block)
+    return h.hexdigest()
+
+
+def code_version(sources: list[Path], config: dict) -> str:
+    """
+    Huella del código y la configuración que determinan la salida de un fichero:
+    contenido de los módulos fuente y valores de configuración (los secretos, como
+    la sal de las tarjetas, solo entran hasheados).
+    """
+    h = hashlib.sha256(f"formato={_FORMAT}".encode("utf-8"))
+    for src in sorted(Path(s) for s in sources):
+        h.update(src.name.encode("utf-8"))
+        h.update(Path(src).read_bytes())
+    h.update(json.dumps(config, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _stat(path: Path) -> dict:
+    st = path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+class ProcessingCache:
+    """
+    Caché persistente del procesado por fichero (lectura + limpieza + validación).
+
+    Cada entrada guarda la huella del fichero raw (ruta, tamaño, mtime y SHA-256),
+    la versión de código/configuración, las estadísticas del procesado y la huella
+    del cleaned generado. Las filas rechazadas de cada fichero se guardan aparte
+    en `<cache_dir>/<stem>/` con el mismo formato que errors/, igual que su perfil
+    de datos si lo tiene (así el índice no crece con los sketches).
+    """
+
+    def __init__(self, cache_dir: Path, version: str):
+        self.dir = Path(cache_dir)
+        self.version = version
+        self._index_path = self.dir / "index.json"
+        try:
+            self._entries = json.loads(self._index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def parts_dir(self, file: Path) -> Path:
+        return self.dir / Path(file).stem
+
+    def lookup(self, file: Path, output: Path):
+        """
+        Devuelve las estadísticas guardadas si `file` no ha cambiado desde que se
+        generó `output` con la misma versión, o None si hay que procesarlo.
+        El SHA-256 solo se calcula si cambian tamaño o mtime.
+        """
+        file, output = Path(file), Path(output)
+        entry = self._entries.get(str(file.resolve()))
+        if not entry or entry.get("version") != self.version:
+            return None
+        if not output.exists() or _stat(output) != entry["output"]:
+            return None
+
+        raw = _stat(file)
+        if raw != entry["raw"]:
+            if raw["size"] != entry["raw"]["size"] or file_sha256(file) != entry["sha256"]:
+                return None
+            # Mismo contenido con otro mtime (copiado o tocado): se actualiza la huella
+            entry["raw"] = raw
+            self._save()
+
+        profile = self.parts_dir(file) / _PROFILE
+        if profile.exists():
+            return {**entry["stats"], "perfil": json.loads(profile.read_text(encoding="utf-8"))}
+        return entry["stats"]
+
+    def begin(self, file: Path) -> dict:
+        """
+        Se llama antes de procesar `file`: borra su entrada (si el proceso falla no
+        queda una entrada vieja válida), vacía su directorio de rechazadas y devuelve
+        la huella del raw tomada antes de leerlo.
+        """
+        file = Path(file)
+        if self._entries.pop(str(file.resolve()), None) is not None:
+            self._save()
+        parts = self.parts_dir(file)
+        shutil.rmtree(parts, ignore_errors=True)
+        parts.mkdir(parents=True, exist_ok=True)
+        return {"raw": _stat(file), "sha256": file_sha256(file)}
+
+    def store(self, file: Path, fingerprint: dict, output: Path, stats: dict):
+        stats = dict(stats)
+        profile = stats.pop("perfil", None)
+        if profile is not None:
+            (self.parts_dir(file) / _PROFILE).write_text(json.dumps(profile), encoding="utf-8")
+        self._entries[str(Path(file).resolve())] = {
+            "version": self.version,
+            **fingerprint,
+            "output": _stat(Path(output)),
+            "stats": stats,
+        }
+        self._save()
+
+    def _save(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp = self._index_path.with_name(self._index_path.name + ".part")
+        tmp.write_text(json.dumps(self._entries, indent=2, sort_keys=True), encoding="utf-8")
+        tmp.replace(self._index_path)
+
+
+def stat_fingerprint(paths: list[Path], config: dict) -> str:
+    """
+    Huella barata de un conjunto de ficheros (ruta, tamaño y mtime, sin leerlos)
+    y de la configuración. Un fichero que no existe cuenta como tal.
+    """
+    h = hashlib.sha256(f"formato={_FORMAT}".encode("utf-8"))
+    for path in sorted(str(Path(p).resolve()) for p in paths):
+        try:
+            sig = _stat(Path(path))
+        except OSError:
+            sig = None
+        h.update(json.dumps([path, sig]).encode("utf-8"))
+    h.update(json.dumps(config, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+class LastRun:
+    """
+    Marca de la última ejecución completa (procesado y carga sin fallos) con la
+    huella de entradas, salidas, código y opciones. Si al arrancar la huella es la
+    misma, no hay nada que hacer. Se borra al empezar una ejecución, así una
+    ejecución a medias nunca deja una marca válida. Puede guardar además datos de
+    esa ejecución que se quieran repetir en el informe (p. ej. el perfil de datos).
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def _read(self) -> dict:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def matches(self, fingerprint: str) -> bool:
+        return self._read().get("fingerprint") == fingerprint
+
+    def get(self, key: str):
+        return self._read().get(key)
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+
+    def save(self, fingerprint: str, **data):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".part")
+        tmp.write_text(json.dumps({"fingerprint": fingerprint, **data}, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self.path)
@@ -1,7 +1,13 @@
+import numpy as np
 import pandas as pd
 import re
 import unicodedata
 
+from etl.schema import CLIENTES, compact
+from etl.settings import CLEAN_ENGINE, ENGINES
+from etl.vector_utils import ASCII_SPACE, RX_NON_ASCII, map_unique
+
+
 def _normalize_text(value):
     if pd.isna(value) or value is None:
         return None
@@ -41,9 +47,7 @@ def _mask_dni(dni: str) -> str | None:
         return "*" * (len(s) - 3) + s[-3:]
     return "***"
 
-def clean_dataframe_clientes(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-
+def _clean_dataframe_clientes_python(df: pd.DataFrame) -> pd.DataFrame:
     # 1) Normalización genérica en todo
     for col in df.columns:
         df[col] = df[col].apply(_normalize_text)
@@ -63,4 +67,85 @@ def clean_dataframe_clientes(df: pd.DataFrame) -> pd.DataFrame:
     if "telefono" in df.columns:
         df["telefono"] = df["telefono"].apply(_clean_phone)
 
-    return df
\ No newline at end of file
+    return df
+
+
+_RX_TITLE_AFTER_HYPHEN = re.compile(r"(?<=-)[a-z]")
+
+
+def _empty_to_none(s: pd.Series) -> pd.Series:
+    s = s.astype(object)
+    return s.where(s != "", None)
+
+
+def _normalize_text_vec(u: pd.Series) -> pd.Series:
+    # Equivale a _normalize_text: NFKD + solo ASCII + espacios colapsados.
+    # NFKD no cambia texto ASCII, así que solo se normaliza lo que no lo es.
+    non_ascii = u.str.contains(RX_NON_ASCII, regex=True).to_numpy(dtype=bool)
+    if non_ascii.any():
+        values = u.to_numpy(dtype=object)
+        values[non_ascii] = [unicodedata.normalize("NFKD", v) for v in values[non_ascii]]
+        u = pd.Series(values, index=u.index).astype(u.dtype).str.replace(RX_NON_ASCII, "", regex=True)
+    return u.str.replace(f"[{ASCII_SPACE}]+", " ", regex=True).str.strip(" ")
+
+
+def _title_name_vec(u: pd.Series) -> pd.Series:
+    # Tras _normalize_text_vec el texto es ASCII: mayúscula inicial y tras cada guion
+    u = u.str[:1].str.upper() + u.str[1:].str.lower()
+    hyphen = u.str.contains("-", regex=False)
+    if hyphen.any():
+        u = u.astype(object)
+        u[hyphen] = u[hyphen].str.replace(_RX_TITLE_AFTER_HYPHEN, lambda m: m.group(0).upper(), regex=True)
+    return u
+
+
+def _clean_dni_vec(u: pd.Series) -> pd.Series:
+    return _empty_to_none(u.str.replace(f"[{ASCII_SPACE}\\-.]", "", regex=True).str.upper())
+
+
+def _mask_dni_vec(u: pd.Series) -> pd.Series:
+    # Hay pocas longitudes distintas de DNI: se enmascara por grupos de longitud
+    n = u.str.len().to_numpy(dtype=int)
+    last3 = u.str[-3:].astype(object)
+    out = pd.Series("***", index=u.index, dtype=object)
+    for length in np.unique(n[n >= 3]):
+        sel = n == length
+        out[sel] = "*" * (length - 3) + last3[sel]
+    return out.where(n > 0, None)
+
+
+def _clean_phone_vec(u: pd.Series) -> pd.Series:
+    return _empty_to_none(u.str.replace(r"[^0-9]", "", regex=True))
+
+
+def _clean_dataframe_clientes_vectorized(df: pd.DataFrame) -> pd.DataFrame:
+    # Cada columna se limpia sobre sus valores distintos (map_unique) con operaciones .str
+    rules = {
+        "correo": lambda u: _normalize_text_vec(u).str.lower(),
+        "nombre": lambda u: _title_name_vec(_normalize_text_vec(u)),
+        "apellido1": lambda u: _title_name_vec(_normalize_text_vec(u)),
+        "apellido2": lambda u: _title_name_vec(_normalize_text_vec(u)),
+        "dni": lambda u: _clean_dni_vec(_normalize_text_vec(u)),
+        "telefono": lambda u: _clean_phone_vec(_normalize_text_vec(u)),
+    }
+
+    for col in df.columns:
+        df[col] = map_unique(df[col], rules.get(col, _normalize_text_vec))
+
+    if "dni" in df.columns:
+        df["dni_masked"] = map_unique(df["dni"], _mask_dni_vec)  # <- enmascarado
+
+    return df
+
+
+def clean_dataframe_clientes(df: pd.DataFrame, engine: str | None = None) -> pd.DataFrame:
+    engine = engine or CLEAN_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Motor de limpieza desconocido: {engine!r} (opciones: {ENGINES})")
+
+    df = df.copy()
+    if engine == "vectorized":
+        df = _clean_dataframe_clientes_vectorized(df)
+    else:
+        df = _clean_dataframe_clientes_python(df)
+    return compact(df, CLIENTES)
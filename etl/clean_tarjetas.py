@@ -1,9 +1,13 @@
+import numpy as np
 import pandas as pd
 import re
 import hashlib
-import os
 
-SALT = os.getenv("CARD_SALT", "etl_grupo_salt")
+from etl.settings import CARD_SALT, CLEAN_ENGINE, ENGINES
+from etl.schema import TARJETAS, compact
+from etl.vector_utils import map_unique
+
+SALT = CARD_SALT
 
 """Limpieza de datos de tarjetas en un DataFrame de pandas. Normaliza números de tarjeta, enmascara y hashea."""
 def normalize_card(card: str) -> str | None:
@@ -24,19 +28,47 @@ def hash_card(card_digits: str) -> str | None:
         return None
     return hashlib.sha256((SALT + card_digits).encode("utf-8")).hexdigest()
 
+
+"""Hashea un lote de tarjetas calculando cada número distinto una sola vez (mismo resultado que hash_card)."""
+def hash_cards(cards) -> list[str | None]:
+    codes, uniques = pd.factorize(pd.Series(list(cards), dtype=object), use_na_sentinel=True)
+    hashes = np.array([hash_card(v) for v in uniques] + [None], dtype=object)
+    return hashes[codes].tolist()
+
+
+def _normalize_card_vec(u: pd.Series) -> pd.Series:
+    digits = u.str.replace(r"[^0-9]", "", regex=True).astype(object)
+    return digits.where(digits != "", None)
+
+
+def _mask_card_vec(u: pd.Series) -> pd.Series:
+    masked = ("XXXX-XXXX-XXXX-" + u.str[-4:]).astype(object)
+    return masked.where(u.str.len() >= 4, None)
+
+
 """Aplica la limpieza a un DataFrame de tarjetas."""
-def clean_tarjetas(df: pd.DataFrame) -> pd.DataFrame:
+def clean_tarjetas(df: pd.DataFrame, engine: str | None = None) -> pd.DataFrame:
+    engine = engine or CLEAN_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Motor de limpieza desconocido: {engine!r} (opciones: {ENGINES})")
+
     df = df.copy()
     df.columns = [c.strip().lower() for c in df.columns]
 
     df["cod_cliente"] = df["cod_cliente"].astype(str).str.strip()
     df["fecha_exp"] = df["fecha_exp"].astype(str).str.strip()
 
-    df["card_clean"] = df["numero_tarjeta"].apply(normalize_card)
-    df["numero_tarjeta_masked"] = df["card_clean"].apply(mask_card)
-    df["numero_tarjeta_hash"] = df["card_clean"].apply(hash_card)
+    if engine == "vectorized":
+        df["card_clean"] = map_unique(df["numero_tarjeta"], _normalize_card_vec)
+        df["numero_tarjeta_masked"] = map_unique(df["card_clean"], _mask_card_vec)
+    else:
+        df["card_clean"] = df["numero_tarjeta"].apply(normalize_card)
+        df["numero_tarjeta_masked"] = df["card_clean"].apply(mask_card)
+
+    # SHA-256 no es vectorizable: los dos motores lo calculan una vez por tarjeta distinta
+    df["numero_tarjeta_hash"] = hash_cards(df["card_clean"])
 
     # Eliminar sensibles (CVV nunca se guarda)
     df.drop(columns=["numero_tarjeta", "cvv"], inplace=True, errors="ignore")
 
-    return df
\ No newline at end of file
+    return compact(df, TARJETAS)
@@ -0,0 +1,90 @@
+import os
+from pathlib import Path
+
+import psycopg2
+
+# Conexión a PostgreSQL (parámetros de .env y variables PG*) y estado de la BD tras
+# una carga. No importa pandas: run_pipeline.py lo usa para decidir si hay que
+# volver a cargar antes de importar el resto del pipeline.
+
+
+def _clean_env(v: str | None, default: str = "") -> str:
+    if v is None:
+        v = default
+    return v.strip().strip('"').strip("'")
+
+
+_DOTENV = Path(__file__).resolve().parents[1] / ".env"
+_dotenv_signature = None
+
+
+def _load_dotenv():
+    # Carga variables de entorno desde .env en el directorio padre del proyecto. Solo
+    # se vuelve a leer si el fichero ha cambiado (el modo watch abre conexiones a menudo)
+    global _dotenv_signature
+    try:
+        st = _DOTENV.stat()
+        signature = (st.st_size, st.st_mtime_ns)
+    except OSError:
+        signature = None
+    if signature is not None and signature == _dotenv_signature:
+        return
+
+    from dotenv import load_dotenv
+
+    load_dotenv(dotenv_path=_DOTENV, override=True)
+    _dotenv_signature = signature
+
+
+def conn_params() -> dict:
+    _load_dotenv()
+
+    host = _clean_env(os.getenv("PGHOST", "localhost"))
+    port = int(_clean_env(os.getenv("PGPORT", "5432")))
+    dbname = _clean_env(os.getenv("PGDATABASE", "etlproyect"))
+    user = _clean_env(os.getenv("PGUSER", "postgres"))
+    password = _clean_env(os.getenv("PGPASSWORD", ""))
+
+    os.environ["PGCLIENTENCODING"] = "UTF8"
+
+    return dict(
+        host=host,
+        port=port,
+        dbname=dbname,
+        user=user,
+        password=password,
+        connect_timeout=5,
+    )
+
+
+def get_conn():
+    return psycopg2.connect(**conn_params())
+
+
+# Filas de las tablas cargadas y del manifiesto, y último registro del manifiesto:
+# un TRUNCATE, un borrado o la restauración de una copia anterior lo cambian
+_STATE_SQL = """
+    SELECT (SELECT count(*) FROM public.clientes),
+           (SELECT count(*) FROM public.tarjetas),
+           (SELECT count(*) FROM public.etl_load_manifest),
+           (SELECT max(cargado_en)::text FROM public.etl_load_manifest);
+"""
+
+
+def db_state() -> list | None:
+    """
+    Estado de la BD después de una carga, para compararlo en la siguiente ejecución.
+    None si no se puede obtener (BD caída, tablas sin crear...): nunca coincide.
+    """
+    try:
+        conn = get_conn()
+    except psycopg2.Error:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute(_STATE_SQL)
+            return list(cur.fetchone())
+    except psycopg2.Error:
+        return None
+    finally:
+        conn.close()
@@ -1,55 +1,128 @@
+import csv
+import io
 import os
 import re
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 
 import pandas as pd
-from dotenv import load_dotenv
 import psycopg2
+from psycopg2 import sql
 from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+from etl.cache import file_sha256
+from etl.db import conn_params, get_conn
+from etl.formats import FrameWriter, check_format, format_of, read_frame, suffix
+from etl.schema import to_flags
+from etl.settings import (
+    FK_CHECK, FK_CHECKS, LOAD_METHOD, LOAD_METHODS, LOAD_WORKERS, MERGE_PARTITIONS, MERGE_TMP,
+    TARJETAS_MODE, TARJETAS_MODES,
+)
+from etl.vector_utils import to_object
+
+# Textos que pd.read_csv(dtype=str) convierte en nulo por defecto. El modo COPY los
+# trata igual para cargar exactamente los mismos valores que el modo insert: ese
+# modo envía los nulos de un CSV (NaN de pandas) como el texto 'NaN' (ver _na_value).
+_PANDAS_NA = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+_CLIENTES_COLS = [
+    "cod_cliente", "nombre", "apellido1", "apellido2",
+    "dni", "correo", "telefono",
+    "dni_ok", "dni_ko", "telefono_ok", "telefono_ko", "correo_ok", "correo_ko",
+]
+_CLIENTES_FLAGS = {
+    "DNI_OK": "dni_ok",
+    "DNI_KO": "dni_ko",
+    "Telefono_OK": "telefono_ok",
+    "Telefono_KO": "telefono_ko",
+    "Correo_OK": "correo_ok",
+    "Correo_KO": "correo_ko",
+}
+_TARJETAS_COLS = ["cod_cliente", "fecha_exp", "numero_tarjeta_masked", "numero_tarjeta_hash"]
+
+
+class _LoadPool:
+    """
+    Pool de `workers` conexiones (ThreadedConnectionPool) con un hilo por conexión.
+    run() carga varias particiones independientes a la vez, una por conexión, y
+    solo hace commit cuando han terminado todas: si una falla se deshacen todas,
+    igual que la transacción única de una sola conexión. Queda una ventana: si
+    falla el commit de una partición, las confirmadas antes que ella se mantienen.
+    """
 
-
-def _yn_to_bool(x):
-    if pd.isna(x):
-        return None
-    s = str(x).strip().upper()
-    if s == "Y":
-        return True
-    if s == "N":
-        return False
-    if s in ("TRUE", "T", "1"):
-        return True
-    if s in ("FALSE", "F", "0"):
-        return False
-    return None
-
-
-def _clean_env(v: str | None, default: str = "") -> str:
-    if v is None:
-        v = default
-    return v.strip().strip('"').strip("'")
-
-
-def _get_conn():
-    # Carga variables de entorno desde .env en el directorio padre del proyecto
-    load_dotenv(dotenv_path=Path(__file__).resolve().parents[1] / ".env", override=True)
-
-    host = _clean_env(os.getenv("PGHOST", "localhost"))
-    port = int(_clean_env(os.getenv("PGPORT", "5432")))
-    dbname = _clean_env(os.getenv("PGDATABASE", "etlproyect"))
-    user = _clean_env(os.getenv("PGUSER", "postgres"))
-    password = _clean_env(os.getenv("PGPASSWORD", ""))
-
-    os.environ["PGCLIENTENCODING"] = "UTF8"
-
-    return psycopg2.connect(
-        host=host,
-        port=port,
-        dbname=dbname,
-        user=user,
-        password=password,
-        connect_timeout=5,
-    )
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool = ThreadedConnectionPool(1, workers, **conn_params())
+        self._threads = ThreadPoolExecutor(max_workers=workers)
+
+    def _run_one(self, fn, part):
+        # Sin commit: devuelve la conexión con la transacción abierta
+        conn = self._pool.getconn()
+        try:
+            return conn, fn(conn, part)
+        except Exception:
+            conn.rollback()
+            self._pool.putconn(conn)
+            raise
+
+    def run(self, fn, parts: list) -> list:
+        # Como mucho `workers` particiones (ver _partitions): cada una tiene su conexión
+        futures = [self._threads.submit(self._run_one, fn, part) for part in parts]
+        done, error = [], None
+        for future in futures:
+            try:
+                done.append(future.result())
+            except Exception as e:
+                error = error or e
+        try:
+            for conn, _ in done:
+                if error is None:
+                    conn.commit()
+                else:
+                    conn.rollback()
+        except Exception:
+            for conn, _ in done:
+                conn.rollback()
+            raise
+        finally:
+            for conn, _ in done:
+                self._pool.putconn(conn)
+        if error is not None:
+            raise error
+        return [result for _, result in done]
+
+    def close(self):
+        self._threads.shutdown()
+        self._pool.closeall()
+
+
+def _partitions(df: pd.DataFrame, key: str, n: int) -> list[pd.DataFrame]:
+    # Reparte las filas por hash de `key` (misma clave -> misma partición, en su orden original)
+    if df.empty or n <= 1:
+        return [df] if not df.empty else []
+    part = pd.util.hash_pandas_object(df[key], index=False).to_numpy() % n
+    return [p for _, p in df.groupby(part, sort=False) if not p.empty]
+
+
+def _prefetch(fn, items: list):
+    # Devuelve (item, fn(item)) en orden, calculando fn del siguiente item mientras se usa el actual
+    if not items:
+        return
+    with ThreadPoolExecutor(max_workers=1) as reader:
+        pending = reader.submit(fn, items[0])
+        for i, item in enumerate(items):
+            result = pending.result()
+            if i + 1 < len(items):
+                pending = reader.submit(fn, items[i + 1])
+            yield item, result
 
 
 def ensure_schema(conn, logger=None):
@@ -86,6 +159,21 @@ def ensure_schema(conn, logger=None):
               ON UPDATE CASCADE ON DELETE CASCADE,
               PRIMARY KEY (cod_cliente, numero_tarjeta_hash)
               );
+
+          -- MANIFIESTO: ficheros ya aplicados (nombre + hash de contenido) para la carga incremental
+          CREATE TABLE IF NOT EXISTS public.etl_load_manifest (
+                                                         tabla VARCHAR(20) NOT NULL,
+              archivo VARCHAR(255) NOT NULL,
+              sha256 CHAR(64) NOT NULL,
+              cargado_en TIMESTAMP NOT NULL DEFAULT now(),
+              tamano BIGINT,
+              mtime_ns BIGINT,
+              PRIMARY KEY (tabla, archivo, sha256)
+              );
+
+          -- Tamaño y fecha del fichero al registrarlo: si no cambian no se vuelve a calcular el hash
+          ALTER TABLE public.etl_load_manifest ADD COLUMN IF NOT EXISTS tamano BIGINT;
+          ALTER TABLE public.etl_load_manifest ADD COLUMN IF NOT EXISTS mtime_ns BIGINT;
           """
 
     with conn.cursor() as cur:
@@ -98,44 +186,37 @@ def ensure_schema(conn, logger=None):
 
     conn.commit()
     if logger:
-        logger.info("BD: tablas verificadas/creadas (public.clientes, public.tarjetas)")
+        logger.info("BD: tablas verificadas/creadas (public.clientes, public.tarjetas, public.etl_load_manifest)")
 
 
-def _load_clientes_csv(conn, csv_path: Path, logger=None):
-    # Carga un CSV de clientes (cleaned) haciendo UPSERT en public.clientes
-    df = pd.read_csv(csv_path, dtype=str, sep=";", encoding="utf-8")
+def _read_clientes(csv_path: Path) -> pd.DataFrame:
+    # Lee un cleaned de clientes (CSV, parquet o feather) con las columnas de public.clientes
+    df = read_frame(csv_path)
 
     df.columns = [c.strip() for c in df.columns]
     if "cod cliente" in df.columns:
         df = df.rename(columns={"cod cliente": "cod_cliente"})
 
-    rename_flags = {
-        "DNI_OK": "dni_ok",
-        "DNI_KO": "dni_ko",
-        "Telefono_OK": "telefono_ok",
-        "Telefono_KO": "telefono_ko",
-        "Correo_OK": "correo_ok",
-        "Correo_KO": "correo_ko",
-    }
-    df = df.rename(columns=rename_flags)
+    df = df.rename(columns=_CLIENTES_FLAGS)
 
     df = df.loc[:, ~df.columns.duplicated()]
 
     for col in ["dni_ok", "dni_ko", "telefono_ok", "telefono_ko", "correo_ok", "correo_ko"]:
         if col in df.columns:
-            df[col] = df[col].map(_yn_to_bool)
+            df[col] = to_object(to_flags(df[col]))
 
-    cols = [
-        "cod_cliente", "nombre", "apellido1", "apellido2",
-        "dni", "correo", "telefono",
-        "dni_ok", "dni_ko", "telefono_ok", "telefono_ko", "correo_ok", "correo_ko",
-    ]
+    cols = _CLIENTES_COLS
 
     for c in cols:
         if c not in df.columns:
             df[c] = None
 
-    df = df[cols]
+    return df[cols]
+
+
+def _upsert_clientes(conn, df: pd.DataFrame) -> int:
+    # UPSERT de las filas de `df` en public.clientes (sin commit). Devuelve las filas recibidas.
+    n = len(df)
     rows = [tuple(x) for x in df.to_numpy()]
 
     sql = """
@@ -161,10 +242,298 @@ def _load_clientes_csv(conn, csv_path: Path, logger=None):
 
     with conn.cursor() as cur:
         execute_values(cur, sql, rows, page_size=1000)
+    return n
+
+
+def _load_clientes_csv(conn, csv_path: Path, logger=None):
+    # Carga un cleaned de clientes haciendo UPSERT en public.clientes
+    n = _upsert_clientes(conn, _read_clientes(csv_path))
+    conn.commit()
+    if logger:
+        logger.info(f"BD: clientes cargados desde {csv_path.name} -> {n} filas")
+
+
+def _load_clientes_pooled(pool: _LoadPool, clientes_files: list[Path], logger=None):
+    """
+    Versión en paralelo de _load_clientes_csv: los ficheros se aplican en orden,
+    cada uno repartido por cod_cliente entre las conexiones del pool, y el
+    siguiente fichero se lee mientras se envía el actual.
+    """
+    for f, df in _prefetch(_read_clientes, clientes_files):
+        # Cada partición se envía en lotes de 1000 distintos a los de una sola conexión y un
+        # INSERT no puede actualizar dos veces la misma fila: un cliente repetido en el
+        # fichero se deja solo con su última fila, que es la que queda al aplicarlas en orden
+        n = len(df)
+        df = df.drop_duplicates(subset=["cod_cliente"], keep="last")
+        pool.run(_upsert_clientes, _partitions(df, "cod_cliente", pool.workers))
+        if logger:
+            logger.info(f"BD: clientes cargados desde {f.name} -> {n} filas")
+
+
+def _copy_csv_to_temp(cur, csv_path: Path, table: str) -> tuple[dict, int]:
+    """
+    Crea una tabla temporal (se borra en el commit) con las columnas de la cabecera
+    del CSV, todas TEXT, más `_fila` con el orden de las filas, y la llena con
+    COPY FROM STDIN. Devuelve ({columna normalizada: columna en la tabla}, filas).
+    Los ficheros parquet/feather se envían convertidos a CSV en memoria.
+    """
+    data = None
+    if format_of(csv_path) != "csv":
+        df = read_frame(csv_path)
+        data = io.BytesIO(df.to_csv(index=False, sep=";").encode("utf-8"))
+        header = list(df.columns)
+    else:
+        with open(csv_path, "r", encoding="utf-8", newline="") as f:
+            header = next(csv.reader(f, delimiter=";"), [])
+
+    # Misma normalización que el modo insert: strip, 'cod cliente' y primera columna repetida
+    cols = {}
+    table_cols = []
+    for i, name in enumerate(header):
+        col = f"c{i}"
+        table_cols.append(col)
+        name = name.strip()
+        if name == "cod cliente":
+            name = "cod_cliente"
+        name = _CLIENTES_FLAGS.get(name, name)
+        cols.setdefault(name, col)
+
+    cur.execute(
+        sql.SQL("CREATE TEMP TABLE {} (_fila BIGSERIAL, {}) ON COMMIT DROP").format(
+            sql.Identifier(table),
+            sql.SQL(", ").join(sql.SQL("{} TEXT").format(sql.Identifier(c)) for c in table_cols),
+        )
+    )
+
+    copy = sql.SQL(
+        "COPY {} ({}) FROM STDIN WITH (FORMAT csv, DELIMITER ';', HEADER true, ENCODING 'UTF8')"
+    ).format(sql.Identifier(table), sql.SQL(", ").join(map(sql.Identifier, table_cols)))
+    if data is not None:
+        cur.copy_expert(copy.as_string(cur), data)
+    else:
+        with open(csv_path, "rb") as f:
+            cur.copy_expert(copy.as_string(cur), f)
+
+    return cols, cur.rowcount
+
+
+def _na_value(path: Path) -> str | None:
+    # Lo que guarda el modo insert para un nulo de pandas: psycopg2 envía el NaN de
+    # read_csv como el texto 'NaN'; en parquet/feather los nulos ya son None (NULL)
+    return "NaN" if format_of(path) == "csv" else None
+
+
+def _text_expr(cols: dict, name: str):
+    # Columna de staging como texto, con los nulos que aplicaría pandas convertidos en
+    # %(na_value)s (ver _na_value), o NULL si la columna no existe
+    if name not in cols:
+        return sql.SQL("NULL")
+    # (COPY ya deja como NULL los campos vacíos sin comillas)
+    return sql.SQL("CASE WHEN {c} IS NULL OR {c} = ANY(%(na)s) THEN %(na_value)s ELSE {c} END").format(
+        c=sql.Identifier(cols[name])
+    )
+
+
+def _bool_expr(cols: dict, name: str):
+    # Equivalente SQL de schema.to_flags
+    return sql.SQL(
+        "CASE upper(btrim({v})) "
+        "WHEN 'Y' THEN TRUE WHEN 'TRUE' THEN TRUE WHEN 'T' THEN TRUE WHEN '1' THEN TRUE "
+        "WHEN 'N' THEN FALSE WHEN 'FALSE' THEN FALSE WHEN 'F' THEN FALSE WHEN '0' THEN FALSE "
+        "END"
+    ).format(v=_text_expr(cols, name))
+
+
+def _copy_clientes_csv(conn, csv_path: Path, logger=None):
+    # Igual que _load_clientes_csv pero con COPY a staging y un único INSERT ... SELECT
+    with conn.cursor() as cur:
+        cols, n = _copy_csv_to_temp(cur, csv_path, "stg_clientes")
+
+        select = sql.SQL(", ").join(
+            _bool_expr(cols, c) if c.endswith(("_ok", "_ko")) else _text_expr(cols, c)
+            for c in _CLIENTES_COLS
+        )
+        # Si un cliente se repite en el fichero gana la última fila (como en los lotes de execute_values)
+        cur.execute(
+            sql.SQL("""
+                INSERT INTO public.clientes ({cols})
+                SELECT DISTINCT ON (1) {select}
+                FROM stg_clientes
+                ORDER BY 1, _fila DESC
+                ON CONFLICT (cod_cliente) DO UPDATE SET {update};
+            """).format(
+                cols=sql.SQL(", ").join(map(sql.Identifier, _CLIENTES_COLS)),
+                select=select,
+                update=sql.SQL(", ").join(
+                    sql.SQL("{c}=EXCLUDED.{c}").format(c=sql.Identifier(c)) for c in _CLIENTES_COLS[1:]
+                ),
+            ),
+            {"na": _PANDAS_NA, "na_value": _na_value(csv_path)},
+        )
 
     conn.commit()
     if logger:
-        logger.info(f"BD: clientes cargados desde {csv_path.name} -> {len(rows)} filas")
+        logger.info(f"BD: clientes cargados desde {csv_path.name} -> {n} filas")
+
+
+def _stage_tarjetas_copy(cur, tarjetas_files: list[Path]) -> int:
+    """
+    Versión COPY de _merge_tarjetas_keep_latest: copia los ficheros a staging en
+    orden y deja en stg_tarjetas_merged una fila por (cod_cliente, numero_tarjeta_hash).
+    Devuelve el número de filas tras deduplicar.
+    """
+    cur.execute(
+        sql.SQL("CREATE TEMP TABLE stg_tarjetas (_fila BIGSERIAL, {}) ON COMMIT DROP").format(
+            sql.SQL(", ").join(sql.SQL("{} TEXT").format(sql.Identifier(c)) for c in _TARJETAS_COLS)
+        )
+    )
+
+    for i, f in enumerate(tarjetas_files):
+        table = f"stg_tarjetas_{i}"
+        cols, _ = _copy_csv_to_temp(cur, f, table)
+        cur.execute(
+            sql.SQL("INSERT INTO stg_tarjetas ({cols}) SELECT {select} FROM {t} ORDER BY _fila").format(
+                cols=sql.SQL(", ").join(map(sql.Identifier, _TARJETAS_COLS)),
+                select=sql.SQL(", ").join(_text_expr(cols, c) for c in _TARJETAS_COLS),
+                t=sql.Identifier(table),
+            ),
+            {"na": _PANDAS_NA, "na_value": _na_value(f)},
+        )
+
+    # Solo eliminamos duplicados exactos de la misma tarjeta del mismo cliente (gana el primero)
+    cur.execute("""
+        CREATE TEMP TABLE stg_tarjetas_merged ON COMMIT DROP AS
+        SELECT DISTINCT ON (cod_cliente, numero_tarjeta_hash)
+               cod_cliente, fecha_exp, numero_tarjeta_masked, numero_tarjeta_hash
+        FROM stg_tarjetas
+        ORDER BY cod_cliente, numero_tarjeta_hash, _fila;
+    """)
+    return cur.rowcount
+
+
+def _insert_tarjetas_from_stage(cur, keep_existing: bool = False) -> tuple[int, int]:
+    # Inserta stg_tarjetas_merged filtrando la FK en el servidor. Devuelve (insertadas, descartadas FK)
+    cur.execute("""
+        SELECT count(*) FROM stg_tarjetas_merged m
+        WHERE NOT EXISTS (SELECT 1 FROM public.clientes c WHERE c.cod_cliente = m.cod_cliente);
+    """)
+    dropped = cur.fetchone()[0]
+
+    on_conflict = (
+        "DO NOTHING" if keep_existing
+        else "DO UPDATE SET fecha_exp=EXCLUDED.fecha_exp, numero_tarjeta_masked=EXCLUDED.numero_tarjeta_masked"
+    )
+    cur.execute(f"""
+        INSERT INTO public.tarjetas (cod_cliente, fecha_exp, numero_tarjeta_masked, numero_tarjeta_hash)
+        SELECT m.cod_cliente, m.fecha_exp, m.numero_tarjeta_masked, m.numero_tarjeta_hash
+        FROM stg_tarjetas_merged m
+        JOIN public.clientes c ON c.cod_cliente = m.cod_cliente
+        ON CONFLICT (cod_cliente, numero_tarjeta_hash) {on_conflict};
+    """)
+    return cur.rowcount, dropped
+
+
+def _copy_tarjetas_merge(conn, tarjetas_files: list[Path], logger=None):
+    # Versión COPY de merge + filtro FK + TRUNCATE + inserción (recarga total)
+    with conn.cursor() as cur:
+        merged = _stage_tarjetas_copy(cur, tarjetas_files)
+        if logger:
+            logger.info(f"BD: tarjetas merged -> {merged} filas tras deduplicar por (cod_cliente, numero_tarjeta_hash)")
+
+        cur.execute("TRUNCATE TABLE public.tarjetas;")
+        inserted, dropped = _insert_tarjetas_from_stage(cur)
+
+    # TRUNCATE e inserción en la misma transacción: la tabla nunca se ve vacía
+    conn.commit()
+
+    if logger and dropped:
+        logger.warning(f"BD: tarjetas descartadas por FK (cliente inexistente) -> {dropped} filas")
+    if logger:
+        if inserted:
+            logger.info(f"BD: tarjetas cargadas desde merged tarjetas (todas por cliente, sin duplicados) -> {inserted} filas")
+        else:
+            logger.info("BD: no hay tarjetas para insertar (df vacío)")
+
+
+def _manifest_applied(conn, tabla: str) -> tuple[set[tuple[str, str]], dict[tuple[str, int, int], str]]:
+    # (archivo, sha256) ya aplicados a `tabla` y sha256 registrado para cada (archivo, tamaño, mtime)
+    with conn.cursor() as cur:
+        cur.execute("SELECT archivo, sha256, tamano, mtime_ns FROM public.etl_load_manifest WHERE tabla = %s;",
+                    (tabla,))
+        rows = cur.fetchall()
+    return {(a, h) for a, h, _, _ in rows}, {(a, n, m): h for a, h, n, m in rows if n is not None}
+
+
+def _file_digest(f: Path, known: dict[tuple[str, int, int], str]) -> tuple[Path, str, int, int]:
+    # (fichero, sha256, tamaño, mtime). Si nombre, tamaño y mtime coinciden con el
+    # manifiesto se reutiliza su hash sin leer el fichero (como etl.cache con los raw)
+    st = f.stat()
+    digest = known.get((f.name, st.st_size, st.st_mtime_ns)) or file_sha256(f)
+    return f, digest, st.st_size, st.st_mtime_ns
+
+
+def _manifest_record(conn, tabla: str, files: list[tuple[Path, str, int, int]], reset: bool = False):
+    # Registra ficheros aplicados (ver _file_digest); con reset=True se sustituye todo el histórico de `tabla`
+    with conn.cursor() as cur:
+        if reset:
+            cur.execute("DELETE FROM public.etl_load_manifest WHERE tabla = %s;", (tabla,))
+        execute_values(
+            cur,
+            """
+            INSERT INTO public.etl_load_manifest (tabla, archivo, sha256, tamano, mtime_ns)
+            VALUES %s
+            ON CONFLICT (tabla, archivo, sha256) DO UPDATE
+                SET cargado_en = now(), tamano = EXCLUDED.tamano, mtime_ns = EXCLUDED.mtime_ns;
+            """,
+            [(tabla, f.name, digest, size, mtime_ns) for f, digest, size, mtime_ns in files],
+        )
+    conn.commit()
+
+
+def _load_tarjetas_incremental(conn, tarjetas_files: list[Path], method: str, logger=None,
+                               fk_check: str = "client", pool: _LoadPool | None = None):
+    """
+    Carga solo los ficheros de tarjetas que no están en etl_load_manifest (por nombre
+    y hash de contenido), en orden de fecha, sin TRUNCATE. Una tarjeta ya cargada
+    se conserva (ON CONFLICT DO NOTHING), igual que el keep-first de la recarga total.
+    Con `pool` (método insert) se lee el siguiente fichero mientras se envía el actual.
+    """
+    applied, known = _manifest_applied(conn, "tarjetas")
+    # Solo se hashean los ficheros cuyo tamaño o fecha no coinciden con el manifiesto
+    files = [_file_digest(f, known) for f in tarjetas_files]
+    pending = [item for item in files if (item[0].name, item[1]) not in applied]
+    # Ya aplicados pero con otra fecha (mismo contenido): se guarda la nueva para no volver a hashearlos
+    touched = [item for item in files if item not in pending and (item[0].name, item[2], item[3]) not in known]
+    if touched:
+        _manifest_record(conn, "tarjetas", touched)
+
+    if logger:
+        logger.info(f"BD: tarjetas incremental -> {len(pending)} ficheros pendientes de {len(tarjetas_files)}")
+
+    def _read(item):
+        return _merge_tarjetas_keep_latest([item[0]]) if method != "copy" else None
+
+    existing = None
+    for item, df in (_prefetch(_read, pending) if pool is not None else ((p, _read(p)) for p in pending)):
+        f = item[0]
+        if method == "copy":
+            with conn.cursor() as cur:
+                merged = _stage_tarjetas_copy(cur, [f])
+                inserted, dropped = _insert_tarjetas_from_stage(cur, keep_existing=True)
+            conn.commit()
+        else:
+            merged = len(df)
+            if existing is None and fk_check == "client":
+                existing = _existing_client_codes(conn)
+            df, dropped = _filter_fk(conn, df, fk_check, existing)
+            inserted = _insert_tarjetas_df(conn, df, source=f.name, keep_existing=True, pool=pool)
+
+        _manifest_record(conn, "tarjetas", [item])
+
+        if logger and dropped:
+            logger.warning(f"BD: tarjetas descartadas por FK (cliente inexistente) en {f.name} -> {dropped} filas")
+        if logger:
+            logger.info(f"BD: tarjetas incremental desde {f.name} -> {merged} filas, {inserted} nuevas")
 
 
 def _existing_client_codes(conn) -> set[str]:
@@ -174,42 +543,135 @@ def _existing_client_codes(conn) -> set[str]:
         return {r[0] for r in cur.fetchall()}
 
 
-# TARJETAS: merge de todos los CSV y dedupe SOLO por (cod_cliente, numero_tarjeta_hash)
-def _merge_tarjetas_keep_latest(tarjetas_files: list[Path]) -> pd.DataFrame:
-    dfs = []
-    for f in tarjetas_files:
-        dfs.append(pd.read_csv(f, dtype=str, sep=";", encoding="utf-8"))
+def _orphan_client_codes(conn, codes: list[str]) -> set[str]:
+    # Devuelve los `codes` que no existen en public.clientes, resolviendo el cruce en la BD
+    if not codes:
+        return set()
 
-    if not dfs:
-        return pd.DataFrame()
+    with conn.cursor() as cur:
+        cur.execute("CREATE TEMP TABLE stg_cod_cliente (cod_cliente TEXT PRIMARY KEY) ON COMMIT DROP;")
+        execute_values(cur, "INSERT INTO stg_cod_cliente (cod_cliente) VALUES %s",
+                       [(c,) for c in codes], page_size=10000)
+        cur.execute("""
+            SELECT s.cod_cliente FROM stg_cod_cliente s
+            WHERE NOT EXISTS (SELECT 1 FROM public.clientes c WHERE c.cod_cliente = s.cod_cliente);
+        """)
+        orphans = {r[0] for r in cur.fetchall()}
+    conn.commit()
+    return orphans
+
+
+def _filter_fk(conn, df: pd.DataFrame, fk_check: str, existing: set[str] | None = None):
+    """
+    Filtro FK de tarjetas: deja solo las filas cuyo cod_cliente existe en
+    public.clientes. Devuelve (df filtrado, nº de filas descartadas).
+    """
+    if df.empty:
+        return df, 0
+
+    if fk_check == "server":
+        orphans = _orphan_client_codes(conn, df["cod_cliente"].dropna().unique().tolist())
+        keep = df["cod_cliente"].notna() & ~df["cod_cliente"].isin(orphans)
+    else:
+        if existing is None:
+            existing = _existing_client_codes(conn)
+        keep = df["cod_cliente"].isin(existing)
+
+    return df[keep], int((~keep).sum())
 
-    df = pd.concat(dfs, ignore_index=True)
+
+def _tarjetas_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # Columnas de tarjetas que se cargan (nombres normalizados; las que falten, a None)
     df.columns = [c.strip() for c in df.columns]
 
     if "cod cliente" in df.columns:
         df.rename(columns={"cod cliente": "cod_cliente"}, inplace=True)
 
-    for c in ["cod_cliente", "fecha_exp", "numero_tarjeta_masked", "numero_tarjeta_hash"]:
+    for c in _TARJETAS_COLS:
         if c not in df.columns:
             df[c] = None
 
+    return df[_TARJETAS_COLS]
+
 
+def _dedupe_tarjetas(df: pd.DataFrame) -> pd.DataFrame:
     # Solo eliminamos duplicados exactos de la misma tarjeta del mismo cliente.
-    df = df.drop_duplicates(subset=["cod_cliente", "numero_tarjeta_hash"], keep="first")
+    return df.drop_duplicates(subset=["cod_cliente", "numero_tarjeta_hash"], keep="first")
 
-    return df[["cod_cliente", "fecha_exp", "numero_tarjeta_masked", "numero_tarjeta_hash"]]
 
+# TARJETAS: merge de todos los CSV y dedupe SOLO por (cod_cliente, numero_tarjeta_hash)
+def _merge_tarjetas_keep_latest(tarjetas_files: list[Path]) -> pd.DataFrame:
+    dfs = []
+    for f in tarjetas_files:
+        dfs.append(_tarjetas_frame(read_frame(f)))
 
-def _insert_tarjetas_df(conn, df: pd.DataFrame, logger=None, source="merged"):
-    if df is None or df.empty:
-        if logger:
-            logger.info("BD: no hay tarjetas para insertar (df vacío)")
+    if not dfs:
+        return pd.DataFrame()
+
+    return _dedupe_tarjetas(pd.concat(dfs, ignore_index=True))
+
+
+def _spill_tarjetas(tarjetas_files: list[Path], partitions: int, tmp_dir: Path) -> list[Path]:
+    """
+    Reparte las filas de los ficheros (ya en orden de fecha) en `partitions` ficheros
+    por hash de cod_cliente. Un mismo cliente cae siempre en la misma partición y sus
+    filas quedan en el orden de lectura, así que deduplicar cada partición con
+    keep="first" da las mismas filas que el merge en memoria.
+    """
+    if not tarjetas_files:
+        return []
+
+    fmt = format_of(tarjetas_files[0])
+    writers = {}
+    try:
+        for f in tarjetas_files:
+            df = _tarjetas_frame(read_frame(f))
+            if df.empty:
+                continue
+            part = pd.util.hash_pandas_object(df["cod_cliente"], index=False).to_numpy() % partitions
+            for p, rows in df.groupby(part, sort=False):
+                if p not in writers:
+                    writers[p] = FrameWriter(tmp_dir / f"tarjetas-{p:04d}{suffix(fmt)}", fmt)
+                writers[p].write(rows)
+    finally:
+        for w in writers.values():
+            w.close()
+
+    return [writers[p].path for p in sorted(writers)]
+
+
+def _dedupe_tarjetas_file(path: Path) -> pd.DataFrame:
+    # Lee y deduplica una partición (en un proceso aparte); el fichero ya no hace falta
+    df = _dedupe_tarjetas(read_frame(path))
+    path.unlink()
+    return df
+
+
+def _dedupe_partitions(paths: list[Path], workers: int):
+    # Devuelve cada partición deduplicada en orden, con hasta `workers` procesos
+    # trabajando por delante de la carga (y como mucho `workers` resultados en memoria)
+    if workers <= 1:
+        for path in paths:
+            yield _dedupe_tarjetas_file(path)
         return
 
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        todo = iter(paths)
+        pending = deque(executor.submit(_dedupe_tarjetas_file, p) for _, p in zip(range(workers), todo))
+        while pending:
+            df = pending.popleft().result()
+            nxt = next(todo, None)
+            if nxt is not None:
+                pending.append(executor.submit(_dedupe_tarjetas_file, nxt))
+            yield df
+
+
+def _insert_tarjetas_rows(conn, df: pd.DataFrame, keep_existing: bool = False) -> int:
+    # Inserta las filas de `df` en public.tarjetas (sin commit). Devuelve filas nuevas/actualizadas
     df = df.copy()
     df.columns = [c.strip() for c in df.columns]
 
-    cols = ["cod_cliente", "fecha_exp", "numero_tarjeta_masked", "numero_tarjeta_hash"]
+    cols = _TARJETAS_COLS
     for c in cols:
         if c not in df.columns:
             df[c] = None
@@ -226,17 +688,44 @@ def _insert_tarjetas_df(conn, df: pd.DataFrame, logger=None, source="merged"):
                                                                     numero_tarjeta_masked=EXCLUDED.numero_tarjeta_masked,
                                                                     numero_tarjeta_hash=EXCLUDED.numero_tarjeta_hash;
           """
-
+    if keep_existing:
+        sql = """
+              INSERT INTO public.tarjetas (cod_cliente, fecha_exp, numero_tarjeta_masked, numero_tarjeta_hash)
+              VALUES %s
+                  ON CONFLICT (cod_cliente, numero_tarjeta_hash) DO NOTHING;
+              """
+
+    affected = 0
     with conn.cursor() as cur:
-        execute_values(cur, sql, rows, page_size=1000)
+        for start in range(0, len(rows), 1000):
+            execute_values(cur, sql, rows[start:start + 1000], page_size=1000)
+            affected += cur.rowcount
+    return affected
+
+
+def _insert_tarjetas_df(conn, df: pd.DataFrame, logger=None, source="merged", keep_existing: bool = False,
+                        pool: _LoadPool | None = None) -> int:
+    # keep_existing=True: no pisa tarjetas ya cargadas (carga incremental). Devuelve filas nuevas/actualizadas
+    # Con `pool`, las filas se reparten por cod_cliente entre sus conexiones (claves disjuntas)
+    if df is None or df.empty:
+        if logger:
+            logger.info("BD: no hay tarjetas para insertar (df vacío)")
+        return 0
+
+    insert = partial(_insert_tarjetas_rows, keep_existing=keep_existing)
+    if pool is not None:
+        affected = sum(pool.run(insert, _partitions(df, "cod_cliente", pool.workers)))
+    else:
+        affected = insert(conn, df)
+        conn.commit()
 
-    conn.commit()
     if logger:
-        logger.info(f"BD: tarjetas cargadas desde {source} -> {len(rows)} filas")
+        logger.info(f"BD: tarjetas cargadas desde {source} -> {len(df)} filas")
+    return affected
 
 
 #  Patrón para identificar tarjetas cleaned con fecha ISO
-_RX_TARJETAS = re.compile(r"^Tarjetas-(\d{4}-\d{2}-\d{2})\.cleaned\.csv$", re.IGNORECASE)
+_RX_TARJETAS = re.compile(r"^Tarjetas-(\d{4}-\d{2}-\d{2})\.cleaned\.(?:csv|parquet|feather)$", re.IGNORECASE)
 
 def _tarjetas_fecha(csv_path: Path):
     m = _RX_TARJETAS.match(csv_path.name)
@@ -245,16 +734,92 @@ def _tarjetas_fecha(csv_path: Path):
     return datetime.strptime(m.group(1), "%Y-%m-%d").date()
 
 
-def load_cleaned_to_postgres(output_dir: Path, logger=None):
-    output_dir = Path(output_dir)
+def _load_tarjetas_full(conn, tarjetas_files: list[Path], logger=None, fk_check: str = "client",
+                        pool: _LoadPool | None = None, partitions: int = 1):
+    #  TARJETAS: merge total sin decidir por fecha (solo dedupe por tarjeta)
+    if partitions > 1:
+        _load_tarjetas_partitioned(conn, tarjetas_files, partitions, logger=logger, fk_check=fk_check, pool=pool)
+        return
 
-    clientes_files = sorted(output_dir.glob("Clientes-*.cleaned.csv"))
-    tarjetas_files = sorted(output_dir.glob("Tarjetas-*.cleaned.csv"))
+    df_merged = _merge_tarjetas_keep_latest(tarjetas_files)
 
     if logger:
-        logger.info(f"BD: found cleaned clientes={len(clientes_files)} tarjetas={len(tarjetas_files)}")
+        logger.info(f"BD: tarjetas merged -> {len(df_merged)} filas tras deduplicar por (cod_cliente, numero_tarjeta_hash)")
+
+    #  filtro FK: solo clientes existentes
+    df_merged, dropped = _filter_fk(conn, df_merged, fk_check)
+
+    if logger and dropped:
+        logger.warning(f"BD: tarjetas descartadas por FK (cliente inexistente) -> {dropped} filas")
+
+    # Si es TOTAL, truncamos antes
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE TABLE public.tarjetas;")
+    conn.commit()
+
+    _insert_tarjetas_df(conn, df_merged, logger=logger, source="merged tarjetas (todas por cliente, sin duplicados)",
+                        pool=pool)
+
+
+def _load_tarjetas_partitioned(conn, tarjetas_files: list[Path], partitions: int, logger=None,
+                               fk_check: str = "client", pool: _LoadPool | None = None):
+    # Como _load_tarjetas_full, pero el merge se hace por particiones en disco y cada
+    # partición se filtra y se inserta en cuanto está deduplicada
+    workers = min(partitions, os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory(prefix="etl_merge_", dir=MERGE_TMP) as tmp_dir:
+        # Los ficheros se leen antes del TRUNCATE: si falla la lectura la tabla queda como estaba
+        paths = _spill_tarjetas(tarjetas_files, partitions, Path(tmp_dir))
+        existing = _existing_client_codes(conn) if fk_check == "client" else None
+
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE TABLE public.tarjetas;")
+        conn.commit()
 
-    # Ordenar tarjetas por fecha si se puede (para logging)
+        merged = dropped = loaded = 0
+        for df in _dedupe_partitions(paths, workers):
+            merged += len(df)
+            df, d = _filter_fk(conn, df, fk_check, existing)
+            dropped += d
+            _insert_tarjetas_df(conn, df, pool=pool)
+            loaded += len(df)
+
+    if logger:
+        logger.info(f"BD: tarjetas merged en {len(paths)} particiones ({workers} procesos) -> {merged} filas "
+                    f"tras deduplicar por (cod_cliente, numero_tarjeta_hash)")
+        if dropped:
+            logger.warning(f"BD: tarjetas descartadas por FK (cliente inexistente) -> {dropped} filas")
+        if loaded:
+            logger.info(f"BD: tarjetas cargadas desde merged tarjetas (todas por cliente, sin duplicados) -> {loaded} filas")
+        else:
+            logger.info("BD: no hay tarjetas para insertar (df vacío)")
+
+
+def _check_options(method, tarjetas_mode, fk_check, workers):
+    # Valida las opciones de carga (None = valor por defecto / variable de entorno)
+    method = method or LOAD_METHOD
+    if method not in LOAD_METHODS:
+        raise ValueError(f"Método de carga desconocido: {method!r} (opciones: {LOAD_METHODS})")
+    tarjetas_mode = tarjetas_mode or TARJETAS_MODE
+    if tarjetas_mode not in TARJETAS_MODES:
+        raise ValueError(f"Modo de carga de tarjetas desconocido: {tarjetas_mode!r} (opciones: {TARJETAS_MODES})")
+    fk_check = fk_check or FK_CHECK
+    if fk_check not in FK_CHECKS:
+        raise ValueError(f"Filtro FK desconocido: {fk_check!r} (opciones: {FK_CHECKS})")
+    workers = workers or LOAD_WORKERS
+    if workers < 1:
+        raise ValueError(f"Número de conexiones de carga no válido: {workers}")
+    return method, tarjetas_mode, fk_check, workers
+
+
+def _check_partitions(partitions):
+    partitions = partitions or MERGE_PARTITIONS
+    if partitions < 1:
+        raise ValueError(f"Número de particiones del merge no válido: {partitions}")
+    return partitions
+
+
+def _sort_tarjetas(tarjetas_files: list[Path]) -> list[Path]:
+    # Ordenar tarjetas por fecha si se puede
     tarjetas_con_fecha = []
     for f in tarjetas_files:
         fecha = _tarjetas_fecha(f)
@@ -262,36 +827,104 @@ def load_cleaned_to_postgres(output_dir: Path, logger=None):
             tarjetas_con_fecha.append((f, fecha))
     if tarjetas_con_fecha:
         tarjetas_files = [x[0] for x in sorted(tarjetas_con_fecha, key=lambda x: x[1])]
+    return tarjetas_files
 
-    conn = _get_conn()
-    try:
-        ensure_schema(conn, logger=logger)
-
-        #  CLIENTES: base + incremental (UPSERT)
-        for f in clientes_files:
-            _load_clientes_csv(conn, f, logger=logger)
-
-        #  TARJETAS: merge total sin decidir por fecha (solo dedupe por tarjeta)
-        df_merged = _merge_tarjetas_keep_latest(tarjetas_files)
 
-        if logger:
-            logger.info(f"BD: tarjetas merged -> {len(df_merged)} filas tras deduplicar por (cod_cliente, numero_tarjeta_hash)")
-
-        #  filtro FK: solo clientes existentes
-        existing = _existing_client_codes(conn)
-        before = len(df_merged)
-        df_merged = df_merged[df_merged["cod_cliente"].isin(existing)]
-        dropped = before - len(df_merged)
+class LoadSession:
+    """
+    Conexión a PostgreSQL (y pool, si hay varias conexiones) abierta entre cargas.
+    load_cleaned_to_postgres abre una por ejecución; el modo watch la mantiene
+    abierta y carga cada fichero según llega.
+    """
 
-        if logger and dropped:
-            logger.warning(f"BD: tarjetas descartadas por FK (cliente inexistente) -> {dropped} filas")
+    def __init__(self, logger=None, method: str | None = None, tarjetas_mode: str | None = None,
+                 fk_check: str | None = None, workers: int | None = None, merge_partitions: int | None = None):
+        self.method, self.tarjetas_mode, self.fk_check, self.workers = _check_options(
+            method, tarjetas_mode, fk_check, workers
+        )
+        self.merge_partitions = _check_partitions(merge_partitions)
+        self.logger = logger
+        self.pool = None
+        self.conn = get_conn()
+        try:
+            ensure_schema(self.conn, logger=logger)
+
+            if self.workers > 1:
+                if self.method == "copy":
+                    # COPY ya resuelve cada tabla con un único INSERT ... SELECT en el servidor
+                    if logger:
+                        logger.info("BD: el método copy usa una sola conexión (se ignoran las conexiones en paralelo)")
+                else:
+                    self.pool = _LoadPool(self.workers)
+                    if logger:
+                        logger.info(f"BD: carga en paralelo con {self.workers} conexiones")
+        except Exception:
+            self.close()
+            raise
+
+    def load(self, clientes_files: list[Path], tarjetas_files: list[Path]):
+        """Carga los cleaned indicados: clientes primero (FK) y después tarjetas por fecha."""
+        conn, pool, logger = self.conn, self.pool, self.logger
+        tarjetas_files = _sort_tarjetas(tarjetas_files)
+
+        #  CLIENTES: base + incremental (UPSERT). Siempre antes que tarjetas (FK)
+        if pool is not None:
+            _load_clientes_pooled(pool, clientes_files, logger=logger)
+        else:
+            for f in clientes_files:
+                if self.method == "copy":
+                    _copy_clientes_csv(conn, f, logger=logger)
+                else:
+                    _load_clientes_csv(conn, f, logger=logger)
+
+        #  TARJETAS incremental: solo ficheros nuevos o modificados, sin TRUNCATE
+        if self.tarjetas_mode == "incremental":
+            _load_tarjetas_incremental(conn, tarjetas_files, self.method, logger=logger,
+                                       fk_check=self.fk_check, pool=pool)
+            return
+
+        if self.method == "copy":
+            _copy_tarjetas_merge(conn, tarjetas_files, logger=logger)
+        else:
+            _load_tarjetas_full(conn, tarjetas_files, logger=logger, fk_check=self.fk_check, pool=pool,
+                                partitions=self.merge_partitions)
+
+        # La recarga total deja el manifiesto igual a los ficheros presentes
+        _, known = _manifest_applied(conn, "tarjetas")
+        _manifest_record(conn, "tarjetas", [_file_digest(f, known) for f in tarjetas_files], reset=True)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_cleaned_to_postgres(output_dir: Path, logger=None, method: str | None = None,
+                             tarjetas_mode: str | None = None, fk_check: str | None = None,
+                             output_format: str | None = None, workers: int | None = None,
+                             merge_partitions: int | None = None):
+    output_dir = Path(output_dir)
+    method, tarjetas_mode, fk_check, workers = _check_options(method, tarjetas_mode, fk_check, workers)
+    merge_partitions = _check_partitions(merge_partitions)
 
-        # Si es TOTAL, truncamos antes
-        with conn.cursor() as cur:
-            cur.execute("TRUNCATE TABLE public.tarjetas;")
-        conn.commit()
+    ext = suffix(check_format(output_format))
+    clientes_files = sorted(output_dir.glob(f"Clientes-*.cleaned{ext}"))
+    tarjetas_files = sorted(output_dir.glob(f"Tarjetas-*.cleaned{ext}"))
 
-        _insert_tarjetas_df(conn, df_merged, logger=logger, source="merged tarjetas (todas por cliente, sin duplicados)")
+    if logger:
+        logger.info(
+            f"BD: found cleaned clientes={len(clientes_files)} tarjetas={len(tarjetas_files)} "
+            f"(método={method}, tarjetas={tarjetas_mode})"
+        )
 
-    finally:
-        conn.close()
+    with LoadSession(logger, method, tarjetas_mode, fk_check, workers, merge_partitions) as session:
+        session.load(clientes_files, tarjetas_files)
@@ -1,69 +1,75 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+from etl.formats import FrameWriter, check_format, suffix, write_frame
+from etl.schema import is_text, to_text
+
 try:
     pd.set_option("future.no_silent_downcasting", True)
 except Exception:
     pass
 
 
-def write_rows_rejected_clientes_tarjetas(
-        error_dfs: list[pd.DataFrame],
-        output_dir: str = "errors",
-        include_motivo: bool = True,
-        logger=None
-):
-    # Combina dataframes de errores y genera CSV separados para CLIENTES y TARJETAS
-    if not error_dfs:
-        if logger:
-            logger.info("No hay filas erróneas. No se generan CSV de rechazadas.")
-        return
-
-    out_dir = Path(output_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
+#  Columnas deseadas EXACTAS (esquema fijo de cada fichero de rechazadas)
+COLS_CLIENTES = [
+    "cod_cliente", "nombre", "apellido1", "apellido2", "dni", "correo", "telefono",
+    "DNI_OK", "DNI_KO", "Telefono_OK", "Telefono_KO", "Correo_OK", "Correo_KO"
+]
+COLS_TARJETAS = ["cod_cliente", "fecha_exp", "numero_tarjeta_masked", "numero_tarjeta_hash"]
 
-    errors_df = pd.concat(error_dfs, ignore_index=True)
+_TARJETA_HINTS = ["numero_tarjeta", "numero_tarjeta_masked", "numero_tarjeta_hash", "cvv", "fecha_exp"]
+_CLIENTE_HINTS = ["dni", "correo", "telefono", "apellido1", "apellido2", "nombre"]
+_ORIGIN_COLS = ["origen", "source_file", "file", "archivo"]
+_ERROR_COLS = ["motivo", "error_detalle", "error"]
 
-    # Limpieza suave
-    errors_df = errors_df.replace(r"^\s*$", pd.NA, regex=True)
 
+def _normalize_cols(df: pd.DataFrame) -> pd.DataFrame:
     # Normalizar nombres de columnas (por si vienen con espacios, BOM, etc.)
-    def _normalize_cols(df: pd.DataFrame) -> pd.DataFrame:
-        df.columns = (
-            df.columns.astype(str)
-            .str.replace("\ufeff", "", regex=False)
-            .str.strip()
-        )
-        rename = {
-            "Cod cliente": "cod_cliente",
-            "COD_CLIENTE": "cod_cliente",
-            "cod cliente": "cod_cliente",
-
-            "numero tarjeta": "numero_tarjeta",
-            "Número tarjeta": "numero_tarjeta",
-            "Numero_tarjeta": "numero_tarjeta",
-
-            # por si tu validador usa estos nombres
-            "numero_tarjeta_mask": "numero_tarjeta_masked",
-            "tarjeta_masked": "numero_tarjeta_masked",
-            "tarjeta_hash": "numero_tarjeta_hash",
-        }
-        df.rename(columns=rename, inplace=True)
-        return df
-
-    errors_df = _normalize_cols(errors_df)
-
-    # Detectar columna “origen”
-    origin_col = None
-    for c in ["origen", "source_file", "file", "archivo"]:
-        if c in errors_df.columns:
-            origin_col = c
-            break
-
+    df.columns = (
+        df.columns.astype(str)
+        .str.replace("\ufeff", "", regex=False)
+        .str.strip()
+    )
+    rename = {
+        "Cod cliente": "cod_cliente",
+        "COD_CLIENTE": "cod_cliente",
+        "cod cliente": "cod_cliente",
+
+        "numero tarjeta": "numero_tarjeta",
+        "Número tarjeta": "numero_tarjeta",
+        "Numero_tarjeta": "numero_tarjeta",
+
+        # por si tu validador usa estos nombres
+        "numero_tarjeta_mask": "numero_tarjeta_masked",
+        "tarjeta_masked": "numero_tarjeta_masked",
+        "tarjeta_hash": "numero_tarjeta_hash",
+    }
+    df.rename(columns=rename, inplace=True)
+    return df
+
+
+def _blank_to_na(df: pd.DataFrame) -> pd.DataFrame:
+    # Limpieza suave: celdas vacías o solo espacios -> NA (como replace(r"^\s*$", NA)),
+    # solo en las columnas que se usan y evaluando una vez cada valor distinto
+    used = set(COLS_CLIENTES + COLS_TARJETAS + _TARJETA_HINTS + _CLIENTE_HINTS + _ORIGIN_COLS + _ERROR_COLS)
+    for c in df.columns:
+        if c not in used or not is_text(df[c]):
+            continue
+        codes, uniques = pd.factorize(df[c], use_na_sentinel=True)
+        blank = np.array([isinstance(v, str) and not v.strip() for v in uniques] + [False])[codes]
+        if blank.any():
+            df[c] = df[c].where(~blank, pd.NA)
+    return df
+
+
+def _split_rejected(errors_df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
     # Separar por origen (preferente). Si falla, por columnas.
     df_c = pd.DataFrame()
     df_t = pd.DataFrame()
 
+    # Detectar columna “origen”
+    origin_col = next((c for c in _ORIGIN_COLS if c in errors_df.columns), None)
     if origin_col is not None:
         origin_series = errors_df[origin_col].astype(str)
         is_clientes = origin_series.str.contains(r"clientes", case=False, na=False)
@@ -73,8 +79,8 @@ def write_rows_rejected_clientes_tarjetas(
 
     if df_c.empty and df_t.empty:
         cols = set(errors_df.columns.str.lower())
-        tiene_tarjetas = any(c in cols for c in ["numero_tarjeta", "numero_tarjeta_masked", "numero_tarjeta_hash", "cvv", "fecha_exp"])
-        tiene_clientes = any(c in cols for c in ["dni", "correo", "telefono", "apellido1", "apellido2", "nombre"])
+        tiene_tarjetas = any(c in cols for c in _TARJETA_HINTS)
+        tiene_clientes = any(c in cols for c in _CLIENTE_HINTS)
 
         if tiene_tarjetas and not tiene_clientes:
             df_t = errors_df.copy()
@@ -82,7 +88,7 @@ def write_rows_rejected_clientes_tarjetas(
             df_c = errors_df.copy()
         else:
             # Intento por fila si hay campos de tarjeta
-            candidates = [c for c in ["numero_tarjeta", "numero_tarjeta_masked", "numero_tarjeta_hash", "cvv", "fecha_exp"] if c in errors_df.columns]
+            candidates = [c for c in _TARJETA_HINTS if c in errors_df.columns]
             if candidates:
                 mask_t = errors_df[candidates].notna().any(axis=1)
                 df_t = errors_df[mask_t].copy()
@@ -90,59 +96,143 @@ def write_rows_rejected_clientes_tarjetas(
             else:
                 df_c = errors_df.copy()
 
-    #  Columnas deseadas EXACTAS
-    cols_clientes = [
-        "cod_cliente", "nombre", "apellido1", "apellido2", "dni", "correo", "telefono",
-        "DNI_OK", "DNI_KO", "Telefono_OK", "Telefono_KO", "Correo_OK", "Correo_KO"
-    ]
-    cols_tarjetas = ["cod_cliente", "fecha_exp", "numero_tarjeta_masked", "numero_tarjeta_hash"]
+    return df_c, df_t
 
+
+def _get_error_series(df: pd.DataFrame):
     # Obtener texto de error (error_detalle)
-    def _get_error_series(df: pd.DataFrame):
-        if "motivo" in df.columns:
-            return df["motivo"].astype(str)
-        if "error_detalle" in df.columns:
-            return df["error_detalle"].astype(str)
-        if "error" in df.columns:
-            return df["error"].astype(str)
-        return pd.Series([""] * len(df), index=df.index)
+    for c in _ERROR_COLS:
+        if c in df.columns:
+            return df[c].astype(str)
+    return pd.Series([""] * len(df), index=df.index)
 
-    def _select_exact(df: pd.DataFrame, cols: list[str], add_error: bool = True) -> pd.DataFrame:
-        if df is None or df.empty:
-            return pd.DataFrame(columns=cols + (["error"] if add_error else []))
 
-        # Asegurar columnas
-        for c in cols:
-            if c not in df.columns:
-                df[c] = pd.NA
+def _select_exact(df: pd.DataFrame, cols: list[str], include_motivo: bool = True) -> pd.DataFrame:
+    if df is None or df.empty:
+        return pd.DataFrame(columns=cols + ["error"])
 
-        out = df[cols].copy()
+    # Asegurar columnas
+    for c in cols:
+        if c not in df.columns:
+            df[c] = pd.NA
 
-        # Añadir error al final
-        if add_error and include_motivo:
-            out["error"] = _get_error_series(df)
+    out = df[cols].copy()
 
-        return out
+    # Añadir error al final
+    if include_motivo:
+        out["error"] = _get_error_series(df)
 
-    out_clientes = _select_exact(df_c, cols_clientes, add_error=True)
-    out_tarjetas = _select_exact(df_t, cols_tarjetas, add_error=True)
+    return out
 
-    # Guardar (sobrescribe cada run)
-    path_c = out_dir / "Clientes.rows_rejected.csv"
-    path_t = out_dir / "Tarjetas.rows_rejected.csv"
 
-    if len(out_clientes) > 0:
-        out_clientes.to_csv(path_c, index=False, encoding="utf-8", sep=";")
-        if logger:
-            logger.warning(f"Generado {path_c} -> {len(out_clientes)} filas rechazadas (CLIENTES)")
-    else:
+def _prepare(errors_df: pd.DataFrame, include_motivo: bool = True) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # DataFrames de rechazadas -> (CLIENTES, TARJETAS) con el esquema fijo
+    errors_df = _blank_to_na(_normalize_cols(to_text(errors_df)))
+    df_c, df_t = _split_rejected(errors_df)
+    return _select_exact(df_c, COLS_CLIENTES, include_motivo), _select_exact(df_t, COLS_TARJETAS, include_motivo)
+
+
+def write_rows_rejected_clientes_tarjetas(
+        error_dfs: list[pd.DataFrame],
+        output_dir: str = "errors",
+        include_motivo: bool = True,
+        logger=None,
+        output_format: str | None = None,
+):
+    # Combina dataframes de errores y genera CSV separados para CLIENTES y TARJETAS
+    # output_format: csv (por defecto), parquet o feather (ver etl/formats.py)
+    # Para ir escribiendo a medida que se valida, sin juntar todo en memoria: RejectedSink
+    output_format = check_format(output_format)
+    if not error_dfs:
         if logger:
-            logger.info("CLIENTES: no hay filas rechazadas. No se genera CSV.")
+            logger.info("No hay filas erróneas. No se generan CSV de rechazadas.")
+        return
 
+    out_dir = Path(output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    out_clientes, out_tarjetas = _prepare(pd.concat(error_dfs, ignore_index=True), include_motivo)
+
+    # Guardar (sobrescribe cada run)
+    name_c, name_t = rejected_file_names(output_format)
+    path_c = out_dir / name_c
+    path_t = out_dir / name_t
+
+    if len(out_clientes) > 0:
+        write_frame(out_clientes, path_c, output_format)
     if len(out_tarjetas) > 0:
-        out_tarjetas.to_csv(path_t, index=False, encoding="utf-8", sep=";")
-        if logger:
-            logger.warning(f"Generado {path_t} -> {len(out_tarjetas)} filas rechazadas (TARJETAS)")
+        write_frame(out_tarjetas, path_t, output_format)
+    _log_generated(logger, path_c, len(out_clientes), path_t, len(out_tarjetas))
+
+
+def _log_generated(logger, path_c: Path, n_c: int, path_t: Path, n_t: int):
+    if not logger:
+        return
+    if n_c > 0:
+        logger.warning(f"Generado {path_c} -> {n_c} filas rechazadas (CLIENTES)")
     else:
-        if logger:
-            logger.info("TARJETAS: no hay filas rechazadas. No se genera CSV.")
+        logger.info("CLIENTES: no hay filas rechazadas. No se genera CSV.")
+    if n_t > 0:
+        logger.warning(f"Generado {path_t} -> {n_t} filas rechazadas (TARJETAS)")
+    else:
+        logger.info("TARJETAS: no hay filas rechazadas. No se genera CSV.")
+
+
+class RejectedSink:
+    """
+    Escritura incremental de rechazadas: cada lote de errores de un validador se
+    separa en CLIENTES/TARJETAS y se añade en ese momento a su fichero, con el
+    esquema fijo (COLS_CLIENTES / COLS_TARJETAS + error). La memoria depende del
+    lote, no del total de rechazadas. Los ficheros se crean (sobrescribiendo) con
+    la primera fila; si no hay rechazadas de un tipo no se genera su fichero.
+
+        with RejectedSink("errors", "csv") as sink:
+            sink.write(errs)
+    """
+
+    def __init__(self, output_dir: Path, output_format: str | None = None, include_motivo: bool = True):
+        self.output_format = check_format(output_format)
+        self.dir = Path(output_dir)
+        self.include_motivo = include_motivo
+        name_c, name_t = rejected_file_names(self.output_format)
+        self.paths = {"CLIENTES": self.dir / name_c, "TARJETAS": self.dir / name_t}
+        self.counts = {"CLIENTES": 0, "TARJETAS": 0}
+        self._writers = {}
+
+    def write(self, error_dfs: list[pd.DataFrame]) -> int:
+        # Devuelve el número de filas escritas
+        written = 0
+        for df in error_dfs:
+            if df is None or df.empty:
+                continue
+            out_c, out_t = _prepare(df.copy(), self.include_motivo)
+            for title, out in (("CLIENTES", out_c), ("TARJETAS", out_t)):
+                if out.empty:
+                    continue
+                if title not in self._writers:
+                    self.dir.mkdir(parents=True, exist_ok=True)
+                    self._writers[title] = FrameWriter(self.paths[title], self.output_format)
+                self._writers[title].write(out)
+                self.counts[title] += len(out)
+                written += len(out)
+        return written
+
+    def close(self, logger=None):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+        if any(self.counts.values()):
+            _log_generated(logger, self.paths["CLIENTES"], self.counts["CLIENTES"],
+                           self.paths["TARJETAS"], self.counts["TARJETAS"])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def rejected_file_names(output_format: str = "csv") -> tuple[str, str]:
+    # Nombres de los ficheros de rechazadas (CLIENTES, TARJETAS) para un formato
+    ext = suffix(output_format)
+    return f"Clientes.rows_rejected{ext}", f"Tarjetas.rows_rejected{ext}"
@@ -0,0 +1,204 @@
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+from etl.schema import to_text
+from etl.settings import OUTPUT_FORMAT, OUTPUT_FORMATS
+
+
+_SUFFIXES = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+_COMPRESSION = "zstd"
+
+
+def check_format(fmt: str | None) -> str:
+    fmt = fmt or OUTPUT_FORMAT
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Formato de salida desconocido: {fmt!r} (opciones: {OUTPUT_FORMATS})")
+    if fmt != "csv":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError(f"El formato {fmt!r} necesita pyarrow (pip install pyarrow)") from e
+    return fmt
+
+
+def suffix(fmt: str) -> str:
+    return _SUFFIXES[fmt]
+
+
+def format_of(path: Path) -> str:
+    ext = Path(path).suffix.lower()
+    for fmt, sfx in _SUFFIXES.items():
+        if sfx == ext:
+            return fmt
+    raise ValueError(f"Formato de fichero desconocido: {Path(path).name}")
+
+
+def _to_arrow(df: pd.DataFrame, schema=None):
+    # Todas las columnas como texto (igual que en CSV), con nulos reales en vez de ''
+    import pyarrow as pa
+
+    if schema is None:
+        schema = pa.schema([(str(c), pa.string()) for c in df.columns])
+    table = pa.Table.from_pandas(df.astype("string"), schema=schema, preserve_index=False)
+    # Sin metadatos de pandas: al leer se obtienen columnas object con None, como en CSV
+    return table.replace_schema_metadata(None)
+
+
+def read_frame(path: Path) -> pd.DataFrame:
+    # Lee un fichero cleaned/rechazadas en cualquiera de los formatos (columnas de texto)
+    path = Path(path)
+    fmt = format_of(path)
+    if fmt == "parquet":
+        return pd.read_parquet(path)
+    if fmt == "feather":
+        return pd.read_feather(path)
+    return pd.read_csv(path, dtype=str, sep=";", encoding="utf-8")
+
+
+def write_frame(df: pd.DataFrame, path: Path, fmt: str | None = None):
+    # Columnas tipadas (etl/schema.py) -> texto y flags Y/N, igual en los tres formatos
+    df = to_text(df)
+    path = Path(path)
+    fmt = fmt or format_of(path)
+    if fmt == "csv":
+        df.to_csv(path, index=False, sep=";", encoding="utf-8")
+        return
+
+    with FrameWriter(path, fmt) as writer:
+        writer.write(df)
+
+
+def append_files(srcs: list[Path], dst: Path):
+    """
+    Añade a dst el contenido de varios ficheros de su mismo formato, en orden y
+    bloque a bloque (sin cargar ninguno entero). En parquet/feather, que no admiten
+    append, dst se reescribe una sola vez para todos ellos.
+    """
+    dst = Path(dst)
+    fmt = format_of(dst)
+    if fmt == "csv":
+        write_header = not dst.exists() or dst.stat().st_size == 0
+        with open(dst, "a", encoding="utf-8", newline="") as fout:
+            for src in srcs:
+                with open(src, "r", encoding="utf-8", newline="") as fin:
+                    header = fin.readline()
+                    if write_header:
+                        fout.write(header)
+                        write_header = False
+                    shutil.copyfileobj(fin, fout)
+        return
+
+    with _Rewriter(dst, fmt) as writer:
+        for src in srcs:
+            writer.write_file(src)
+
+
+def _batches(path: Path, fmt: str):
+    # Bloques (pyarrow.RecordBatch) de un fichero parquet/feather
+    import pyarrow as pa
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        yield from pq.ParquetFile(path).iter_batches()
+        return
+    with pa.memory_map(str(path)) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+
+
+class FrameWriter:
+    """
+    Escribe un fichero a partir de varios DataFrames con las mismas columnas
+    (modo streaming). El esquema se fija con el primer bloque.
+    """
+
+    def __init__(self, path: Path, fmt: str):
+        self.path = Path(path)
+        self.fmt = fmt
+        self._writer = None
+        self._schema = None
+        self._first = True
+
+    def write(self, df: pd.DataFrame):
+        df = to_text(df)
+        if self.fmt == "csv":
+            df.to_csv(self.path, index=False, sep=";", encoding="utf-8",
+                      mode="w" if self._first else "a", header=self._first)
+            self._first = False
+            return
+
+        table = _to_arrow(df, self._schema)
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = self._open(table.schema)
+        self._writer.write_table(table)
+
+    def write_file(self, src: Path):
+        # Añade el contenido de un fichero del mismo formato, bloque a bloque
+        if self.fmt == "csv":
+            with open(src, "r", encoding="utf-8", newline="") as fin:
+                header = fin.readline()
+                with open(self.path, "w" if self._first else "a", encoding="utf-8", newline="") as fout:
+                    if self._first:
+                        fout.write(header)
+                    shutil.copyfileobj(fin, fout)
+            self._first = False
+            return
+
+        import pyarrow as pa
+
+        for batch in _batches(Path(src), self.fmt):
+            table = pa.Table.from_batches([batch])
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = self._open(table.schema)
+            self._writer.write_table(table)
+
+    def _open(self, schema):
+        import pyarrow as pa
+
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(self.path, schema, compression=_COMPRESSION)
+        options = pa.ipc.IpcWriteOptions(compression=_COMPRESSION)
+        return pa.ipc.new_file(self.path, schema, options=options)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Rewriter(FrameWriter):
+    """
+    FrameWriter sobre un temporal que empieza con el contenido actual de `path` y
+    lo sustituye al cerrar (append en formatos que no lo admiten).
+    """
+
+    def __init__(self, path: Path, fmt: str):
+        self.target = Path(path)
+        super().__init__(self.target.with_name(self.target.name + ".tmp"), fmt)
+        if self.target.exists() and self.target.stat().st_size > 0:
+            self.write_file(self.target)
+
+    def close(self):
+        super().close()
+        if self.path.exists():
+            self.path.replace(self.target)
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+            return
+        # Con error se deja `path` como estaba
+        FrameWriter.close(self)
+        self.path.unlink(missing_ok=True)
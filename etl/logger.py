@@ -1,12 +1,70 @@
+import atexit
+import copy
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
+# Con ETL_LOG_QUEUE=1 los logs solo se encolan: un hilo aparte (QueueListener) les da
+# formato y los escribe en fichero y consola, fuera del camino del procesamiento
+LOG_QUEUE = os.getenv("ETL_LOG_QUEUE", "0").strip() != "0"
+
+# Formato del fichero de log: "text" (el de siempre) o "json" (un objeto por línea)
+LOG_FORMATS = ("text", "json")
+LOG_FORMAT = os.getenv("ETL_LOG_FORMAT", "text").strip().lower()
+
+_listeners = []
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro: time, level, message y, si lo hay, exception."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _QueueHandler(QueueHandler):
+    # La cola es del mismo proceso: se fija el texto del mensaje (por si cambian sus
+    # argumentos) y el resto del formato (fecha, traceback) lo hace el listener
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _stop_listeners():
+    # Vacía la cola y espera a que se escriba todo lo pendiente (también al salir)
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(_stop_listeners)
+
+
 def setup_logger(
         name: str = "etl",
         log_file: str = "logs/etl.log",
-        level: int = logging.INFO
+        level: int = logging.INFO,
+        use_queue: bool | None = None,
+        log_format: str | None = None,
 ) -> logging.Logger:
+    log_format = log_format or LOG_FORMAT
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"Formato de log desconocido: {log_format!r} (opciones: {LOG_FORMATS})")
+    use_queue = LOG_QUEUE if use_queue is None else use_queue
+
     Path(log_file).parent.mkdir(parents=True, exist_ok=True)
 
     logger = logging.getLogger(name)
@@ -24,12 +82,20 @@ def setup_logger(
         backupCount=5,
         encoding="utf-8"
     )
-    file_handler.setFormatter(fmt)
+    file_handler.setFormatter(JsonFormatter() if log_format == "json" else fmt)
 
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(fmt)
 
+    if use_queue:
+        records = queue.SimpleQueue()
+        listener = QueueListener(records, file_handler, console_handler, respect_handler_level=True)
+        listener.start()
+        _listeners.append(listener)
+        logger.addHandler(_QueueHandler(records))
+        return logger
+
     logger.addHandler(file_handler)
     logger.addHandler(console_handler)
 
-    return logger
\ No newline at end of file
+    return logger
@@ -0,0 +1,320 @@
+import cProfile
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Etapas que mide el pipeline
+STAGES = ("discovery", "read", "profile", "clean", "validate", "write", "errors", "load")
+
+# Prefijo de las mediciones de reglas de validación (etl/rules.py) en el informe
+RULE_PREFIX = "rule:"
+
+# Informe de ejecución por etapas (tiempo, CPU, memoria, filas) del proceso actual.
+# Si no se ha llamado a start(), stage() no mide nada.
+_current = None
+
+
+def _rss_peak_mb(who=None) -> float | None:
+    # Pico de memoria residente del proceso (o de sus hijos). En Linux baja con
+    # _reset_hwm(): el pico del proceso entero lo lleva RunReport
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# Pico de RSS por etapa: en Linux el pico del proceso (VmHWM) se pone a cero al
+# empezar cada etapa (escribiendo "5" en /proc/self/clear_refs) y se lee al terminar.
+# ru_maxrss nunca baja, así que sin esto todas las etapas posteriores a la de más
+# memoria darían el mismo valor. En otros sistemas la etapa queda sin pico (None).
+_STATUS = "/proc/self/status"
+_CLEAR_REFS = "/proc/self/clear_refs"
+
+
+def _hwm_mb() -> float | None:
+    # VmHWM: pico de RSS desde la última puesta a cero (Linux)
+    try:
+        with open(_STATUS, "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _reset_hwm() -> bool:
+    try:
+        with open(_CLEAR_REFS, "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class RunReport:
+    """
+    Acumula métricas por (etapa, fichero): llamadas, tiempo real, tiempo de CPU,
+    filas de entrada/salida y pico de RSS durante la etapa (el mayor de sus
+    llamadas; solo en Linux, ver _hwm_mb). Opcionalmente
+    perfila con cProfile y/o mide el pico de tracemalloc de las etapas indicadas.
+    """
+
+    def __init__(self, profile: set[str] = frozenset(), tracemalloc_stages: set[str] = frozenset(),
+                 profile_dir: Path | None = None):
+        self.profile = set(profile)
+        self.tracemalloc_stages = set(tracemalloc_stages)
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.current_file = None
+        self.started_at = datetime.now()
+        self._t0 = time.perf_counter()
+        self._c0 = time.process_time()
+        self._records = {}
+        self._profilers = {}
+        self.sections = {}
+        # Pico de RSS del proceso antes de la última puesta a cero, picos parciales
+        # de las etapas abiertas y mayor pico de etapa de los workers
+        self._peak_mb = 0.0
+        self._open_peaks = []
+        self._children_peak_mb = 0.0
+
+    def config(self) -> dict:
+        # Configuración para repetir las mismas mediciones en un worker
+        return {
+            "profile": sorted(self.profile),
+            "tracemalloc_stages": sorted(self.tracemalloc_stages),
+            "profile_dir": str(self.profile_dir) if self.profile_dir else None,
+        }
+
+    def _record(self, name: str, file: str | None) -> dict:
+        key = (name, file)
+        if key not in self._records:
+            self._records[key] = {
+                "stage": name, "file": file, "calls": 0, "wall_s": 0.0, "cpu_s": 0.0,
+                "rows_in": None, "rows_out": None, "rss_peak_mb": None,
+            }
+        return self._records[key]
+
+    @contextmanager
+    def stage(self, name: str, file: str | None = None, rows_in: int | None = None):
+        file = file if file is not None else self.current_file
+        info = {"rows_in": rows_in, "rows_out": None}
+
+        profiler = None
+        if name in self.profile or "all" in self.profile:
+            profiler = self._profilers.setdefault((name, file), cProfile.Profile())
+        trace = (name in self.tracemalloc_stages or "all" in self.tracemalloc_stages) and not tracemalloc.is_tracing()
+        if trace:
+            tracemalloc.start()
+
+        self._open_peaks.append(self._start_peak())
+        t0, c0 = time.perf_counter(), time.process_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield info
+        finally:
+            if profiler:
+                profiler.disable()
+            wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+            peak = self._open_peaks.pop()
+
+            rec = self._record(name, file)
+            rec["calls"] += 1
+            rec["wall_s"] += wall
+            rec["cpu_s"] += cpu
+            for k in ("rows_in", "rows_out"):
+                if info.get(k) is not None:
+                    rec[k] = (rec[k] or 0) + int(info[k])
+            if peak is not None:
+                peak = round(max(peak, _hwm_mb() or 0.0), 1)
+                rec["rss_peak_mb"] = max(rec["rss_peak_mb"] or 0.0, peak)
+            if trace:
+                peak = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+                tracemalloc.stop()
+                rec["tracemalloc_peak_mb"] = max(rec.get("tracemalloc_peak_mb", 0.0), peak)
+
+    def _start_peak(self) -> float | None:
+        # Guarda el pico hasta ahora (proceso y etapas abiertas) y lo pone a cero.
+        # Devuelve el pico parcial de la etapa que empieza (None si no se puede medir)
+        hwm = _hwm_mb()
+        if hwm is None or not _reset_hwm():
+            return None
+        self._peak_mb = max(self._peak_mb, hwm)
+        self._open_peaks[:] = [None if p is None else max(p, hwm) for p in self._open_peaks]
+        return 0.0
+
+    def peak_mb(self) -> float | None:
+        # Pico de RSS del proceso desde que arrancó, contando las puestas a cero
+        peak = max(self._peak_mb, _hwm_mb() or 0.0, _rss_peak_mb() or 0.0)
+        return round(peak, 1) if peak else None
+
+    def add(self, name: str, wall_s: float, cpu_s: float = 0.0, file: str | None = None,
+            rows_in: int | None = None, rows_out: int | None = None):
+        # Suma una medición hecha fuera de stage() (p. ej. cada regla de validación)
+        rec = self._record(name, file if file is not None else self.current_file)
+        rec["calls"] += 1
+        rec["wall_s"] += wall_s
+        rec["cpu_s"] += cpu_s
+        for k, v in (("rows_in", rows_in), ("rows_out", rows_out)):
+            if v is not None:
+                rec[k] = (rec[k] or 0) + int(v)
+
+    def records(self) -> list[dict]:
+        out = []
+        for rec in self._records.values():
+            rec = dict(rec)
+            rec["wall_s"] = round(rec["wall_s"], 4)
+            rec["cpu_s"] = round(rec["cpu_s"], 4)
+            out.append(rec)
+        return out
+
+    def merge(self, records: list[dict]):
+        # Añade las métricas devueltas por un worker
+        for r in records:
+            rec = self._record(r["stage"], r["file"])
+            rec["calls"] += r["calls"]
+            rec["wall_s"] += r["wall_s"]
+            rec["cpu_s"] += r["cpu_s"]
+            for k in ("rows_in", "rows_out"):
+                if r[k] is not None:
+                    rec[k] = (rec[k] or 0) + r[k]
+            for k in ("rss_peak_mb", "tracemalloc_peak_mb"):
+                if r.get(k) is not None:
+                    rec[k] = max(rec.get(k) or 0.0, r[k])
+            if r.get("rss_peak_mb") is not None:
+                self._children_peak_mb = max(self._children_peak_mb, r["rss_peak_mb"])
+
+    def dump_profiles(self):
+        # Un .prof por etapa y fichero (se abre con pstats o snakeviz)
+        if not self._profilers or self.profile_dir is None:
+            return
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        for (name, file), profiler in self._profilers.items():
+            stem = name if file is None else f"{name}__{Path(file).stem}"
+            profiler.dump_stats(str(self.profile_dir / f"{stem}.prof"))
+        self._profilers.clear()
+
+    def totals(self) -> dict:
+        # Suma por etapa de todos los ficheros
+        out = {}
+        for rec in self.records():
+            t = out.setdefault(rec["stage"], {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "rows_in": None, "rows_out": None})
+            t["calls"] += rec["calls"]
+            t["wall_s"] = round(t["wall_s"] + rec["wall_s"], 4)
+            t["cpu_s"] = round(t["cpu_s"] + rec["cpu_s"], 4)
+            for k in ("rows_in", "rows_out"):
+                if rec[k] is not None:
+                    t[k] = (t[k] or 0) + rec[k]
+        return out
+
+    def _children_peak(self) -> float:
+        # Los workers también ponen a cero su pico: se completa con el de sus etapas
+        return max(_rss_peak_mb(resource.RUSAGE_CHILDREN), self._children_peak_mb)
+
+    def to_dict(self, options: dict | None = None) -> dict:
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "wall_s": round(time.perf_counter() - self._t0, 4),
+            "cpu_s": round(time.process_time() - self._c0, 4),
+            "rss_peak_mb": self.peak_mb(),
+            "rss_peak_children_mb": self._children_peak() if resource else None,
+            "options": options or {},
+            "totals": self.totals(),
+            "stages": self.records(),
+            **self.sections,
+        }
+
+    def write(self, path: Path, options: dict | None = None) -> dict:
+        report = self.to_dict(options)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".part")
+        tmp.write_text(json.dumps(report, indent=2, ensure_ascii=False, default=str), encoding="utf-8")
+        tmp.replace(path)
+        return report
+
+
+def start(profile=(), tracemalloc_stages=(), profile_dir=None) -> RunReport:
+    global _current
+    _current = RunReport(profile, tracemalloc_stages, profile_dir)
+    return _current
+
+
+def current() -> RunReport | None:
+    return _current
+
+
+def stop() -> RunReport | None:
+    # Termina la medición en este proceso y guarda los perfiles pendientes
+    global _current
+    report, _current = _current, None
+    if report is not None:
+        report.dump_profiles()
+    return report
+
+
+@contextmanager
+def stage(name: str, file: str | None = None, rows_in: int | None = None):
+    """
+    Mide una etapa. Uso:
+
+        with metrics.stage("clean", rows_in=len(df)) as st:
+            df = clean(df)
+            st["rows_out"] = len(df)
+    """
+    if _current is None:
+        yield {}
+        return
+    with _current.stage(name, file, rows_in) as info:
+        yield info
+
+
+def add(name: str, wall_s: float, cpu_s: float = 0.0, file: str | None = None,
+        rows_in: int | None = None, rows_out: int | None = None):
+    # Como stage(), para tiempos medidos por el llamador; sin start() no hace nada
+    if _current is not None:
+        _current.add(name, wall_s, cpu_s, file, rows_in, rows_out)
+
+
+def section(name: str, data):
+    # Añade al informe un apartado propio (p. ej. el perfil de los datos); sin start() no hace nada
+    if _current is not None:
+        _current.sections[name] = data
+
+
+@contextmanager
+def for_file(name: str):
+    # Las etapas sin fichero explícito dentro del bloque se asignan a `name`
+    if _current is None:
+        yield
+        return
+    previous, _current.current_file = _current.current_file, name
+    try:
+        yield
+    finally:
+        _current.current_file = previous
+
+
+def iter_stage(name: str, iterable, file: str | None = None):
+    # Mide cada next() de un iterador de DataFrames (lectura por bloques) como la etapa `name`
+    it = iter(iterable)
+    while True:
+        with stage(name, file) as info:
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            info["rows_out"] = len(item)
+        yield item
@@ -0,0 +1,230 @@
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+# Perfil de calidad de los datos de entrada (tras la lectura), calculado en la misma
+# pasada que la limpieza y con memoria acotada por columna, sea cual sea el tamaño
+# del fichero:
+#
+#   nulos       filas y nulos (None tras normalizar "null", "n/a", ...)
+#   distintos   aproximados con HyperLogLog (2^12 registros, ~1,6 % de error)
+#   top_k       valores más frecuentes con un resumen Misra-Gries (familia
+#               space-saving) de _TOP_CAPACITY contadores; los recuentos son cotas
+#               inferiores con un error máximo de top_k_error
+#   longitudes  histograma exacto de longitudes hasta _MAX_LEN (el resto en ">N")
+#
+# Los perfiles de varios bloques, ficheros o workers se combinan con merge(): el
+# resultado no depende de cómo se haya partido la entrada (salvo en top_k, cuyas
+# cotas siguen valiendo). Los valores de las columnas con datos personales no llegan
+# en claro a top_k (ni al estado que se guarda en caché o viaja entre workers): se
+# cuenta su forma (dígitos 9, letras X) en vez del valor.
+
+_HLL_BITS = 12
+_TOP_CAPACITY = 256
+TOP_K = 10
+_MAX_LEN = 64
+
+SENSITIVE_COLUMNS = {"numero_tarjeta", "cvv", "dni", "correo", "telefono", "nombre", "apellido1", "apellido2"}
+
+_RX_DIGIT = re.compile(r"\d")
+_RX_LETTER = re.compile(r"[^\W\d_]")
+
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    # int.bit_length() de un array uint64 (frexp es exacto por debajo de 2^53)
+    hi = np.frexp((x >> np.uint64(32)).astype(np.float64))[1]
+    lo = np.frexp((x & np.uint64(0xFFFFFFFF)).astype(np.float64))[1]
+    return np.where(hi > 0, hi + 32, lo)
+
+
+class HyperLogLog:
+    """Estimador de valores distintos sobre hashes de 64 bits."""
+
+    def __init__(self, bits: int = _HLL_BITS, registers: np.ndarray | None = None):
+        self.bits = bits
+        self.registers = np.zeros(1 << bits, dtype=np.uint8) if registers is None else registers
+
+    def add(self, hashes: np.ndarray):
+        if not len(hashes):
+            return
+        rest_bits = 64 - self.bits
+        idx = (hashes >> np.uint64(rest_bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        rank = (rest_bits + 1 - _bit_length(rest)).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Pocos valores: conteo lineal de registros vacíos
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+
+class FrequentValues:
+    """
+    Resumen Misra-Gries de los valores más frecuentes: como mucho `capacity`
+    contadores. Al sobrepasarlos se resta a todos el recuento número capacity+1 y
+    se descartan los que quedan a 0; `error` acumula lo restado (cota del error).
+    """
+
+    def __init__(self, capacity: int = _TOP_CAPACITY):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.error = 0
+
+    def add(self, values: np.ndarray, counts: np.ndarray):
+        # Primero se reduce el bloque a `capacity` contadores (con numpy), después se combina
+        if len(counts) > self.capacity:
+            cut = self._cut(counts)
+            keep = counts > cut
+            values, counts = values[keep], counts[keep] - cut
+            self.error += int(cut)
+        self._combine(pd.Series(counts, index=pd.Index(values, dtype=object), dtype=np.int64))
+
+    def _cut(self, counts: np.ndarray) -> int:
+        # Recuento número capacity+1 de mayor a menor
+        k = len(counts) - self.capacity - 1
+        return int(np.partition(counts, k)[k])
+
+    def merge(self, other: "FrequentValues"):
+        self.error += other.error
+        self._combine(other.counts)
+
+    def _combine(self, counts: pd.Series):
+        if len(self.counts):
+            counts = pd.concat([self.counts, counts]).groupby(level=0, sort=False).sum()
+        if len(counts) > self.capacity:
+            cut = self._cut(counts.to_numpy())
+            counts = counts[counts > cut] - cut
+            self.error += cut
+        self.counts = counts
+
+    def top(self, k: int = TOP_K) -> list[tuple[str, int]]:
+        # Más frecuentes primero; a igual recuento, por valor (orden estable)
+        items = sorted(self.counts.items(), key=lambda kv: (-kv[1], kv[0]))
+        return [(str(v), int(c)) for v, c in items[:k]]
+
+
+class ColumnProfile:
+    def __init__(self, sensitive: bool = False):
+        self.sensitive = sensitive
+        self.rows = 0
+        self.nulls = 0
+        self.distinct = HyperLogLog()
+        self.frequent = FrequentValues()
+        self.lengths = np.zeros(_MAX_LEN + 2, dtype=np.int64)
+
+    def update(self, col: pd.Series):
+        self.rows += len(col)
+        # Todo se calcula sobre los valores distintos del bloque y sus recuentos
+        codes, uniques = pd.factorize(col.to_numpy(dtype=object), use_na_sentinel=True)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        self.nulls += len(col) - int(counts.sum())
+        if not len(uniques):
+            return
+
+        self.distinct.add(pd.util.hash_array(uniques, categorize=False))
+        lengths = np.fromiter(map(len, uniques), dtype=np.int64, count=len(uniques))
+        self.lengths += np.bincount(np.minimum(lengths, _MAX_LEN + 1), weights=counts,
+                                    minlength=len(self.lengths)).astype(np.int64)
+        if self.sensitive:
+            # Recuentos por forma: el valor en claro no entra en el resumen
+            shapes = pd.Series(uniques, dtype=object).str.replace(_RX_DIGIT, "9", regex=True)
+            shapes = shapes.str.replace(_RX_LETTER, "X", regex=True)
+            grouped = pd.Series(counts).groupby(shapes.to_numpy(), sort=False).sum()
+            uniques, counts = grouped.index.to_numpy(dtype=object), grouped.to_numpy()
+        self.frequent.add(uniques, counts)
+
+    def merge(self, other: "ColumnProfile"):
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self.distinct.merge(other.distinct)
+        self.frequent.merge(other.frequent)
+        self.lengths += other.lengths
+
+    def summary(self) -> dict:
+        top = self.frequent.top()
+        hist = {(str(n) if n <= _MAX_LEN else f">{_MAX_LEN}"): int(c) for n, c in enumerate(self.lengths) if c}
+        return {
+            "rows": self.rows,
+            "nulls": self.nulls,
+            "null_rate": round(self.nulls / self.rows, 4) if self.rows else None,
+            "distinct_approx": self.distinct.estimate(),
+            "top_k": [{"value": v, "count": c} for v, c in top],
+            "top_k_error": self.frequent.error,
+            "lengths": hist,
+        }
+
+    def to_state(self) -> dict:
+        # Estado serializable a JSON (caché y resultados de los workers)
+        return {
+            "rows": self.rows,
+            "nulls": self.nulls,
+            "hll": self.distinct.registers.tobytes().hex(),
+            "top": [[str(v), int(c)] for v, c in self.frequent.counts.items()],
+            "top_error": self.frequent.error,
+            "lengths": self.lengths.tolist(),
+        }
+
+    @classmethod
+    def from_state(cls, state: dict, sensitive: bool = False) -> "ColumnProfile":
+        p = cls(sensitive)
+        p.rows = state["rows"]
+        p.nulls = state["nulls"]
+        p.distinct.registers = np.frombuffer(bytes.fromhex(state["hll"]), dtype=np.uint8).copy()
+        values = [v for v, _ in state["top"]]
+        p.frequent.counts = pd.Series([c for _, c in state["top"]], index=pd.Index(values, dtype=object),
+                                      dtype=np.int64)
+        p.frequent.error = state["top_error"]
+        p.lengths = np.asarray(state["lengths"], dtype=np.int64)
+        return p
+
+
+class FrameProfile:
+    """Perfil por columna de los DataFrames leídos de un tipo de fichero (CLIENTES o TARJETAS)."""
+
+    def __init__(self, files: int = 0):
+        self.files = files
+        self.columns: dict[str, ColumnProfile] = {}
+
+    def update(self, df: pd.DataFrame):
+        for i, name in enumerate(df.columns):
+            name = str(name)
+            if name not in self.columns:
+                self.columns[name] = ColumnProfile(name in SENSITIVE_COLUMNS)
+            self.columns[name].update(df.iloc[:, i])
+
+    def merge(self, other: "FrameProfile"):
+        self.files += other.files
+        for name, col in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(col)
+            else:
+                self.columns[name] = col
+
+    def summary(self) -> dict:
+        return {
+            "files": self.files,
+            "columns": {name: col.summary() for name, col in self.columns.items()},
+        }
+
+    def to_state(self) -> dict:
+        return {"files": self.files, "columns": {name: col.to_state() for name, col in self.columns.items()}}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "FrameProfile":
+        p = cls()
+        p.files = state["files"]
+        p.columns = {
+            name: ColumnProfile.from_state(col, name in SENSITIVE_COLUMNS) for name, col in state["columns"].items()
+        }
+        return p
@@ -1,77 +1,360 @@
+import numpy as np
 import pandas as pd
+import codecs
 import csv
+import io
+import mmap
+import os
 from pathlib import Path
 
+from etl.vector_utils import ASCII_SPACE_CHARS, STR_DTYPE, none_series
 
 _NULLS = {"", "null", "none", "nan", "na", "n/a"}
-# Leer CSV con formato especial (líneas entrecomilladas y separadas por ;)
+_ENCODINGS = ["utf-8-sig", "utf-8", "cp1252", "latin1"]
+
+# Tamaño por defecto de cada bloque en modo streaming (filas)
+CHUNK_SIZE = 100_000
+# Tamaño de lectura binaria para comprobar la codificación sin cargar el fichero
+# (y de cada bloque del fichero entrecomillado mapeado en memoria)
+_BLOCK_BYTES = 1 << 20
+# Prefijo que se lee para detectar codificación y dialecto
+_SNIFF_BYTES = 64 * 1024
+
+# Motor de parseo: "c" por defecto. "pyarrow" es opcional porque descarta (en vez de
+# rellenar) las filas con menos campos que la cabecera.
+_CSV_ENGINE = os.getenv("ETL_CSV_ENGINE", "c").strip().lower()
+
+DIALECT_PLAIN = "csv ;"
+DIALECT_QUOTED = "lineas entrecomilladas"
+
+
+def _resolve_engine() -> str:
+    if _CSV_ENGINE == "pyarrow":
+        try:
+            import pyarrow  # noqa: F401
+            return "pyarrow"
+        except ImportError:
+            pass
+    return "c"
+
 
-def _read_quoted_semicolon_lines(path: Path, encoding: str) -> pd.DataFrame:
-    rows = []
-    with open(path, "r", encoding=encoding, errors="strict") as f:
-        for line in f:
+class _UnquotedLines:
+    """
+    Fichero de texto de solo lectura que entrega cada línea sin espacios ni
+    comillas exteriores, para que el formato entrecomillado se parsee en una
+    sola pasada con el motor C.
+    """
+
+    def __init__(self, f):
+        self._f = f
+
+    def read(self, size: int = -1) -> str:
+        out = []
+        n = 0
+        for line in self._f:
             line = line.strip()
             if not line:
                 continue
             # quitar comillas exteriores si existen
             if len(line) >= 2 and line[0] == '"' and line[-1] == '"':
                 line = line[1:-1]
-            rows.append(line.split(";"))
+            out.append(line)
+            out.append("\n")
+            n += len(line) + 1
+            if 0 <= size <= n:
+                break
+        return "".join(out)
+
+
+_QUOTE, _LF, _CR = ord('"'), ord("\n"), ord("\r")
+_BOM = codecs.BOM_UTF8
+
+
+class _MappedUnquotedLines(io.BufferedIOBase):
+    """
+    Igual que _UnquotedLines, pero sobre el fichero mapeado en memoria (mmap) y
+    por bloques de ~1 MB terminados en salto de línea. Si todas las líneas del
+    bloque son "..." (o están vacías), las comillas exteriores se quitan de golpe
+    con numpy (una máscara sobre los bytes), sin decodificar: el parser C recibe
+    los bytes y la codificación (self.encoding). Un bloque con otras líneas
+    (espacios alrededor, sin comillas, CR sueltos) se procesa línea a línea como
+    en _UnquotedLines, así que el parser recibe las mismas líneas (con los \r\n
+    del fichero y sin añadir salto final, que no cambian el resultado). Las
+    codificaciones admitidas son compatibles con ASCII: las comillas, CR y LF
+    nunca forman parte de un carácter multibyte.
+    """
+
+    mode = "rb"
+
+    def __init__(self, path: Path, encoding: str):
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._bytes = np.frombuffer(self._map, dtype=np.uint8) if size else np.empty(0, dtype=np.uint8)
+        self._pos = 0
+        self._released = 0
+        # utf-8-sig: el BOM solo se quita al principio; el resto se lee como utf-8
+        self.encoding = encoding
+        if encoding == "utf-8-sig":
+            self.encoding = "utf-8"
+            if self._map is not None and self._map[:len(_BOM)] == _BOM:
+                self._pos = len(_BOM)
+
+    def read(self, size: int = -1) -> bytes:
+        start = self._pos
+        total = len(self._bytes)
+        if start >= total:
+            return b""
+        end = total if size < 0 else min(total, start + max(size, _BLOCK_BYTES))
+        if end < total:
+            nl = self._map.rfind(b"\n", start, end)
+            end = (nl if nl >= 0 else self._map.find(b"\n", end)) + 1 or total
+        self._pos = end
+        out = self._unquote(self._bytes[start:end])
+        self._release(end)
+        return out
+
+    def _release(self, end: int):
+        # Las páginas ya leídas se devuelven al sistema (siguen en la caché de
+        # ficheros): la memoria del proceso no crece con el tamaño del fichero
+        if not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        start = self._released
+        end -= end % mmap.PAGESIZE
+        if end > start:
+            self._map.madvise(mmap.MADV_DONTNEED, start, end - start)
+            self._released = end
+
+    def _unquote(self, block: np.ndarray) -> bytes:
+        # Inicio y fin (sin \r\n) de cada línea del bloque
+        nl = np.flatnonzero(block == _LF)
+        starts = np.concatenate(([0], nl + 1))
+        ends = np.concatenate((nl, [len(block)]))
+        if starts[-1] == len(block):
+            starts, ends = starts[:-1], ends[:-1]
+        crlf = (ends > starts) & (block[np.maximum(ends - 1, 0)] == _CR) & (ends < len(block))
+        ends = ends - crlf
+
+        lengths = ends - starts
+        quoted = lengths >= 2
+        quoted[quoted] = (block[starts[quoted]] == _QUOTE) & (block[ends[quoted] - 1] == _QUOTE)
+        regular = ((lengths == 0) | quoted).all() and np.count_nonzero(block == _CR) == crlf.sum()
+        if not regular:
+            text = bytes(block).decode(self.encoding, errors="strict")
+            return _UnquotedLines(io.StringIO(text, newline=None)).read().encode(self.encoding)
+
+        keep = np.ones(len(block), dtype=bool)
+        keep[starts[quoted]] = False
+        keep[ends[quoted] - 1] = False
+        return block[keep].tobytes()
+
+    read1 = read
+
+    def readable(self) -> bool:
+        return True
+
+    def close(self):
+        # El array apunta al mmap: se suelta antes de cerrarlo
+        if not self.closed:
+            self._bytes = None
+            if self._map is not None:
+                self._map.close()
+            self._file.close()
+        super().close()
+
+
+# Leer CSV con formato especial (líneas entrecomilladas y separadas por ;)
+# Tras quitar las comillas exteriores no queda entrecomillado: ';' siempre separa.
+_QUOTED_KWARGS = dict(
+    sep=";",
+    dtype=str,
+    on_bad_lines="skip",
+    engine="c",
+    quoting=csv.QUOTE_NONE,
+    keep_default_na=False,
+)
+
+
+def _read_quoted_semicolon_lines(path: Path, encoding: str, chunksize: int | None = None):
+    if chunksize is not None:
+        return _iter_quoted_semicolon_lines(path, encoding, chunksize)
+
+    with _MappedUnquotedLines(path, encoding) as f:
+        try:
+            return pd.read_csv(f, encoding=f.encoding, **_QUOTED_KWARGS)
+        except pd.errors.EmptyDataError:
+            return pd.DataFrame()
+
 
-    if not rows:
-        return pd.DataFrame()
+def _iter_quoted_semicolon_lines(path: Path, encoding: str, chunksize: int):
+    with _MappedUnquotedLines(path, encoding) as f:
+        try:
+            chunks = pd.read_csv(f, encoding=f.encoding, chunksize=chunksize, **_QUOTED_KWARGS)
+        except pd.errors.EmptyDataError:
+            return
+        yield from chunks
+
+
+def _read_plain(path: Path, encoding: str, engine: str, chunksize: int | None = None):
+    kwargs = dict(
+        sep=";",
+        encoding=encoding,
+        dtype=str,
+        on_bad_lines="skip",
+        engine=engine,
+        escapechar="\\",
+        keep_default_na=False,
+    )
+    if engine != "pyarrow":
+        kwargs["quoting"] = csv.QUOTE_MINIMAL
+    if chunksize is not None:
+        kwargs["chunksize"] = chunksize
+    return pd.read_csv(path, **kwargs)
+
+
+def _norm(x):
+    if x is None:
+        return None
+    s = str(x).strip()
+    return None if s.lower() in _NULLS else str(x)
+
+
+# Un nulo de _NULLS tiene como mucho 4 caracteres sin los espacios de los extremos
+_NULL_MAX_LEN = max(map(len, _NULLS))
+
+
+def _normalize_nulls(col: pd.Series) -> pd.Series:
+    """
+    Igual que col.map(_norm), pero por columna: con operaciones .str se marcan
+    los candidatos a nulo (nulos, valores de <= 4 caracteres sin los espacios
+    ASCII de los extremos, o con un carácter no ASCII en un extremo, que podría
+    ser un espacio Unicode) y solo a esos se les aplica _norm. El resto de
+    valores se devuelve tal cual, sin strip.
+    """
+    trimmed = col.astype(STR_DTYPE).str.strip(ASCII_SPACE_CHARS)
+    candidates = trimmed.isna().to_numpy()
+    if candidates.all():
+        return none_series(col.index)
+    masks = (
+        trimmed.str.len() <= _NULL_MAX_LEN,
+        trimmed.str.slice(0, 1) > "\x7f",
+        trimmed.str.slice(-1) > "\x7f",
+    )
+    for mask in masks:
+        candidates |= mask.fillna(False).to_numpy(dtype=bool)
+
+    values = col.to_numpy(dtype=object, copy=True)
+    values[candidates] = [_norm(x) for x in values[candidates]]
+    return pd.Series(values, index=col.index, dtype=object)
+
+
+def _normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # Normalizar columnas
+    df.columns = df.columns.str.replace("\ufeff", "", regex=False).str.strip()
+    if "cod cliente" in df.columns:
+        df.rename(columns={"cod cliente": "cod_cliente"}, inplace=True)
+
+    # Normalizar nulos (por posición: tras el strip puede haber columnas repetidas)
+    out = pd.DataFrame({i: _normalize_nulls(df.iloc[:, i]) for i in range(df.shape[1])}, index=df.index)
+    out.columns = df.columns
+    return out
+
+
+def _detect_encoding(path: Path) -> str:
+    # Decodifica el fichero por bloques (memoria acotada) y devuelve la primera codificación válida
+    last_err = None
+    for enc in _ENCODINGS:
+        decoder = codecs.getincrementaldecoder(enc)(errors="strict")
+        try:
+            with open(path, "rb") as f:
+                while block := f.read(_BLOCK_BYTES):
+                    decoder.decode(block)
+            decoder.decode(b"", final=True)
+            return enc
+        except UnicodeDecodeError as e:
+            last_err = e
+    raise last_err
+
+
+def _is_quoted_semicolon(text: str) -> bool:
+    # La cabecera entera entre comillas se lee como 1 sola columna que contiene ';'
+    for fields in csv.reader(text.splitlines(), delimiter=";", quotechar='"', escapechar="\\"):
+        if not fields:
+            continue
+        return len(fields) == 1 and ";" in fields[0]
+    return False
+
+
+def _sniff(path: Path, encoding: str | None = None) -> tuple[str, str]:
+    """
+    Lee una sola vez un prefijo acotado del fichero y devuelve (codificación, dialecto).
+    La codificación elegida es la primera de _ENCODINGS que decodifica el prefijo.
+    """
+    with open(path, "rb") as f:
+        prefix = f.read(_SNIFF_BYTES)
+    final = len(prefix) < _SNIFF_BYTES
+
+    text = None
+    for enc in [encoding] if encoding else _ENCODINGS:
+        try:
+            # el decoder incremental tolera un carácter multibyte cortado al final del prefijo
+            text = codecs.getincrementaldecoder(enc)(errors="strict").decode(prefix, final=final)
+            encoding = enc
+            break
+        except UnicodeDecodeError:
+            continue
+    if text is None:
+        text = prefix.decode(encoding, errors="replace")
 
-    header = [h.strip() for h in rows[0]]
-    data = rows[1:]
-    return pd.DataFrame(data, columns=header)
+    return encoding, DIALECT_QUOTED if _is_quoted_semicolon(text) else DIALECT_PLAIN
 
 
-def read_csv_safe(path):
+def read_csv_safe(path, logger=None):
     path = Path(path)
 
-    encodings = ["utf-8-sig", "utf-8", "cp1252", "latin1"]
+    sniffed, dialect = _sniff(path)
+    engine = "c" if dialect == DIALECT_QUOTED else _resolve_engine()
     last_err = None
 
-    for enc in encodings:
+    # Normalmente se parsea una sola vez; si el resto del fichero no casa con la
+    # codificación detectada en el prefijo, se prueban las siguientes.
+    for enc in _ENCODINGS[_ENCODINGS.index(sniffed):]:
         try:
-            df = pd.read_csv(
-                path,
-                sep=";",
-                encoding=enc,
-                dtype=str,
-                on_bad_lines="skip",
-                engine="python",
-                quoting=csv.QUOTE_MINIMAL,
-                escapechar="\\",
-                keep_default_na=False,
-            )
-
-            # Si pandas lo leyó como 1 sola columna → formato entrecomillado raro
-            if df.shape[1] == 1:
-                col = df.columns[0]
-                if ";" in col:
-                    df = _read_quoted_semicolon_lines(path, enc)
-
-            # Normalizar columnas
-            df.columns = df.columns.str.replace("\ufeff", "", regex=False).str.strip()
-            if "cod cliente" in df.columns:
-                df.rename(columns={"cod cliente": "cod_cliente"}, inplace=True)
-
-            # Normalizar nulos
-            def _norm(x):
-                if x is None:
-                    return None
-                s = str(x).strip()
-                return None if s.lower() in _NULLS else str(x)
-
-            if hasattr(df, "map"):
-                df = df.map(_norm)
+            if dialect == DIALECT_QUOTED:
+                df = _read_quoted_semicolon_lines(path, enc)
             else:
-                df = df.applymap(_norm)
+                df = _read_plain(path, enc, engine)
+
+            if logger:
+                logger.info(f"Lectura {path.name}: encoding={enc} dialecto='{dialect}' engine={engine}")
 
-            return df
+            return _normalize_frame(df)
 
         except Exception as e:
             last_err = e
 
     raise last_err
+
+
+def iter_csv_chunks(path, chunksize: int = CHUNK_SIZE, logger=None):
+    """
+    Modo streaming de read_csv_safe: devuelve un iterador de DataFrames de como
+    mucho `chunksize` filas, con la misma normalización de columnas y nulos.
+    La memoria depende del tamaño del bloque, no del tamaño del fichero.
+    """
+    path = Path(path)
+    # En streaming no se puede reintentar a mitad de fichero: la codificación se
+    # comprueba sobre el fichero entero antes de entregar el primer bloque.
+    enc, dialect = _sniff(path, encoding=_detect_encoding(path))
+
+    if logger:
+        logger.info(f"Lectura {path.name}: encoding={enc} dialecto='{dialect}' engine=c")
+
+    if dialect == DIALECT_QUOTED:
+        chunks = _read_quoted_semicolon_lines(path, enc, chunksize=chunksize)
+    else:
+        # pyarrow no admite lectura por bloques en pandas
+        chunks = _read_plain(path, enc, "c", chunksize=chunksize)
+
+    for df in chunks:
+        yield _normalize_frame(df)
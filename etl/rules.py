@@ -0,0 +1,458 @@
+import calendar
+import re
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import etl.metrics as metrics
+from etl.settings import CONFIG_FILE, VALIDATION_MODE, VALIDATION_MODES
+from etl.vector_utils import ASCII_SPACE, ASCII_SPACE_CHARS, RX_NON_ASCII, STR_DTYPE
+
+# Reglas de validación por campo, declaradas en config.yaml (sección `validacion`).
+# Cada campo tiene una lista de pasos de normalización y una lista de reglas; un
+# valor es válido si cumple todas. Las reglas se compilan una vez y se evalúan por
+# columna sobre los valores distintos: los ASCII con operaciones .str (Arrow si
+# está instalado) y los no ASCII, poco frecuentes, con `re` de Python, que es la
+# semántica de referencia (\d y \s Unicode, igual que los validadores fila a fila).
+#
+#   normalizar: strip | upper | lower | {quitar: <regex>}
+#   reglas:     {regex: <patrón>}                          fullmatch
+#               {longitud: {min: N, max: N}}               número de caracteres
+#               {rango: {min: X, max: X}}                  valor numérico
+#               {fecha: {formato: "%Y-%m", min: "1900-01", max: "2100-12"}}
+#               {luhn: true}                               dígito de control de tarjeta
+#               {letra_dni: true}                          letra de control del DNI (mod 23)
+#
+# Cada regla puede llevar `nombre` (por defecto, su tipo) para el informe. El fichero
+# (ETL_CONFIG) y el modo de validación soft/strict (ETL_VALIDATION_MODE, strict añade
+# la comprobación de Luhn de las tarjetas y la letra del DNI) están en etl/settings.py.
+
+# Campos que comprueban los validadores (cada uno tiene sus flags *_OK/*_KO y su motivo)
+FIELDS = {
+    "clientes": ("dni", "telefono", "correo"),
+    "tarjetas": ("cod_cliente", "fecha_exp", "card_clean"),
+}
+
+# Reglas por defecto: las mismas que los validadores fila a fila. Las columnas de
+# clientes llegan ya con strip/upper/lower hechos por validate_clientes. Quitar
+# separadores y comparar es lo mismo que un único patrón que los admita entre
+# caracteres, que es más rápido (una pasada en lugar de dos).
+DEFAULT_RULES = {
+    "clientes": {
+        "dni": {"reglas": [{"regex": r"[\s\-.]*(?:\d[\s\-.]*){8}[A-Z][\s\-.]*"}]},
+        "telefono": {"reglas": [{"regex": r"\D*(?:[0-9]\D*){9}"}]},
+        "correo": {"reglas": [{"regex": r"[^@]+@[^@]+\.[^@]+"}]},
+    },
+    "tarjetas": {
+        "cod_cliente": {"normalizar": ["strip"], "reglas": [{"regex": r"C\d{3}"}]},
+        "fecha_exp": {
+            "normalizar": ["strip"],
+            "reglas": [{"fecha": {"formato": "%Y-%m", "min": "1900-01", "max": "2100-12"}}],
+        },
+        "card_clean": {"normalizar": ["strip"], "reglas": [{"regex": r"\d+"}, {"longitud": {"min": 12}}]},
+    },
+}
+
+# Reglas que añade el modo strict (si el campo no las tiene ya)
+STRICT_RULES = {
+    "clientes": {"dni": [{"letra_dni": True}]},
+    "tarjetas": {"card_clean": [{"luhn": True}]},
+}
+
+def _ascii_pattern(pattern: str) -> str:
+    """
+    Patrón equivalente para texto ASCII en el motor de .str (RE2 con Arrow): \\s
+    de Python incluye \\v y \\x1c-\\x1f, que RE2 no considera espacios.
+    """
+    out = []
+    i = 0
+    in_class = False
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\" and i + 1 < len(pattern):
+            esc = pattern[i + 1]
+            if esc == "s":
+                out.append(ASCII_SPACE if in_class else f"[{ASCII_SPACE}]")
+            elif esc == "S" and not in_class:
+                out.append(f"[^{ASCII_SPACE}]")
+            elif esc == "S":
+                raise ValueError(f"\\S dentro de [] no está soportado: {pattern!r}")
+            else:
+                out.append(pattern[i:i + 2])
+            i += 2
+            continue
+        if c == "[" and not in_class:
+            in_class = True
+            # ']' justo después de '[' o '[^' es un carácter de la clase
+            j = i + 1 + (pattern[i + 1:i + 2] == "^")
+            if pattern[j:j + 1] == "]":
+                out.append(pattern[i:j + 1])
+                i = j + 1
+                continue
+        elif c == "]" and in_class:
+            in_class = False
+        out.append(c)
+        i += 1
+    return "".join(out)
+
+
+class Rule:
+    """Regla sobre un campo: check() por columna (valores ASCII) y check_value() por valor."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def check(self, s: pd.Series) -> np.ndarray:
+        raise NotImplementedError
+
+    def check_value(self, value: str) -> bool:
+        raise NotImplementedError
+
+
+class RegexRule(Rule):
+    def __init__(self, name: str, pattern: str):
+        super().__init__(name)
+        self.rx = re.compile(pattern)
+        self.vec_pattern = f"(?:{_ascii_pattern(pattern)})"
+
+    def check(self, s):
+        return s.str.fullmatch(self.vec_pattern).to_numpy(dtype=bool, na_value=False)
+
+    def check_value(self, value):
+        return self.rx.fullmatch(value) is not None
+
+
+class LengthRule(Rule):
+    def __init__(self, name: str, min=None, max=None):
+        super().__init__(name)
+        self.min, self.max = min, max
+
+    def _in_range(self, n):
+        ok = np.ones(np.shape(n), dtype=bool)
+        if self.min is not None:
+            ok &= n >= self.min
+        if self.max is not None:
+            ok &= n <= self.max
+        return ok
+
+    def check(self, s):
+        return self._in_range(s.str.len().to_numpy(dtype="int64", na_value=-1))
+
+    def check_value(self, value):
+        return bool(self._in_range(len(value)))
+
+
+class RangeRule(LengthRule):
+    def check(self, s):
+        n = pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        return self._in_range(n) & ~np.isnan(n)
+
+    def check_value(self, value):
+        try:
+            n = float(value)
+        except ValueError:
+            return False
+        return n == n and bool(self._in_range(n))
+
+
+# Directivas admitidas en el formato de las reglas de fecha
+_DATE_FIELDS = {"%Y": r"(\d{4})", "%m": r"(\d{2})", "%d": r"(\d{2})"}
+
+
+class DateRule(Rule):
+    """Fecha con formato fijo (%Y, %m, %d): mes 1-12, día válido y, opcionalmente, entre min y max."""
+
+    def __init__(self, name: str, formato: str, min=None, max=None):
+        super().__init__(name)
+        parts = re.split(r"(%[Ymd])", formato)
+        self.fields = [p for p in parts if p in _DATE_FIELDS]
+        if "%Y" not in self.fields or len(set(self.fields)) != len(self.fields):
+            raise ValueError(f"Formato de fecha no soportado: {formato!r}")
+        pattern = "".join(_DATE_FIELDS.get(p, re.escape(p)) for p in parts)
+        self.rx = re.compile(pattern)
+        self.vec_pattern = f"(?:{_ascii_pattern(pattern)})"
+        self.min = self._key_of(min, formato)
+        self.max = self._key_of(max, formato)
+
+    def _key_of(self, value, formato):
+        if value is None:
+            return None
+        m = self.rx.fullmatch(str(value))
+        if m is None:
+            raise ValueError(f"Límite de fecha {value!r} no cumple el formato {formato!r}")
+        return self._key(*(np.array([int(g)]) for g in m.groups()))[0]
+
+    def _key(self, *groups):
+        # AAAAMMDD como entero (los campos ausentes valen 1) y validez de mes/día
+        parts = dict(zip(self.fields, groups))
+        y = parts["%Y"]
+        m = parts.get("%m", np.ones_like(y))
+        d = parts.get("%d", np.ones_like(y))
+        ok = (m >= 1) & (m <= 12)
+        if "%d" in parts:
+            # Pocos valores distintos (fechas): calendar por valor es suficiente
+            days = np.array([calendar.monthrange(int(a), int(b))[1] if ok_m else 0 for a, b, ok_m in zip(y, m, ok)])
+            ok &= (d >= 1) & (d <= days)
+        return np.where(ok, y * 10000 + m * 100 + d, -1)
+
+    def _in_range(self, key):
+        ok = key >= 0
+        if self.min is not None:
+            ok &= key >= self.min
+        if self.max is not None:
+            ok &= key <= self.max
+        return ok
+
+    def check(self, s):
+        matched = s.str.fullmatch(self.vec_pattern).to_numpy(dtype=bool, na_value=False)
+        ok = np.zeros(len(s), dtype=bool)
+        if matched.any():
+            parts = s[matched].str.extract(self.vec_pattern, expand=True)
+            groups = [parts.iloc[:, i].astype("int64").to_numpy() for i in range(parts.shape[1])]
+            ok[matched] = self._in_range(self._key(*groups))
+        return ok
+
+    def check_value(self, value):
+        m = self.rx.fullmatch(value)
+        if m is None:
+            return False
+        return bool(self._in_range(self._key(*(np.array([int(g)]) for g in m.groups())))[0])
+
+
+# Dígito doblado en Luhn (2·d, restando 9 si pasa de 9), como tabla
+_LUHN_DOUBLE = np.array([0, 2, 4, 6, 8, 1, 3, 5, 7, 9], dtype=np.uint8)
+
+
+def _luhn_ok(digits: np.ndarray) -> np.ndarray:
+    # digits: matriz (n, longitud) de dígitos; se dobla uno de cada dos empezando por el penúltimo
+    rev = digits[:, ::-1]
+    total = rev[:, ::2].sum(axis=1, dtype=np.int32) + _LUHN_DOUBLE[rev[:, 1::2]].sum(axis=1, dtype=np.int32)
+    return total % 10 == 0
+
+
+class LuhnRule(Rule):
+    """Solo dígitos y dígito de control Luhn correcto (cualquier longitud)."""
+
+    _RX = re.compile(r"\d+")
+
+    def check(self, s):
+        ok = s.str.fullmatch("[0-9]+").to_numpy(dtype=bool, na_value=False)
+        idx = np.flatnonzero(ok)
+        if len(idx) == 0:
+            return ok
+        values = s.to_numpy(dtype=object)[idx]
+        lengths = s.str.len().to_numpy(dtype="int64")[idx]
+        # Una matriz de dígitos por longitud (las tarjetas tienen pocas longitudes distintas)
+        for n in np.unique(lengths):
+            same = lengths == n
+            digits = np.frombuffer("".join(values[same]).encode("ascii"), dtype=np.uint8).reshape(-1, n) - ord("0")
+            ok[idx[same]] = _luhn_ok(digits)
+        return ok
+
+    def check_value(self, value):
+        if not self._RX.fullmatch(value):
+            return False
+        return bool(_luhn_ok(np.array([[int(c) for c in value]]))[0])
+
+
+# Letra de control del DNI: DNI_LETTERS[número % 23]
+DNI_LETTERS = "TRWAGMYFPDXBNJZSQVHLCKE"
+_DNI_LETTERS = np.array(list(DNI_LETTERS), dtype=object)
+
+
+class DniLetterRule(Rule):
+    """Sin espacios, guiones ni puntos: 8 dígitos y la letra que les corresponde (mod 23)."""
+
+    _RX_SEP = re.compile(r"[\s\-.]")
+    _RX = re.compile(r"(\d{8})([A-Z])")
+
+    def check(self, s):
+        s = s.str.replace(f"[{ASCII_SPACE}\\-.]", "", regex=True)
+        ok = s.str.fullmatch("[0-9]{8}[A-Z]").to_numpy(dtype=bool, na_value=False)
+        if ok.any():
+            v = s[ok]
+            number = v.str.slice(0, 8).astype("int64").to_numpy()
+            ok[ok] = _DNI_LETTERS[number % 23] == v.str.slice(8).to_numpy(dtype=object)
+        return ok
+
+    def check_value(self, value):
+        m = self._RX.fullmatch(self._RX_SEP.sub("", value))
+        return m is not None and DNI_LETTERS[int(m.group(1)) % 23] == m.group(2)
+
+
+RULE_TYPES = {
+    "regex": lambda name, arg: RegexRule(name, arg),
+    "longitud": lambda name, arg: LengthRule(name, **arg),
+    "rango": lambda name, arg: RangeRule(name, **arg),
+    "fecha": lambda name, arg: DateRule(name, **arg),
+    "luhn": lambda name, arg: LuhnRule(name),
+    "letra_dni": lambda name, arg: DniLetterRule(name),
+}
+NORMALIZERS = ("strip", "upper", "lower", "quitar")
+
+
+def _build_rule(spec: dict, used: set) -> Rule:
+    spec = dict(spec)
+    name = spec.pop("nombre", None)
+    if len(spec) != 1 or next(iter(spec)) not in RULE_TYPES:
+        raise ValueError(f"Regla no válida: {spec!r} (tipos: {', '.join(RULE_TYPES)})")
+    kind, arg = next(iter(spec.items()))
+    if name is None:
+        name, n = kind, 2
+        while name in used:
+            name, n = f"{kind}{n}", n + 1
+    used.add(name)
+    return RULE_TYPES[kind](name, arg)
+
+
+class FieldRules:
+    """Normalización y reglas de un campo, compiladas; check() las evalúa sobre los valores distintos."""
+
+    def __init__(self, dataset: str, field: str, spec: dict):
+        self.id = f"{dataset}.{field}"
+        self.steps = []
+        for step in spec.get("normalizar") or []:
+            if isinstance(step, dict) and set(step) == {"quitar"}:
+                pattern = step["quitar"]
+                self.steps.append(("quitar", re.compile(pattern), _ascii_pattern(pattern)))
+            elif step in NORMALIZERS:
+                self.steps.append((step, None, None))
+            else:
+                raise ValueError(f"{self.id}: normalización no válida {step!r} (opciones: {', '.join(NORMALIZERS)})")
+        used = set()
+        self.rules = [_build_rule(r, used) for r in spec.get("reglas") or []]
+
+    def _normalize(self, s: pd.Series) -> pd.Series:
+        for step, _, vec in self.steps:
+            if step == "strip":
+                s = s.str.strip(ASCII_SPACE_CHARS)
+            elif step == "quitar":
+                s = s.str.replace(vec, "", regex=True)
+            else:
+                s = getattr(s.str, step)()
+        return s
+
+    def _normalize_value(self, value: str) -> str:
+        for step, rx, _ in self.steps:
+            value = rx.sub("", value) if step == "quitar" else getattr(value, step)()
+        return value
+
+    def check(self, col: pd.Series) -> np.ndarray:
+        """
+        Array bool por fila: True si el valor cumple todas las reglas (los nulos
+        nunca). Cada valor distinto se evalúa una vez y cada regla solo sobre los
+        valores que han cumplido las anteriores. Mide el tiempo de cada regla, las
+        filas que le llegan y las que la cumplen (los nulos fallan la primera);
+        `preparar` es el tiempo de obtener y normalizar los valores distintos.
+        """
+        t0, c0 = time.perf_counter(), time.process_time()
+        codes, uniques = pd.factorize(col, use_na_sentinel=True)
+        rows = len(col)
+        if len(uniques) == 0:
+            return np.zeros(rows, dtype=bool)
+
+        raw = np.asarray(uniques, dtype=object)
+        u = pd.Series(raw).astype(str).astype(STR_DTYPE)
+        non_ascii = u.str.contains(RX_NON_ASCII, regex=True).to_numpy(dtype=bool, na_value=False)
+        ascii_pos = np.flatnonzero(~non_ascii)
+        other_pos = np.flatnonzero(non_ascii)
+        ascii_values = self._normalize(u[~non_ascii]) if non_ascii.any() else self._normalize(u)
+        other = [self._normalize_value(str(v)) for v in raw[non_ascii]]
+        # Filas por valor distinto, para contar por fila
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        metrics.add(f"{metrics.RULE_PREFIX}{self.id}.preparar", time.perf_counter() - t0, time.process_time() - c0,
+                    rows_in=rows)
+
+        ok = np.ones(len(uniques), dtype=bool)
+        rows_in = rows
+        for rule in self.rules:
+            t0, c0 = time.perf_counter(), time.process_time()
+            live = ok[ascii_pos]
+            if live.any():
+                ok[ascii_pos[live]] = rule.check(ascii_values[live] if not live.all() else ascii_values)
+            for pos, v in zip(other_pos, other):
+                if ok[pos]:
+                    ok[pos] = rule.check_value(v)
+            passed = int(counts[ok].sum())
+            metrics.add(f"{metrics.RULE_PREFIX}{self.id}.{rule.name}", time.perf_counter() - t0,
+                        time.process_time() - c0, rows_in=rows_in, rows_out=passed)
+            rows_in = passed
+
+        return np.append(ok, False)[codes]
+
+    def check_value(self, value: str) -> bool:
+        # Un solo valor (sin nulos), con la semántica de referencia de `re`
+        value = self._normalize_value(value)
+        return all(rule.check_value(value) for rule in self.rules)
+
+
+class RuleSet:
+    """Reglas compiladas de un tipo de fichero (clientes o tarjetas)."""
+
+    def __init__(self, dataset: str, spec: dict):
+        self.dataset = dataset
+        self.fields = {field: FieldRules(dataset, field, spec[field]) for field in FIELDS[dataset]}
+
+    def check(self, field: str, col: pd.Series) -> np.ndarray:
+        return self.fields[field].check(col)
+
+    def check_value(self, field: str, value: str) -> bool:
+        return self.fields[field].check_value(value)
+
+
+def check_mode(mode: str | None) -> str:
+    mode = (mode or VALIDATION_MODE).strip().lower()
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"Modo de validación desconocido: {mode!r} (opciones: {VALIDATION_MODES})")
+    return mode
+
+
+def effective_rules(path: Path | None = None, mode: str | None = None) -> dict:
+    """
+    Reglas en vigor: las de DEFAULT_RULES, sustituidas campo a campo por las de la
+    sección `validacion` de config.yaml si existe, más STRICT_RULES en modo strict.
+    """
+    mode = check_mode(mode)
+    path = Path(path or CONFIG_FILE)
+    config = {}
+    if path.exists():
+        import yaml
+
+        config = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+    section = config.get("validacion") or {}
+
+    rules = {dataset: dict(fields) for dataset, fields in DEFAULT_RULES.items()}
+    for dataset, fields in section.items():
+        if dataset not in FIELDS:
+            raise ValueError(f"{path}: tipo desconocido en validacion: {dataset!r} (opciones: {', '.join(FIELDS)})")
+        for field, spec in (fields or {}).items():
+            if field not in FIELDS[dataset]:
+                raise ValueError(
+                    f"{path}: campo sin validación en {dataset}: {field!r} (opciones: {', '.join(FIELDS[dataset])})"
+                )
+            rules[dataset][field] = spec or {}
+
+    if mode == "strict":
+        for dataset, fields in STRICT_RULES.items():
+            for field, extra in fields.items():
+                spec = dict(rules[dataset][field])
+                present = {kind for r in spec.get("reglas") or [] for kind in r if kind != "nombre"}
+                spec["reglas"] = list(spec.get("reglas") or []) + [
+                    r for r in extra if not present & set(r)
+                ]
+                rules[dataset][field] = spec
+    return rules
+
+
+@lru_cache(maxsize=None)
+def _compiled(path: str, mode: str) -> dict:
+    rules = effective_rules(Path(path), mode)
+    return {dataset: RuleSet(dataset, spec) for dataset, spec in rules.items()}
+
+
+def get_rules(dataset: str, mode: str | None = None) -> RuleSet:
+    # Se leen y compilan una vez por proceso y modo
+    return _compiled(str(CONFIG_FILE), check_mode(mode))[dataset]
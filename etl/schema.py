@@ -0,0 +1,126 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from etl.vector_utils import STR_DTYPE, to_object
+
+# Representación tipada en memoria de clientes y tarjetas. En disco (cleaned y
+# rechazadas) y en la BD se mantiene el formato de siempre: texto y flags Y/N;
+# la conversión de flags y fechas se hace en los escritores de etl/formats.py (to_text).
+#
+#   TEXT      texto (string[pyarrow] si está instalado; si no, object)
+#   CATEGORY  valores muy repetidos (nombres, códigos de cliente en tarjetas)
+#   FLAG      booleano con nulos (boolean) en lugar de "Y"/"N"
+#   MONTH     fecha de caducidad YYYY-MM como period[M] (entero de 64 bits)
+TEXT = "text"
+CATEGORY = "category"
+FLAG = "flag"
+MONTH = "month"
+
+CLIENTES_FLAGS = ["DNI_OK", "DNI_KO", "Telefono_OK", "Telefono_KO", "Correo_OK", "Correo_KO"]
+TARJETAS_FLAGS = ["CodCliente_OK", "CodCliente_KO", "FechaExp_OK", "FechaExp_KO", "Tarjeta_OK", "Tarjeta_KO"]
+
+CLIENTES = {
+    "cod_cliente": TEXT,
+    "nombre": CATEGORY,
+    "apellido1": CATEGORY,
+    "apellido2": CATEGORY,
+    "dni": TEXT,
+    "dni_masked": TEXT,
+    "correo": TEXT,
+    "telefono": TEXT,
+    **{c: FLAG for c in CLIENTES_FLAGS},
+}
+TARJETAS = {
+    "cod_cliente": CATEGORY,
+    "fecha_exp": MONTH,
+    "card_clean": TEXT,
+    "numero_tarjeta_masked": TEXT,
+    "numero_tarjeta_hash": TEXT,
+    **{c: FLAG for c in TARJETAS_FLAGS},
+}
+
+# Textos aceptados como flag (mismos valores que la carga a la BD)
+_TRUE = {"Y", "TRUE", "T", "1"}
+_FALSE = {"N", "FALSE", "F", "0"}
+_MONTH_FORMAT = "%Y-%m"
+_RX_MONTH = re.compile(r"[0-9]{4}-(?:0[1-9]|1[0-2])")
+
+
+def flags(ok: np.ndarray) -> pd.arrays.BooleanArray:
+    return pd.array(np.asarray(ok, dtype=bool), dtype="boolean")
+
+
+def to_flags(s: pd.Series) -> pd.Series:
+    """Y/N (o TRUE/FALSE, T/F, 1/0) -> boolean; cualquier otro valor o nulo -> NA."""
+    if s.dtype == "boolean":
+        return s
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    text = [str(v).strip().upper() for v in uniques]
+    values = [True if t in _TRUE else False if t in _FALSE else None for t in text] + [None]
+    return pd.Series(pd.array(values, dtype="boolean")[codes], index=s.index)
+
+
+def _to_month(s: pd.Series) -> pd.Series:
+    # Solo si todos los valores son YYYY-MM exactos (así to_text devuelve el mismo texto).
+    # Se comprueba y convierte una vez cada valor distinto.
+    if isinstance(s.dtype, pd.PeriodDtype):
+        return s
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    if not all(isinstance(v, str) and _RX_MONTH.fullmatch(v) for v in uniques):
+        return s
+    months = pd.PeriodIndex(list(uniques), freq="M")
+    return pd.Series(months.take(codes, allow_fill=True, fill_value=pd.NaT), index=s.index)
+
+
+def compact(df: pd.DataFrame, types: dict[str, str]) -> pd.DataFrame:
+    """Convierte las columnas de `df` presentes en `types` a su tipo compacto."""
+    for col, kind in types.items():
+        if col not in df.columns:
+            continue
+        s = df[col]
+        if kind == FLAG:
+            df[col] = to_flags(s)
+        elif kind == CATEGORY:
+            if not isinstance(s.dtype, pd.CategoricalDtype):
+                df[col] = s.astype("category")
+        elif kind == MONTH:
+            df[col] = _to_month(s)
+        elif STR_DTYPE is not object and s.dtype == object:
+            df[col] = s.astype(STR_DTYPE)
+    return df
+
+
+def is_text(s: pd.Series) -> bool:
+    # Columna de texto en cualquiera de sus representaciones (object, string, category)
+    return s.dtype == object or isinstance(s.dtype, (pd.CategoricalDtype, pd.StringDtype))
+
+
+def to_text(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Representación de disco: flags como "Y"/"N" y fechas como YYYY-MM. Las columnas
+    de texto (object, string, category) se dejan como están: CSV y Arrow las
+    escriben igual que object, con los nulos vacíos.
+    """
+    out = None
+    for col in df.columns:
+        s = df[col]
+        if s.dtype == "boolean":
+            text = pd.Series(np.where(s.to_numpy(dtype=bool, na_value=False), "Y", "N"), index=s.index, dtype=object)
+            text = text.where(s.notna(), None)
+        elif isinstance(s.dtype, pd.PeriodDtype):
+            text = to_object(s.dt.strftime(_MONTH_FORMAT).where(s.notna()))
+        else:
+            continue
+        if out is None:
+            out = df.copy()
+        out[col] = text
+    return df if out is None else out
+
+
+def as_str(s: pd.Series) -> pd.Series:
+    # astype(str) como con object: los nulos pasan a ser el texto "None"
+    if s.dtype == object:
+        return s.astype(str)
+    return to_object(s).astype(str)
@@ -0,0 +1,63 @@
+import os
+from pathlib import Path
+
+# Opciones de ejecución (variables de entorno) que necesita la línea de comandos.
+# Están aquí, sin dependencias, para que run_pipeline pueda leerlas sin importar
+# pandas ni psycopg2; cada módulo las reexporta con su nombre de siempre.
+
+# Formato de los ficheros cleaned y de rechazadas: "csv" (';' y utf-8, como siempre),
+# "parquet" (columnar, comprimido con zstd) o "feather" (Arrow IPC, zstd).
+# parquet y feather necesitan pyarrow.
+OUTPUT_FORMATS = ("csv", "parquet", "feather")
+OUTPUT_FORMAT = os.getenv("ETL_OUTPUT_FORMAT", "csv").strip().lower()
+
+# Motor de limpieza: "vectorized" (por columnas con .str) o "python" (apply por fila).
+# Ambos producen exactamente el mismo resultado.
+ENGINES = ("python", "vectorized")
+CLEAN_ENGINE = os.getenv("ETL_CLEAN_ENGINE", "vectorized")
+
+# Sal del hash de las tarjetas. Se lee al arrancar, antes de que la carga añada al
+# entorno las variables de .env: así no depende de cuándo se importe clean_tarjetas
+CARD_SALT = os.getenv("CARD_SALT", "etl_grupo_salt")
+
+# Reglas de validación (etl/rules.py)
+CONFIG_FILE = Path(os.getenv("ETL_CONFIG", Path(__file__).resolve().parents[1] / "config.yaml"))
+
+# Modo de validación: soft (solo formato, como siempre) o strict, que añade a las
+# reglas de config.yaml la comprobación de Luhn de las tarjetas y la letra del DNI
+VALIDATION_MODES = ("soft", "strict")
+VALIDATION_MODE = os.getenv("ETL_VALIDATION_MODE", "soft").strip().lower()
+
+# Métodos de carga: "insert" (execute_values por lotes) o "copy" (COPY a staging + merge en SQL)
+LOAD_METHODS = ("insert", "copy")
+LOAD_METHOD = os.getenv("ETL_LOAD_METHOD", "insert")
+
+# Carga de tarjetas: "full" (TRUNCATE + recarga de todos los ficheros) o "incremental"
+# (solo los ficheros que no figuran en public.etl_load_manifest)
+TARJETAS_MODES = ("full", "incremental")
+TARJETAS_MODE = os.getenv("ETL_TARJETAS_MODE", "full")
+
+# Filtro FK de tarjetas (método insert): "client" trae todos los cod_cliente a un set
+# de Python; "server" solo envía a la BD los cod_cliente distintos de las tarjetas y
+# recibe los que no existen. El método copy siempre filtra en la BD.
+FK_CHECKS = ("client", "server")
+FK_CHECK = os.getenv("ETL_FK_CHECK", "client")
+
+# Conexiones en paralelo para el método insert (pool de psycopg2 + hilos). Con 1 se
+# carga por una sola conexión, como siempre. Con más, cada fichero se reparte por
+# cod_cliente entre las conexiones y se lee el siguiente fichero mientras se envía.
+# Las particiones de un fichero se confirman juntas: si falla una se deshacen todas.
+LOAD_WORKERS = int(os.getenv("ETL_LOAD_WORKERS", "1"))
+
+# Merge de tarjetas en la recarga total (método insert). Con 1 se concatenan todos los
+# ficheros en memoria, como siempre. Con N > 1 las filas se reparten en N ficheros
+# temporales por hash de cod_cliente (en ETL_MERGE_TMP o el temporal del sistema),
+# cada partición se deduplica en un proceso aparte y se carga según termina: en
+# memoria solo hay un fichero y unas pocas particiones a la vez.
+MERGE_PARTITIONS = int(os.getenv("ETL_MERGE_PARTITIONS", "1"))
+MERGE_TMP = os.getenv("ETL_MERGE_TMP") or None
+
+# Perfil de calidad de los datos de entrada (etl/profiling.py) en el informe de
+# ejecución: nulos, distintos aproximados, valores más frecuentes y longitudes por
+# columna, calculados en la misma pasada que la limpieza
+DATA_PROFILE = os.getenv("ETL_DATA_PROFILE", "0").strip() != "0"
@@ -1,89 +1,97 @@
+import numpy as np
 import pandas as pd
-import re
 
-def is_valid_dni(dni: str) -> bool:
+from etl.rules import get_rules
+from etl.schema import CLIENTES, as_str, compact, flags
+
+# Validadores de un solo valor: aplican la misma normalización que validate_clientes
+# y las reglas del campo en config.yaml (en `mode`, soft por defecto)
+def is_valid_dni(dni: str, mode: str | None = None) -> bool:
     """
     Validación "soft": SOLO formato.
     Acepta 8 dígitos + 1 letra (A-Z).
-    No comprueba letra real.
+    No comprueba letra real (sí en modo strict).
     """
     if not dni:
         return False
+    return get_rules("clientes", mode).check_value("dni", str(dni).strip().upper())
 
-    dni = str(dni).strip().upper()
-    dni = re.sub(r"[\s\-\.]", "", dni)
-
-    return bool(re.fullmatch(r"\d{8}[A-Z]", dni))
 
-
-def is_valid_phone(phone: str) -> bool:
+def is_valid_phone(phone: str, mode: str | None = None) -> bool:
     if not phone:
         return False
-
-    phone = re.sub(r"\D", "", str(phone))
-    return bool(re.fullmatch(r"[0-9]{9}", phone))
+    return get_rules("clientes", mode).check_value("telefono", str(phone).strip())
 
 
-def is_valid_email(email: str) -> bool:
+def is_valid_email(email: str, mode: str | None = None) -> bool:
     if not email:
         return False
+    return get_rules("clientes", mode).check_value("correo", str(email).strip().lower())
 
-    email = str(email).strip().lower()
-    return bool(re.fullmatch(r"[^@]+@[^@]+\.[^@]+", email))
 
+# Motivos de rechazo codificados como bits; el texto solo se genera para las rechazadas
+_DNI_INVALIDO = 1
+_TELEFONO_INVALIDO = 2
+_CORREO_INVALIDO = 4
+_MOTIVOS = [
+    (_DNI_INVALIDO, "dni_invalido"),
+    (_TELEFONO_INVALIDO, "telefono_invalido"),
+    (_CORREO_INVALIDO, "correo_invalido"),
+]
+_DETALLE = {
+    code: "|".join(m for bit, m in _MOTIVOS if code & bit) or "desconocido"
+    for code in range(1 << len(_MOTIVOS))
+}
 
-def validate_clientes(df: pd.DataFrame):
+
+def validate_clientes(df: pd.DataFrame, mode: str | None = None):
     df = df.copy()
     errors = []
 
     # Normalización básica (igual que antes)
-    df["dni"] = df["dni"].astype(str).str.strip().str.upper()
-    df["telefono"] = df["telefono"].astype(str).str.strip()
-    df["correo"] = df["correo"].astype(str).str.strip().str.lower()
+    df["dni"] = as_str(df["dni"]).str.strip().str.upper()
+    df["telefono"] = as_str(df["telefono"]).str.strip()
+    df["correo"] = as_str(df["correo"]).str.strip().str.lower()
+
+    # Validación por columna con las reglas de config.yaml (una vez por valor distinto).
+    # En modo strict se comprueba además la letra de control del DNI
+    rules = get_rules("clientes", mode)
+    dni_ok = rules.check("dni", df["dni"])
+    tel_ok = rules.check("telefono", df["telefono"])
+    correo_ok = rules.check("correo", df["correo"])
 
-    # Flags de validación (SIN CAMBIOS)
-    df["DNI_OK"] = df["dni"].apply(lambda x: "Y" if is_valid_dni(x) else "N")
-    df["DNI_KO"] = df["DNI_OK"].apply(lambda x: "Y" if x == "N" else "N")
+    # Flags de validación (mismas columnas que antes, booleanas; en disco siguen siendo Y/N)
+    df["DNI_OK"] = flags(dni_ok)
+    df["DNI_KO"] = flags(~dni_ok)
 
-    df["Telefono_OK"] = df["telefono"].apply(lambda x: "Y" if is_valid_phone(x) else "N")
-    df["Telefono_KO"] = df["Telefono_OK"].apply(lambda x: "Y" if x == "N" else "N")
+    df["Telefono_OK"] = flags(tel_ok)
+    df["Telefono_KO"] = flags(~tel_ok)
 
-    df["Correo_OK"] = df["correo"].apply(lambda x: "Y" if is_valid_email(x) else "N")
-    df["Correo_KO"] = df["Correo_OK"].apply(lambda x: "Y" if x == "N" else "N")
+    df["Correo_OK"] = flags(correo_ok)
+    df["Correo_KO"] = flags(~correo_ok)
 
     # Filas inválidas
-    invalid_mask = (
-            (df["DNI_OK"] == "N")
-            | (df["Telefono_OK"] == "N")
-            | (df["Correo_OK"] == "N")
+    codes = (
+            np.where(dni_ok, 0, _DNI_INVALIDO)
+            | np.where(tel_ok, 0, _TELEFONO_INVALIDO)
+            | np.where(correo_ok, 0, _CORREO_INVALIDO)
     )
+    invalid_mask = codes != 0
 
     invalid = df[invalid_mask].copy()
 
     if not invalid.empty:
         invalid["origen"] = "CLIENTES"
         invalid["error"] = "validacion_cliente"
-
-        def detalle(row):
-            motivos = []
-            if row["DNI_OK"] == "N":
-                motivos.append("dni_invalido")
-            if row["Telefono_OK"] == "N":
-                motivos.append("telefono_invalido")
-            if row["Correo_OK"] == "N":
-                motivos.append("correo_invalido")
-            return "|".join(motivos) if motivos else "desconocido"
-
-        invalid["error_detalle"] = invalid.apply(detalle, axis=1)
+        invalid["error_detalle"] = pd.Series(codes[invalid_mask], index=invalid.index).map(_DETALLE)
         errors.append(invalid)
 
     # DataFrame válido
     df_valid = df[~invalid_mask].copy()
 
     # 🔹 CAMBIO MÍNIMO 1: enmascarar el DNI SOBRE LA MISMA COLUMNA
-    df_valid["dni"] = df_valid["dni"].apply(
-        lambda x: "******" + x[-3:] if isinstance(x, str) and len(x) >= 3 else x
-    )
+    dni = df_valid["dni"]
+    df_valid["dni"] = dni.where(dni.str.len() < 3, "******" + dni.str[-3:])
 
     # 🔹 CAMBIO MÍNIMO 2: asegurar cod_cliente al principio
     cols = df_valid.columns.tolist()
@@ -91,4 +99,4 @@ def validate_clientes(df: pd.DataFrame):
         cols.insert(0, cols.pop(cols.index("cod_cliente")))
     df_valid = df_valid[cols]
 
-    return df_valid, errors
\ No newline at end of file
+    return compact(df_valid, CLIENTES), errors
@@ -1,64 +1,78 @@
+import numpy as np
 import pandas as pd
-import re
 
+from etl.rules import get_rules
+from etl.schema import TARJETAS, compact, flags
 
-def is_valid_cod_cliente(value: str) -> bool:
+# Validadores de un solo valor con las reglas del campo en config.yaml (en `mode`,
+# soft por defecto); la normalización (strip) la declaran las propias reglas
+def is_valid_cod_cliente(value: str, mode: str | None = None) -> bool:
     if pd.isna(value):
         return False
-    return bool(re.fullmatch(r"C\d{3}", str(value).strip()))
+    return get_rules("tarjetas", mode).check_value("cod_cliente", str(value))
 
 
-def is_valid_fecha_exp(value: str) -> bool:
+def is_valid_fecha_exp(value: str, mode: str | None = None) -> bool:
     if pd.isna(value):
         return False
-    value = str(value).strip()
-    if not re.fullmatch(r"\d{4}-\d{2}", value):
-        return False
-    year = int(value[:4])
-    month = int(value[5:7])
-    return 1 <= month <= 12 and 1900 <= year <= 2100
+    return get_rules("tarjetas", mode).check_value("fecha_exp", str(value))
 
 
-def is_valid_card(card_digits: str) -> bool:
+def is_valid_card(card_digits: str, mode: str | None = None) -> bool:
     if pd.isna(card_digits):
         return False
-    s = str(card_digits).strip()
-    return s.isdigit() and len(s) >= 12
+    return get_rules("tarjetas", mode).check_value("card_clean", str(card_digits))
+
+
+# Motivos de rechazo codificados como bits; el texto solo se genera para las rechazadas
+_COD_CLIENTE_INVALIDO = 1
+_FECHA_EXP_INVALIDA = 2
+_TARJETA_INVALIDA = 4
+_MOTIVOS = [
+    (_COD_CLIENTE_INVALIDO, "cod_cliente_invalido"),
+    (_FECHA_EXP_INVALIDA, "fecha_exp_invalida"),
+    (_TARJETA_INVALIDA, "tarjeta_invalida"),
+]
+_DETALLE = {
+    code: "|".join(m for bit, m in _MOTIVOS if code & bit)
+    for code in range(1 << len(_MOTIVOS))
+}
 
 
-def validate_tarjetas(df: pd.DataFrame):
+def validate_tarjetas(df: pd.DataFrame, mode: str | None = None):
 
     df = df.copy()
     errors = []
 
-    df["CodCliente_OK"] = df["cod_cliente"].apply(lambda x: "Y" if is_valid_cod_cliente(x) else "N")
-    df["CodCliente_KO"] = df["CodCliente_OK"].apply(lambda x: "N" if x == "Y" else "Y")
+    # Validación por columna con las reglas de config.yaml (una vez por valor distinto).
+    # En modo strict se comprueba además el dígito de control (Luhn) de la tarjeta
+    rules = get_rules("tarjetas", mode)
+    cod_ok = rules.check("cod_cliente", df["cod_cliente"])
+    fecha_ok = rules.check("fecha_exp", df["fecha_exp"])
+    card_ok = rules.check("card_clean", df["card_clean"])
 
-    df["FechaExp_OK"] = df["fecha_exp"].apply(lambda x: "Y" if is_valid_fecha_exp(x) else "N")
-    df["FechaExp_KO"] = df["FechaExp_OK"].apply(lambda x: "N" if x == "Y" else "Y")
+    df["CodCliente_OK"] = flags(cod_ok)
+    df["CodCliente_KO"] = flags(~cod_ok)
 
-    df["Tarjeta_OK"] = df["card_clean"].apply(lambda x: "Y" if is_valid_card(x) else "N")
-    df["Tarjeta_KO"] = df["Tarjeta_OK"].apply(lambda x: "N" if x == "Y" else "Y")
+    df["FechaExp_OK"] = flags(fecha_ok)
+    df["FechaExp_KO"] = flags(~fecha_ok)
 
-    invalid_mask = (df["CodCliente_OK"] == "N") | (df["FechaExp_OK"] == "N") | (df["Tarjeta_OK"] == "N")
+    df["Tarjeta_OK"] = flags(card_ok)
+    df["Tarjeta_KO"] = flags(~card_ok)
+
+    codes = (
+            np.where(cod_ok, 0, _COD_CLIENTE_INVALIDO)
+            | np.where(fecha_ok, 0, _FECHA_EXP_INVALIDA)
+            | np.where(card_ok, 0, _TARJETA_INVALIDA)
+    )
+    invalid_mask = codes != 0
     rejected = df[invalid_mask].copy()
 
     if not rejected.empty:
         rejected["origen"] = "TARJETAS"
         rejected["error"] = "validacion_tarjeta"
-
-        def detalle(row):
-            motivos = []
-            if row["CodCliente_OK"] == "N":
-                motivos.append("cod_cliente_invalido")
-            if row["FechaExp_OK"] == "N":
-                motivos.append("fecha_exp_invalida")
-            if row["Tarjeta_OK"] == "N":
-                motivos.append("tarjeta_invalida")
-            return "|".join(motivos)
-
-        rejected["error_detalle"] = rejected.apply(detalle, axis=1)
+        rejected["error_detalle"] = pd.Series(codes[invalid_mask], index=rejected.index).map(_DETALLE)
         errors.append(rejected)
 
     df_valid = df[~invalid_mask].copy()
-    return df_valid, errors
\ No newline at end of file
+    return compact(df_valid, TARJETAS), errors
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+# Con pyarrow instalado las operaciones .str usan los kernels de Arrow (RE2);
+# si no, se usa el dtype object de siempre. Las regex usadas con STR_DTYPE solo
+# emplean clases ASCII explícitas, que se comportan igual en `re` y en RE2.
+try:
+    import pyarrow  # noqa: F401
+    STR_DTYPE = "string[pyarrow]"
+except ImportError:
+    STR_DTYPE = object
+
+# Espacios ASCII según str.isspace() (\s de RE2 no incluye \v ni \x1c-\x1f)
+ASCII_SPACE = r"\t\n\x0b\x0c\r\x1c-\x1f "
+ASCII_SPACE_CHARS = "\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f "
+RX_NON_ASCII = r"[^\x00-\x7f]"
+
+
+def none_series(index) -> pd.Series:
+    # Serie object rellena de None (no NaN), igual que la salida de apply
+    return pd.Series([None] * len(index), index=index, dtype=object)
+
+
+def to_object(s: pd.Series) -> pd.Series:
+    # Vuelve a object con None como nulo (Arrow devolvería pd.NA)
+    return pd.Series(s.to_numpy(dtype=object, na_value=None), index=s.index, dtype=object)
+
+
+def map_unique(col: pd.Series, fn) -> pd.Series:
+    """
+    Aplica `fn` (vectorizada, sobre una Serie sin nulos) solo a los valores
+    distintos de `col` y reconstruye la columna con un take. Los nulos dan None.
+    """
+    codes, uniques = pd.factorize(col, use_na_sentinel=True)
+    if len(uniques) == 0:
+        return none_series(col.index)
+
+    u = pd.Series(np.asarray(uniques, dtype=object)).astype(str).astype(STR_DTYPE)
+    values = to_object(fn(u)).to_numpy()
+    values = np.append(values, np.array([None], dtype=object))
+    return pd.Series(values[codes], index=col.index, dtype=object)
@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+from etl.file_discovery import CLIENTES_PATTERN, TARJETAS_PATTERN
+
+# Modo watch: cada cuánto se revisa data/raw (segundos) y cuánto tiempo tiene que
+# estar un fichero sin cambiar de tamaño ni de fecha para darlo por completo
+WATCH_INTERVAL = float(os.getenv("ETL_WATCH_INTERVAL", "2"))
+WATCH_SETTLE = float(os.getenv("ETL_WATCH_SETTLE", "2"))
+
+# Con inotify_simple instalado (Linux) el watcher se despierta en cuanto cambia algo
+# en el directorio; si no, revisa el directorio cada WATCH_INTERVAL
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+
+def _signature(path: Path):
+    # (tamaño, mtime) del fichero; None si ya no existe
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def signatures(paths) -> dict:
+    """Firma (tamaño, mtime) de cada fichero, para sembrar un FileWatcher con los ya procesados."""
+    return {Path(p): _signature(Path(p)) for p in paths}
+
+
+class FileWatcher:
+    """
+    Detecta ficheros Clientes-*.csv y Tarjetas-*.csv nuevos o modificados en
+    `input_dir`. Un fichero se entrega cuando lleva `settle` segundos sin cambiar
+    o, con inotify, en cuanto se mueve al directorio (escritura en otro sitio +
+    rename, que es atómica). Un cierre tras escribir no basta: quien lo escribe
+    puede volver a abrirlo para añadir más. Los ficheros de `done` (ver
+    signatures()) se dan por procesados mientras no cambien; sin `done`, los
+    presentes al crear el watcher.
+    """
+
+    def __init__(self, input_dir: Path, interval: float | None = None, settle: float | None = None,
+                 use_inotify: bool = True, done: dict | None = None):
+        self.input_dir = Path(input_dir)
+        self.interval = WATCH_INTERVAL if interval is None else interval
+        self.settle = WATCH_SETTLE if settle is None else settle
+        self._done = dict(done) if done is not None else signatures(self._scan())
+        self._seen = {}
+        self._moved = set()
+        self._inotify = None
+        if use_inotify and INotify is not None:
+            self._inotify = INotify()
+            mask = inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO | inotify_flags.CREATE | inotify_flags.MODIFY
+            self._inotify.add_watch(str(self.input_dir), mask)
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self._inotify is not None else "polling"
+
+    def _scan(self) -> list[Path]:
+        return [
+            p for p in self.input_dir.iterdir()
+            if CLIENTES_PATTERN.match(p.name) or TARJETAS_PATTERN.match(p.name)
+        ]
+
+    def _wait(self, stop: threading.Event):
+        if self._inotify is None:
+            stop.wait(self.interval)
+            return
+        # Con ficheros aún sin asentar se vuelve a mirar a los `interval` segundos
+        for event in self._inotify.read(timeout=int(self.interval * 1000)):
+            if event.mask & inotify_flags.MOVED_TO:
+                self._moved.add(self.input_dir / event.name)
+
+    def ready(self) -> list[Path]:
+        """Ficheros nuevos o modificados que ya están completos, en orden de nombre."""
+        now = time.monotonic()
+        out = []
+        for p in self._scan():
+            sig = _signature(p)
+            if sig is None or self._done.get(p) == sig:
+                continue
+            moved = p in self._moved
+            last_sig, since = self._seen.get(p, (None, now))
+            if sig != last_sig:
+                since = now
+            self._seen[p] = (sig, since)
+            if moved or now - since >= self.settle:
+                out.append(p)
+        self._moved.clear()
+        return sorted(out, key=lambda p: p.name)
+
+    def mark_done(self, path: Path):
+        # Se guarda la firma que tenía al entregarse: si vuelve a cambiar se entrega otra vez
+        self._done[path] = self._seen.pop(path, (_signature(path), None))[0]
+
+    def watch(self, stop: threading.Event):
+        """Genera listas de ficheros listos hasta que se activa `stop`."""
+        while not stop.is_set():
+            files = self.ready()
+            if files:
+                yield files
+            else:
+                self._wait(stop)
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
@@ -0,0 +1,272 @@
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import pandas as pd
+
+from etl.reader import read_csv_safe
+from etl.clean_clientes import clean_dataframe_clientes
+from etl.settings import CLEAN_ENGINE, ENGINES
+from etl.validate_clientes import validate_clientes
+from etl.clean_tarjetas import clean_tarjetas
+from etl.validate_tarjetas import validate_tarjetas
+from etl.errors import write_rows_rejected_clientes_tarjetas
+from etl.formats import OUTPUT_FORMAT, OUTPUT_FORMATS, check_format
+from etl.metrics import RunReport
+from etl.rules import VALIDATION_MODE, VALIDATION_MODES
+from scripts.generate_data import BENCH_PATH, _count, write_file
+
+BASELINE_FILE = BENCH_PATH / "baseline.json"
+RESULTS_FILE = BENCH_PATH / "last.json"
+
+# Arranque: módulos pesados que run_pipeline no debe importar hasta que una etapa
+# los necesite (una ejecución sin nada que hacer no los carga)
+STARTUP_CASE = "import scripts.run_pipeline (arranque)"
+_HEAVY_MODULES = ("numpy", "pandas", "pyarrow", "psycopg2", "yaml")
+_STARTUP_CODE = (
+    "import json, sys, time\n"
+    "t = time.perf_counter()\n"
+    "import scripts.run_pipeline\n"
+    "print(json.dumps([time.perf_counter() - t, sorted(m for m in {heavy!r} if m in sys.modules)]))"
+)
+
+# Ficheros de prueba: un fichero por tipo y dialecto (el csv ';' en utf-8-sig y
+# el de líneas entrecomilladas en cp1252, como los ficheros reales)
+_DIALECTS = {"csv": ("utf-8-sig", False), "quoted": ("cp1252", True)}
+
+
+def _data_dir(rows: int, invalid_ratio: float, duplicate_ratio: float, seed: int) -> Path:
+    return BENCH_PATH / f"raw-{rows}-{invalid_ratio}-{duplicate_ratio}-{seed}"
+
+
+def prepare_data(rows: int, invalid_ratio: float, duplicate_ratio: float, seed: int,
+                 regenerate: bool = False) -> dict:
+    """Genera (o reutiliza) los ficheros de prueba y devuelve {(tipo, dialecto): ruta}."""
+    out = _data_dir(rows, invalid_ratio, duplicate_ratio, seed)
+    files = {}
+    for i, kind in enumerate(("clientes", "tarjetas")):
+        for j, (dialect, (encoding, quoted)) in enumerate(_DIALECTS.items()):
+            path = out / f"{kind.capitalize()}-{dialect}.csv"
+            if regenerate or not path.exists():
+                out.mkdir(parents=True, exist_ok=True)
+                part = path.with_name(path.name + ".part")
+                write_file(part, rows, kind, seed=seed + 2 * i + j, encoding=encoding, quoted=quoted,
+                           invalid_ratio=invalid_ratio, duplicate_ratio=duplicate_ratio)
+                part.replace(path)
+            files[(kind, dialect)] = path
+    return files
+
+
+def _cases(files: dict, clean_engine: str, fmt: str, errors_dir: Path, validation_mode: str = "soft"):
+    """
+    Casos medidos en orden: (nombre, función). Cada función recibe la
+    salida de los casos anteriores a través de `state` (el DataFrame leído, el
+    limpio, las rechazadas...), de modo que se mide cada etapa por separado.
+    """
+    cases = []
+    for kind in ("clientes", "tarjetas"):
+        for dialect in _DIALECTS:
+            path = files[(kind, dialect)]
+            cases.append((f"read_csv_safe {kind} ({dialect})", lambda st, p=path, k=kind: st.__setitem__(k, read_csv_safe(p))))
+
+    def clean(st, kind, fn):
+        st[f"{kind}_clean"] = fn(st[kind].copy(), engine=clean_engine)
+
+    def validate(st, kind, fn):
+        _, errs = fn(st[f"{kind}_clean"].copy(), mode=validation_mode)
+        st[f"{kind}_errs"] = errs
+
+    def write_errors(st):
+        errs = [e for k in ("clientes", "tarjetas") for e in st[f"{k}_errs"]]
+        write_rows_rejected_clientes_tarjetas(errs, output_dir=str(errors_dir), output_format=fmt)
+
+    cases += [
+        ("clean_dataframe_clientes", lambda st: clean(st, "clientes", clean_dataframe_clientes)),
+        ("validate_clientes", lambda st: validate(st, "clientes", validate_clientes)),
+        ("clean_tarjetas", lambda st: clean(st, "tarjetas", clean_tarjetas)),
+        ("validate_tarjetas", lambda st: validate(st, "tarjetas", validate_tarjetas)),
+        ("write_rows_rejected_clientes_tarjetas", write_errors),
+    ]
+    return cases
+
+
+def run(files: dict, rows: int, repeat: int, clean_engine: str, fmt: str, memory: bool = True,
+        validation_mode: str = "soft") -> dict:
+    """
+    Ejecuta `repeat` veces cada caso y se queda con el mejor tiempo (el menos
+    afectado por ruido). Con memory=True hace una pasada más con tracemalloc para
+    medir el pico de memoria de cada caso (no cuenta en los tiempos).
+    """
+    errors_dir = Path(tempfile.mkdtemp(prefix="etl_bench_"))
+    passes = [RunReport() for _ in range(repeat)]
+    if memory:
+        passes.append(RunReport(tracemalloc_stages={"all"}))
+
+    try:
+        for report in passes:
+            state = {}
+            for name, fn in _cases(files, clean_engine, fmt, errors_dir, validation_mode):
+                with report.stage(name, rows_in=rows):
+                    fn(state)
+    finally:
+        shutil.rmtree(errors_dir, ignore_errors=True)
+
+    timed = passes[:repeat]
+    results = {}
+    for name, _ in _cases(files, clean_engine, fmt, errors_dir, validation_mode):
+        recs = [next(r for r in p.records() if r["stage"] == name) for p in timed]
+        best = min(recs, key=lambda r: r["wall_s"])
+        results[name] = {
+            "rows": rows,
+            "wall_s": best["wall_s"],
+            "cpu_s": best["cpu_s"],
+            "rows_per_s": round(rows / best["wall_s"]) if best["wall_s"] > 0 else None,
+            "rss_peak_mb": max(r["rss_peak_mb"] or 0.0 for r in recs) or None,
+        }
+        if memory:
+            traced = next(r for r in passes[-1].records() if r["stage"] == name)
+            results[name]["tracemalloc_peak_mb"] = traced.get("tracemalloc_peak_mb")
+    return results
+
+
+def run_startup(repeat: int) -> dict:
+    """
+    Importa run_pipeline en un intérprete nuevo `repeat` veces y se queda con el
+    mejor tiempo; anota además qué módulos pesados se han cargado al importarlo.
+    """
+    code = _STARTUP_CODE.format(heavy=_HEAVY_MODULES)
+    times, heavy = [], []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, check=True,
+                             capture_output=True, text=True).stdout
+        wall_s, heavy = json.loads(out.strip().splitlines()[-1])
+        times.append(wall_s)
+    return {
+        STARTUP_CASE: {
+            "rows": None,
+            "wall_s": round(min(times), 6),
+            "cpu_s": None,
+            "rows_per_s": None,
+            "rss_peak_mb": None,
+            "heavy_modules": heavy,
+        }
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[tuple[str, float]]:
+    """Devuelve los casos más lentos que la línea base en más de `tolerance` (0.1 = 10%)."""
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get("wall_s"):
+            continue
+        ratio = res["wall_s"] / base["wall_s"]
+        res["vs_baseline"] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def _print_table(results: dict):
+    print(f"{'caso':<42} {'tiempo (s)':>10} {'filas/s':>12} {'tracemalloc MB':>15} {'vs base':>8}")
+    for name, r in results.items():
+        mem = r.get("tracemalloc_peak_mb")
+        vs = r.get("vs_baseline")
+        rate = r["rows_per_s"]
+        print(
+            f"{name:<42} {r['wall_s']:>10.3f} {'-' if rate is None else f'{rate:,}':>12} "
+            f"{'-' if mem is None else f'{mem:.1f}':>15} {'-' if vs is None else f'{vs:.2f}x':>8}"
+        )
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de lectura, limpieza, validación y rechazadas")
+    parser.add_argument("--rows", type=_count, default=100_000, help="Filas por fichero generado (p. ej. 1e6)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por caso (se guarda el mejor tiempo)")
+    parser.add_argument("--invalid-ratio", type=float, default=0.05)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--regenerate", action="store_true", help="Vuelve a generar los ficheros de prueba")
+    parser.add_argument("--clean-engine", choices=ENGINES, default=CLEAN_ENGINE)
+    parser.add_argument("--validation-mode", choices=VALIDATION_MODES, default=VALIDATION_MODE)
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default=OUTPUT_FORMAT,
+                        help="Formato de los ficheros de rechazadas")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="No hace la pasada con tracemalloc")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE, help="Fichero JSON de la línea base")
+    parser.add_argument("--save-baseline", action="store_true", help="Guarda estos resultados como línea base")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Margen sobre la línea base antes de marcar una regresión (0.15 = 15%%)")
+    parser.add_argument("--output", type=Path, default=RESULTS_FILE, help="Fichero JSON con los resultados")
+    parser.add_argument("--startup-only", action="store_true",
+                        help="Solo mide el arranque de run_pipeline (sin generar datos)")
+    return parser.parse_args(argv)
+
+
+def _write_json(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".part")
+    tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    fmt = check_format(args.output_format)
+
+    results = {}
+    if not args.startup_only:
+        files = prepare_data(args.rows, args.invalid_ratio, args.duplicate_ratio, args.seed, args.regenerate)
+        results = run(files, args.rows, args.repeat, args.clean_engine, fmt, args.memory, args.validation_mode)
+    results.update(run_startup(args.repeat))
+
+    options = {
+        "rows": args.rows, "repeat": args.repeat, "invalid_ratio": args.invalid_ratio,
+        "duplicate_ratio": args.duplicate_ratio, "seed": args.seed,
+        "clean_engine": args.clean_engine, "validation_mode": args.validation_mode, "output_format": fmt,
+    }
+    if args.startup_only:
+        options = {"startup_only": True, "repeat": args.repeat}
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "options": options,
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline.get("options") != options:
+            print(f"Aviso: la línea base {args.baseline} se midió con otras opciones: {baseline.get('options')}")
+        regressions = compare(results, baseline, args.tolerance)
+
+    _print_table(results)
+    _write_json(args.output, report)
+    print(f"Resultados: {args.output}")
+
+    if args.save_baseline:
+        _write_json(args.baseline, report)
+        print(f"Línea base guardada: {args.baseline}")
+
+    for name, ratio in regressions:
+        print(f"REGRESIÓN {name}: {ratio:.2f}x más lento que la línea base")
+    heavy = results[STARTUP_CASE]["heavy_modules"]
+    if heavy:
+        print(f"REGRESIÓN {STARTUP_CASE}: importa {', '.join(heavy)} al arrancar")
+    return 1 if regressions or heavy else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
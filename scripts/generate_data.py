@@ -0,0 +1,223 @@
+import argparse
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+BENCH_PATH = PROJECT_ROOT / "data" / "bench"
+
+# Filas generadas por bloque: la memoria no depende del tamaño total del fichero
+_BLOCK_ROWS = 500_000
+
+_NOMBRES = [
+    "María", "José", "Ana-María", "Luis", "Álvaro", "Noelia", "Óscar", "Eva", "Rubén",
+    "Lucía", "Javier", "Carmen", "Íñigo", "Begoña", "Raúl", "Sofía", "Ángel", "Nuria",
+]
+_APELLIDOS = [
+    "García", "López", "Hernández", "Ruiz", "Sánchez", "Gómez", "Campos", "Rojas", "Vidal",
+    "Soto", "Mora", "Arias", "Domínguez", "Navas", "Cabrera", "Salas", "Muñoz", "Peña", "",
+]
+_DOMINIOS = ["example.com", "correo.es", "empresa.es", "mail.com"]
+_LETRAS_DNI = np.array(list("TRWAGMYFPDXBNJZSQVHLCKE"))
+_PREFIJOS_TARJETA = ["4532", "5500", "4000", "5105", "3782", "6011"]
+
+CLIENTES_COLS = ["cod cliente", "nombre", "apellido1", "apellido2", "dni", "correo", "telefono"]
+TARJETAS_COLS = ["cod_cliente", "numero_tarjeta", "fecha_exp", "cvv"]
+
+
+def _pick(rng, values, n) -> np.ndarray:
+    return np.array(values, dtype=object)[rng.integers(0, len(values), n)]
+
+
+def _digits(rng, n: int, width: int) -> pd.Series:
+    # n cadenas de `width` dígitos (con ceros a la izquierda)
+    return pd.Series(rng.integers(0, 10 ** width, n, dtype=np.int64)).astype(str).str.zfill(width)
+
+
+def _noise(rng, s: pd.Series, ratio: float = 0.1) -> pd.Series:
+    # Espacios alrededor y mayúsculas en una parte de las filas, como en los ficheros reales
+    s = s.copy()
+    spaced = rng.random(len(s)) < ratio
+    s[spaced] = " " + s[spaced] + " "
+    upper = rng.random(len(s)) < ratio
+    s[upper] = s[upper].str.upper()
+    return s
+
+
+def _cod_cliente(start: int, n: int) -> pd.Series:
+    # Los códigos válidos son C + 3 dígitos: con más de 1000 clientes se repiten
+    return "C" + pd.Series((np.arange(start, start + n) % 1000)).astype(str).str.zfill(3)
+
+
+def clientes_block(rng, start: int, n: int, invalid_ratio: float) -> pd.DataFrame:
+    num = rng.integers(0, 10 ** 8, n, dtype=np.int64)
+    nombre = pd.Series(_pick(rng, _NOMBRES, n))
+    ap1 = pd.Series(_pick(rng, _APELLIDOS[:-1], n))
+    ap2 = pd.Series(_pick(rng, _APELLIDOS, n))
+    usuario = (nombre.str.lower() + "." + ap1.str.lower()).str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+
+    df = pd.DataFrame({
+        "cod cliente": _cod_cliente(start, n),
+        "nombre": _noise(rng, nombre),
+        "apellido1": _noise(rng, ap1),
+        "apellido2": ap2.where(ap2 != "", " "),
+        "dni": pd.Series(num).astype(str).str.zfill(8) + _LETRAS_DNI[num % 23],
+        "correo": usuario + "@" + pd.Series(_pick(rng, _DOMINIOS, n)),
+        "telefono": _noise(rng, "6" + _digits(rng, n, 8)),
+    })
+
+    # Filas inválidas: un único defecto (DNI, teléfono o correo) por fila
+    bad = np.flatnonzero(rng.random(n) < invalid_ratio)
+    kind = rng.integers(0, 3, len(bad))
+    col = df.columns.get_loc
+    df.iloc[bad[kind == 0], col("dni")] = df["dni"].iloc[bad[kind == 0]].str[1:]
+    df.iloc[bad[kind == 1], col("telefono")] = df["telefono"].iloc[bad[kind == 1]].str.strip().str[:6]
+    df.iloc[bad[kind == 2], col("correo")] = df["correo"].iloc[bad[kind == 2]].str.replace("@", " ", regex=False)
+    return df
+
+
+def _luhn_cards(rng, n: int) -> pd.Series:
+    # Números de 16 dígitos con dígito de control Luhn correcto
+    prefix = np.array([[int(c) for c in p] for p in _PREFIJOS_TARJETA])[rng.integers(0, len(_PREFIJOS_TARJETA), n)]
+    body = np.hstack([prefix, rng.integers(0, 10, (n, 11))])
+    doubled = body[:, ::-1].copy()
+    doubled[:, ::2] *= 2
+    doubled[doubled > 9] -= 9
+    check = (10 - doubled.sum(axis=1) % 10) % 10
+    digits = np.hstack([body, check[:, None]]).astype(np.uint8) + ord("0")
+    return pd.Series(digits.view(f"S16").ravel()).str.decode("ascii")
+
+
+def _format_card(rng, cards: pd.Series) -> pd.Series:
+    # Mismo número escrito con espacios, guiones o sin separadores
+    style = rng.integers(0, 4, len(cards))
+    groups = [cards.str[i:i + 4] for i in range(0, 16, 4)]
+    out = cards.copy()
+    out[style == 1] = (groups[0] + " " + groups[1] + " " + groups[2] + " " + groups[3])[style == 1]
+    out[style == 2] = (groups[0] + "-" + groups[1] + "-" + groups[2] + "-" + groups[3])[style == 2]
+    out[style == 3] = (" " + cards + " ")[style == 3]
+    return out
+
+
+def tarjetas_block(rng, start: int, n: int, invalid_ratio: float, duplicate_ratio: float) -> pd.DataFrame:
+    cod = _cod_cliente(start, n)
+    cards = _luhn_cards(rng, n)
+
+    # Duplicados: la misma tarjeta del mismo cliente repetida (a veces con otro formato)
+    dup = np.flatnonzero(rng.random(n) < duplicate_ratio)
+    if len(dup):
+        src = rng.integers(0, n, len(dup))
+        cod.iloc[dup] = cod.iloc[src].to_numpy()
+        cards.iloc[dup] = cards.iloc[src].to_numpy()
+
+    year = rng.integers(2025, 2031, n)
+    month = rng.integers(1, 13, n)
+    df = pd.DataFrame({
+        "cod_cliente": cod,
+        "numero_tarjeta": _format_card(rng, cards),
+        "fecha_exp": pd.Series(year).astype(str) + "-" + pd.Series(month).astype(str).str.zfill(2),
+        "cvv": _digits(rng, n, 3),
+    })
+
+    # Filas inválidas: código de cliente, fecha o número de tarjeta incorrectos
+    bad = np.flatnonzero(rng.random(n) < invalid_ratio)
+    kind = rng.integers(0, 3, len(bad))
+    col = df.columns.get_loc
+    df.iloc[bad[kind == 0], col("cod_cliente")] = "X" + df["cod_cliente"].iloc[bad[kind == 0]].str[1:]
+    df.iloc[bad[kind == 1], col("fecha_exp")] = df["fecha_exp"].iloc[bad[kind == 1]].str[:5] + "13"
+    df.iloc[bad[kind == 2], col("numero_tarjeta")] = cards.iloc[bad[kind == 2]].str[:8]
+    return df
+
+
+def _write_lines(f, df: pd.DataFrame, quoted: bool, header: bool):
+    # Dialecto 'csv ;' o 'líneas entrecomilladas' (cada línea completa entre comillas)
+    lines = df.fillna("").astype(str).agg(";".join, axis=1)
+    if header:
+        lines = pd.concat([pd.Series([";".join(df.columns)]), lines], ignore_index=True)
+    if quoted:
+        lines = '"' + lines + '"'
+    f.write("\n".join(lines) + "\n")
+
+
+def write_file(path: Path, rows: int, kind: str, seed: int, encoding: str = "utf-8-sig",
+               quoted: bool = False, invalid_ratio: float = 0.05, duplicate_ratio: float = 0.02):
+    """Genera un fichero Clientes o Tarjetas de `rows` filas escribiendo por bloques."""
+    rng = np.random.default_rng(seed)
+    # Un único open: con utf-8-sig el BOM se escribe solo al principio
+    with open(path, "w", encoding=encoding, newline="") as f:
+        for start in range(0, max(rows, 1), _BLOCK_ROWS):
+            n = min(_BLOCK_ROWS, rows - start)
+            if kind == "clientes":
+                df = clientes_block(rng, start, n, invalid_ratio)
+            else:
+                df = tarjetas_block(rng, start, n, invalid_ratio, duplicate_ratio)
+            _write_lines(f, df, quoted, header=start == 0)
+
+
+def generate(out_dir: Path, rows: int, tarjetas_rows: int | None = None, files: int = 1,
+             start_date: date = date(2026, 1, 1), cp1252_ratio: float = 0.5, quoted_ratio: float = 0.5,
+             invalid_ratio: float = 0.05, duplicate_ratio: float = 0.02, seed: int = 42) -> list[Path]:
+    """
+    Genera `files` ficheros Clientes-<fecha>.csv y Tarjetas-<fecha>.csv en `out_dir`.
+    La codificación (cp1252 o utf-8-sig) y el dialecto de cada fichero se eligen al
+    azar con las proporciones indicadas (reproducible con `seed`).
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    tarjetas_rows = rows if tarjetas_rows is None else tarjetas_rows
+
+    paths = []
+    for i in range(files):
+        day = (start_date + timedelta(days=i)).isoformat()
+        for kind, n in (("clientes", rows), ("tarjetas", tarjetas_rows)):
+            path = out_dir / f"{kind.capitalize()}-{day}.csv"
+            write_file(
+                path, n, kind,
+                seed=int(rng.integers(0, 2 ** 31)),
+                encoding="cp1252" if rng.random() < cp1252_ratio else "utf-8-sig",
+                quoted=bool(rng.random() < quoted_ratio),
+                invalid_ratio=invalid_ratio,
+                duplicate_ratio=duplicate_ratio,
+            )
+            paths.append(path)
+    return paths
+
+
+def _count(value: str) -> int:
+    # Admite notación científica: 1e6
+    return int(float(value))
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Genera ficheros Clientes/Tarjetas sintéticos")
+    parser.add_argument("--rows", type=_count, default=10_000, help="Filas por fichero de clientes (p. ej. 1e6)")
+    parser.add_argument("--tarjetas-rows", type=_count, default=None, help="Filas por fichero de tarjetas (por defecto = --rows)")
+    parser.add_argument("--files", type=int, default=1, help="Número de días (un fichero de cada tipo por día)")
+    parser.add_argument("--start-date", type=date.fromisoformat, default=date(2026, 1, 1), help="Fecha del primer fichero")
+    parser.add_argument("--cp1252-ratio", type=float, default=0.5, help="Proporción de ficheros en cp1252 (resto utf-8-sig)")
+    parser.add_argument("--quoted-ratio", type=float, default=0.5, help="Proporción de ficheros con líneas entrecomilladas")
+    parser.add_argument("--invalid-ratio", type=float, default=0.05, help="Proporción de filas inválidas")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.02, help="Proporción de tarjetas duplicadas")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", type=Path, default=BENCH_PATH / "raw", help="Directorio de salida")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    paths = generate(
+        args.out, args.rows, args.tarjetas_rows, args.files, args.start_date,
+        args.cp1252_ratio, args.quoted_ratio, args.invalid_ratio, args.duplicate_ratio, args.seed,
+    )
+    for p in paths:
+        print(f"{p} ({p.stat().st_size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
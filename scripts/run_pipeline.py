@@ -1,152 +1,740 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import importlib.util
+import logging
+import os
+import shutil
+import signal
 import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(PROJECT_ROOT))
 
-from etl.file_discovery import discover_files
-from etl.reader import read_csv_safe
-from etl.clean_clientes import clean_dataframe_clientes
-from etl.validate_clientes import validate_clientes
-from etl.clean_tarjetas import clean_tarjetas
-from etl.validate_tarjetas import validate_tarjetas
-from etl.errors import write_rows_rejected_clientes_tarjetas
-from etl.logger import setup_logger
-import etl.db_loader as db_loader
+from etl.file_discovery import CLIENTES_PATTERN, discover_files
+from etl.logger import LOG_FORMAT, LOG_FORMATS, LOG_QUEUE, setup_logger
+from etl.cache import LastRun, ProcessingCache, code_version, CACHE_ENABLED, stat_fingerprint
+from etl.watcher import FileWatcher, WATCH_INTERVAL, WATCH_SETTLE, signatures
+import etl.metrics as metrics
+import etl.settings as settings
+
+
+def _lazy(name: str):
+    # Módulo que se importa de verdad la primera vez que se usa uno de sus atributos:
+    # pandas, numpy y psycopg2 solo se cargan cuando una etapa los necesita
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+reader = _lazy("etl.reader")
+clean_clientes_mod = _lazy("etl.clean_clientes")
+validate_clientes_mod = _lazy("etl.validate_clientes")
+clean_tarjetas_mod = _lazy("etl.clean_tarjetas")
+validate_tarjetas_mod = _lazy("etl.validate_tarjetas")
+errors = _lazy("etl.errors")
+formats = _lazy("etl.formats")
+profiling = _lazy("etl.profiling")
+rules = _lazy("etl.rules")
+db_loader = _lazy("etl.db_loader")
+db = _lazy("etl.db")
 
 INPUT_PATH = PROJECT_ROOT / "data" / "raw"
 OUTPUT_PATH = PROJECT_ROOT / "data" / "output"
 ERRORS_PATH = PROJECT_ROOT / "errors"
 LOG_FILE = PROJECT_ROOT / "logs" / "etl.log"
+REPORT_FILE = PROJECT_ROOT / "logs" / "run_report.json"
+PROFILE_PATH = PROJECT_ROOT / "logs" / "profile"
+CACHE_PATH = PROJECT_ROOT / "data" / ".cache"
 
 
 def _count_errors(err_list) -> int:
     return sum(len(df) for df in err_list) if err_list else 0
 
 
+def _top_motivos(err_list) -> list[tuple[str, int]] | None:
+    # Los 5 motivos más frecuentes; None si los errores no traen error_detalle
+    import pandas as pd
+    merged = pd.concat(err_list, ignore_index=True)
+    if "error_detalle" not in merged.columns:
+        return None
+    return [(str(m), int(c)) for m, c in merged["error_detalle"].value_counts().head(5).items()]
+
+
+def _log_motivos(logger, motivos, title: str):
+    if motivos is None:
+        logger.warning(f"{title} (sin columna error_detalle)")
+        return
+    for motivo, cnt in motivos:
+        logger.warning(f"{title} motivo='{motivo}' -> {cnt}")
+
+
 def _log_error_details(logger, err_list, title: str):
     if not err_list:
         return
     try:
-        import pandas as pd
-        merged = pd.concat(err_list, ignore_index=True)
-        if "error_detalle" in merged.columns:
-            top = merged["error_detalle"].value_counts().head(5)
-            for motivo, cnt in top.items():
-                logger.warning(f"{title} motivo='{motivo}' -> {cnt}")
-        else:
-            logger.warning(f"{title} (sin columna error_detalle)")
+        _log_motivos(logger, _top_motivos(err_list), title)
     except Exception:
         logger.exception("No se pudo calcular el resumen de motivos de error")
 
 
-def main():
-    logger = setup_logger(log_file=str(LOG_FILE))
-    logger.info("Inicio del pipeline ETL")
-
-    INPUT_PATH.mkdir(parents=True, exist_ok=True)
-    OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
-    ERRORS_PATH.mkdir(parents=True, exist_ok=True)
+def _transform_clientes(df, clean_engine=None, validation_mode=None):
+    with metrics.stage("clean", rows_in=len(df)) as st:
+        df = clean_clientes_mod.clean_dataframe_clientes(df, engine=clean_engine)
+        st["rows_out"] = len(df)
+    with metrics.stage("validate", rows_in=len(df)) as st:
+        df, errs = validate_clientes_mod.validate_clientes(df, mode=validation_mode)
+        st["rows_out"] = len(df)
+
+    # En cleaned renombrar dni_masked a dni
+    df.drop(columns=["dni"], inplace=True, errors="ignore")
+    df.rename(columns={"dni_masked": "dni"}, inplace=True)
+
+    # Reordenar columnas  (primero datos, luego flags)
+    desired_cols = [
+        "cod_cliente", "nombre", "apellido1",
+        "apellido2", "dni", "correo", "telefono",
+        "DNI_OK", "DNI_KO", "Telefono_OK", "Telefono_KO",
+        "Correo_OK", "Correo_KO",
+    ]
+    df = df[[c for c in desired_cols if c in df.columns]
+            + [c for c in df.columns if c not in desired_cols]]
+
+    return df, errs
+
+
+def _transform_tarjetas(df, clean_engine=None, validation_mode=None):
+    with metrics.stage("clean", rows_in=len(df)) as st:
+        df = clean_tarjetas_mod.clean_tarjetas(df, engine=clean_engine)
+        st["rows_out"] = len(df)
+    with metrics.stage("validate", rows_in=len(df)) as st:
+        df, errs = validate_tarjetas_mod.validate_tarjetas(df, mode=validation_mode)
+        st["rows_out"] = len(df)
+
+    # En cleaned NO guardamos columnas auxiliares
+    df.drop(
+        columns=[
+            "card_clean",
+            "CodCliente_OK",
+            "CodCliente_KO",
+            "FechaExp_OK",
+            "FechaExp_KO",
+            "Tarjeta_OK",
+            "Tarjeta_KO",
+        ],
+        inplace=True,
+        errors="ignore",
+    )
+
+    return df, errs
+
+
+def _log_rejected(logger, errs, title: str):
+    rejected = _count_errors(errs)
+    if rejected > 0:
+        logger.warning(f"Filas rechazadas {title}: {rejected}")
+        _log_error_details(logger, errs, title=title)
+    else:
+        logger.info(f"Filas rechazadas {title}: 0")
 
-    clientes, tarjetas, ignored = discover_files(str(INPUT_PATH))
-    logger.info(f"Clientes encontrados: {len(clientes)}")
-    logger.info(f"Tarjetas encontradas: {len(tarjetas)}")
-    logger.info(f"Ficheros ignorados: {len(ignored)}")
 
-    all_errors = []
-
-    # CLIENTES
-    for file in clientes:
-        try:
-            logger.info(f"Procesando CLIENTES: {file.name}")
-
-            df = read_csv_safe(file)
-            logger.info(f"Filas leídas CLIENTES: {len(df)}")
-
-            df = clean_dataframe_clientes(df)
-            df, errs = validate_clientes(df)
-
-            # En cleaned renombrar dni_masked a dni
-            df.drop(columns=["dni"], inplace=True, errors="ignore")
-            df.rename(columns={"dni_masked": "dni"}, inplace=True)
-
-            # Reordenar columnas  (primero datos, luego flags)
-            desired_cols = [
-                "cod_cliente", "nombre", "apellido1",
-                "apellido2", "dni", "correo", "telefono",
-                "DNI_OK", "DNI_KO", "Telefono_OK", "Telefono_KO",
-                "Correo_OK", "Correo_KO",
-            ]
-            df = df[[c for c in desired_cols if c in df.columns]
-                    + [c for c in df.columns if c not in desired_cols]]
-
-            rejected = _count_errors(errs)
-            if rejected > 0:
-                logger.warning(f"Filas rechazadas CLIENTES: {rejected}")
-                _log_error_details(logger, errs, title="CLIENTES")
-            else:
-                logger.info("Filas rechazadas CLIENTES: 0")
+def _log_stats(logger, stats: dict, title: str):
+    # Mismos logs que el procesado real, a partir de las estadísticas guardadas
+    logger.info(f"Filas leídas {title}: {stats['leidas']}")
+    if stats["rechazadas"] > 0:
+        logger.warning(f"Filas rechazadas {title}: {stats['rechazadas']}")
+        _log_motivos(logger, stats["motivos"], title)
+    else:
+        logger.info(f"Filas rechazadas {title}: 0")
+
+
+def _cleaned_path(file: Path, fmt: str = "csv") -> Path:
+    return OUTPUT_PATH / f"{file.stem}.cleaned{formats.suffix(fmt)}"
+
+
+def _sink_errors(sink: errors.RejectedSink, errs):
+    if errs:
+        with metrics.stage("errors", rows_in=_count_errors(errs)):
+            sink.write(errs)
+
+
+def _profile_frame(data_profile, df):
+    # Perfil de los datos leídos, antes de limpiarlos (None = sin perfil)
+    if data_profile is not None:
+        with metrics.stage("profile", rows_in=len(df)):
+            data_profile.update(df)
+
+
+def _process_file(file: Path, title: str, transform, logger, sink: errors.RejectedSink, fmt: str = "csv",
+                  profile: bool = False) -> dict:
+    # Modo clásico: el fichero completo en memoria. Las rechazadas van al sink.
+    # Devuelve las estadísticas del fichero.
+    with metrics.stage("read") as st:
+        df = reader.read_csv_safe(file, logger=logger)
+        st["rows_out"] = leidas = len(df)
+    logger.info(f"Filas leídas {title}: {leidas}")
+
+    data_profile = profiling.FrameProfile(files=1) if profile else None
+    _profile_frame(data_profile, df)
+    df, errs = transform(df)
+    _log_rejected(logger, errs, title)
+    _sink_errors(sink, errs)
+
+    out = _cleaned_path(file, fmt)
+    with metrics.stage("write", rows_in=len(df)):
+        formats.write_frame(df, out, fmt)
+    logger.info(f"Archivo generado: {out.name}")
+
+    rejected = _count_errors(errs)
+    stats = {
+        "leidas": leidas,
+        "rechazadas": rejected,
+        "motivos": _top_motivos(errs) if rejected else [],
+    }
+    if data_profile is not None:
+        stats["perfil"] = data_profile.to_state()
+    return stats
+
+
+def _process_file_chunked(file: Path, title: str, transform, logger, chunksize: int,
+                          sink: errors.RejectedSink, fmt: str = "csv", profile: bool = False) -> dict:
+    # Modo streaming: cleaned y rechazadas se añaden a disco al terminar cada bloque.
+    # Devuelve las estadísticas del fichero.
+    out = _cleaned_path(file, fmt)
+    tmp = out.with_name(out.name + ".part")
+
+    leidas = 0
+    rejected = 0
+    motivos = Counter()
+    first = True
+    data_profile = profiling.FrameProfile(files=1) if profile else None
 
-            all_errors.extend(errs)
+    try:
+        with formats.FrameWriter(tmp, fmt) as writer:
+            chunks = reader.iter_csv_chunks(file, chunksize=chunksize, logger=logger)
+            for chunk in metrics.iter_stage("read", chunks):
+                leidas += len(chunk)
+                _profile_frame(data_profile, chunk)
+                df, errs = transform(chunk)
+
+                with metrics.stage("write", rows_in=len(df)):
+                    writer.write(df)
+                first = False
+
+                if errs:
+                    n = _count_errors(errs)
+                    rejected += n
+                    for e in errs:
+                        if "error_detalle" in e.columns:
+                            motivos.update(e["error_detalle"].value_counts().to_dict())
+                    _sink_errors(sink, errs)
+
+            if first:
+                # Fichero sin filas: mantenemos el mismo resultado que el modo clásico
+                df, _ = transform(reader.read_csv_safe(file))
+                writer.write(df)
+
+        tmp.replace(out)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    stats = {
+        "leidas": leidas,
+        "rechazadas": rejected,
+        "motivos": [(str(m), int(c)) for m, c in motivos.most_common(5)],
+    }
+    if data_profile is not None:
+        stats["perfil"] = data_profile.to_state()
+    _log_stats(logger, stats, title)
+    logger.info(f"Archivo generado: {out.name}")
+
+    return stats
+
+
+def _handle_file(file: Path, title: str, transform, logger, sink: errors.RejectedSink, chunksize: int = 0,
+                 fmt: str = "csv", profile: bool = False):
+    # Procesa un fichero escribiendo sus rechazadas en `sink`; devuelve sus estadísticas o None si falla
+    try:
+        logger.info(f"Procesando {title}: {file.name}")
+        with metrics.for_file(file.name):
+            if chunksize > 0:
+                return _process_file_chunked(file, title, transform, logger, chunksize, sink, fmt, profile)
+            return _process_file(file, title, transform, logger, sink, fmt, profile)
+    except Exception:
+        logger.exception(f"Error procesando {title}: {file.name}")
+        return None
 
-            out = OUTPUT_PATH / f"{file.stem}.cleaned.csv"
-            df.to_csv(out, index=False, sep=";", encoding="utf-8")
-            logger.info(f"Archivo generado: {out.name}")
 
-        except Exception:
-            logger.exception(f"Error procesando CLIENTES: {file.name}")
+def _count_rejected(rejected: Counter, title: str, stats):
+    # Rechazadas por tipo (CLIENTES/TARJETAS), para el resumen final
+    rejected[title] += stats["rechazadas"] if stats else 0
 
-    # TARJETAS
-    for file in tarjetas:
-        try:
-            logger.info(f"Procesando TARJETAS: {file.name}")
 
-            df = read_csv_safe(file)
-            logger.info(f"Filas leídas TARJETAS: {len(df)}")
+def _add_profile(profiles: dict | None, title: str, stats):
+    # Suma el perfil de un fichero al de su tipo (CLIENTES/TARJETAS)
+    if profiles is None or not stats or stats.get("perfil") is None:
+        return
+    data_profile = profiling.FrameProfile.from_state(stats["perfil"])
+    if title in profiles:
+        profiles[title].merge(data_profile)
+    else:
+        profiles[title] = data_profile
+
+
+def _log_cached(logger, file: Path, title: str, stats: dict, fmt: str = "csv"):
+    logger.info(f"Procesando {title}: {file.name}")
+    logger.info(f"Sin cambios desde la última ejecución, se reutiliza la caché: {file.name}")
+    _log_stats(logger, stats, title)
+    logger.info(f"Archivo reutilizado: {_cleaned_path(file, fmt).name}")
+
+
+def _run_sequential(tasks, logger, chunksize: int, cache: ProcessingCache | None = None, fmt: str = "csv",
+                    profiles: dict | None = None):
+    # Sin caché, las rechazadas de todos los ficheros se van añadiendo a errors/;
+    # con caché, cada fichero escribe las suyas en su directorio de la caché.
+    # Con `profiles` (dict) se perfila cada fichero y se acumula por tipo
+    profile = profiles is not None
+    rejected = Counter()
+    with errors.RejectedSink(ERRORS_PATH, fmt) as shared:
+        for file, title, transform in tasks:
+            stats = cache.lookup(file, _cleaned_path(file, fmt)) if cache else None
+            if stats is not None:
+                _log_cached(logger, file, title, stats, fmt)
+            elif cache:
+                fingerprint = cache.begin(file)
+                with errors.RejectedSink(cache.parts_dir(file), fmt) as sink:
+                    stats = _handle_file(file, title, transform, logger, sink, chunksize, fmt, profile)
+                if stats is not None:
+                    cache.store(file, fingerprint, _cleaned_path(file, fmt), stats)
+            else:
+                stats = _handle_file(file, title, transform, logger, shared, chunksize, fmt, profile)
+            _count_rejected(rejected, title, stats)
+            _add_profile(profiles, title, stats)
+    return rejected
+
+
+class _RecordBuffer(logging.Handler):
+    """Guarda los logs de un worker para reemitirlos en orden desde el proceso padre."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        # Los tracebacks no se pueden enviar entre procesos: se pasan ya formateados
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.msg = record.getMessage()
+        record.args = None
+        self.records.append(record)
+
+
+def _handle_file_worker(task):
+    # Ejecutado en el pool de procesos: mismo trabajo que _handle_file, con logs en memoria
+    file, title, transform, chunksize, errors_dir, fmt, metrics_config, profile = task
+
+    buffer = _RecordBuffer()
+    worker_logger = logging.Logger("etl", level=logging.INFO)
+    worker_logger.addHandler(buffer)
+
+    if metrics_config is not None:
+        metrics.start(**metrics_config)
+    with errors.RejectedSink(errors_dir, fmt) as sink:
+        stats = _handle_file(file, title, transform, worker_logger, sink, chunksize, fmt, profile)
+    report = metrics.stop()
+    return stats, buffer.records, report.records() if report else []
+
+
+def _run_parallel(tasks, logger, workers: int, chunksize: int, cache: ProcessingCache | None = None,
+                  fmt: str = "csv", profiles: dict | None = None):
+    """
+    Procesa los ficheros en un pool de procesos. Los resultados se recogen en el
+    orden de `tasks` (no en el de finalización), así que logs, errores y
+    rechazadas son los mismos que en modo secuencial. Cada worker escribe las
+    rechazadas de su fichero en un directorio propio. Los ficheros sin cambios
+    (caché) no se envían al pool.
+    """
+    parts_dir = ERRORS_PATH / ".parts"
+    cached = {file: cache.lookup(file, _cleaned_path(file, fmt)) if cache else None for file, _, _ in tasks}
+    fingerprints = {file: cache.begin(file) for file, _, _ in tasks if cache and cached[file] is None}
+    report = metrics.current()
+    metrics_config = report.config() if report else None
+    jobs = [
+        (file, title, transform, chunksize, cache.parts_dir(file) if cache else parts_dir / file.stem, fmt,
+         metrics_config, profiles is not None)
+        for file, title, transform in tasks
+        if cached[file] is None
+    ]
+
+    rejected = Counter()
+    # Sin caché, las rechazadas de cada fichero se van añadiendo a errors/ (un writer por fichero de salida)
+    writers = {name: formats.FrameWriter(ERRORS_PATH / name, fmt) for name in errors.rejected_file_names(fmt)}
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_handle_file_worker, jobs)
+            for file, title, _ in tasks:
+                if cached[file] is not None:
+                    _log_cached(logger, file, title, cached[file], fmt)
+                    _count_rejected(rejected, title, cached[file])
+                    _add_profile(profiles, title, cached[file])
+                    continue
+
+                stats, records, stage_records = next(results)
+                for record in records:
+                    logger.handle(record)
+                if report:
+                    report.merge(stage_records)
+                _count_rejected(rejected, title, stats)
+                _add_profile(profiles, title, stats)
+
+                if cache:
+                    if stats is not None:
+                        cache.store(file, fingerprints[file], _cleaned_path(file, fmt), stats)
+                    continue
+
+                # Rechazadas de cada fichero en su propio directorio, se unen en orden
+                with metrics.stage("errors", file=file.name):
+                    for name, writer in writers.items():
+                        part = parts_dir / file.stem / name
+                        if part.exists():
+                            writer.write_file(part)
+    finally:
+        for writer in writers.values():
+            writer.close()
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    return rejected
+
+
+def _append_rejected(dirs: list[Path], fmt: str = "csv"):
+    # Añade a errors/ las rechazadas guardadas en cada directorio, en orden y con una
+    # sola escritura por fichero de salida
+    for name in errors.rejected_file_names(fmt):
+        parts = [d / name for d in dirs if (d / name).exists()]
+        if parts:
+            formats.append_files(parts, ERRORS_PATH / name)
+
+
+def _collect_cached_rejected(tasks, cache: ProcessingCache, fmt: str = "csv"):
+    # Con caché, las rechazadas de errors/ se rehacen uniendo las de cada fichero en orden
+    with metrics.stage("errors"):
+        for name in errors.rejected_file_names(fmt):
+            (ERRORS_PATH / name).unlink(missing_ok=True)
+        _append_rejected([cache.parts_dir(file) for file, _, _ in tasks], fmt)
+
+
+def _tasks(clientes, tarjetas, clean_engine: str, validation_mode: str):
+    # Orden estable: los resultados no dependen del orden del directorio ni de los workers
+    options = {"clean_engine": clean_engine, "validation_mode": validation_mode}
+    return [
+        (file, title, transform)
+        for title, files, transform in (
+            ("CLIENTES", clientes, partial(_transform_clientes, **options)),
+            ("TARJETAS", tarjetas, partial(_transform_tarjetas, **options)),
+        )
+        for file in sorted(files)
+    ]
+
+
+def _watch_file(file: Path, title: str, transform, logger, chunksize: int,
+                cache: ProcessingCache | None, fmt: str = "csv"):
+    # Modo watch: procesa un fichero recién llegado. Sus rechazadas quedan en su
+    # directorio de la caché (o en errors/.parts/<fichero>); devuelve (stats, directorio)
+    parts_dir = cache.parts_dir(file) if cache else ERRORS_PATH / ".parts" / file.stem
+    fingerprint = cache.begin(file) if cache else None
+    with errors.RejectedSink(parts_dir, fmt) as sink:
+        stats = _handle_file(file, title, transform, logger, sink, chunksize, fmt)
+    if cache and stats is not None:
+        cache.store(file, fingerprint, _cleaned_path(file, fmt), stats)
+    return stats, parts_dir
+
+
+def _watch(args, logger, fmt: str, cache: ProcessingCache | None, done: dict):
+    """
+    Modo watch: tras la ejecución normal se queda vigilando data/raw y lleva cada
+    fichero nuevo o modificado por limpieza, validación y carga, sin volver a
+    procesar el resto. `done` son las firmas de los ficheros que encontró la
+    ejecución normal (watcher.signatures): los que hayan llegado después se
+    procesan. A errors/ se añaden solo las rechazadas de los ficheros nuevos. La
+    conexión a la BD se mantiene abierta entre ficheros. Las tarjetas se cargan en
+    modo incremental (manifiesto). Termina con Ctrl+C o SIGTERM.
+    """
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    watcher = FileWatcher(INPUT_PATH, args.watch_interval, args.watch_settle, done=done)
+    logger.info(f"Modo watch: vigilando {INPUT_PATH} ({watcher.mode}, cada {watcher.interval}s)")
+
+    session = None
+    # Cleaned pendientes de cargar (se reintentan con el siguiente lote si falla la carga)
+    pending = {"CLIENTES": [], "TARJETAS": []}
+    try:
+        for files in watcher.watch(stop):
+            start = time.perf_counter()
+            clientes = [f for f in files if CLIENTES_PATTERN.match(f.name)]
+            tarjetas = [f for f in files if f not in clientes]
+            # Clientes antes que tarjetas, igual que en la ejecución normal
+            parts = []
+            try:
+                for file, title, transform in _tasks(clientes, tarjetas, args.clean_engine, args.validation_mode):
+                    stats, parts_dir = _watch_file(file, title, transform, logger, args.chunksize, cache, fmt)
+                    parts.append(parts_dir)
+                    watcher.mark_done(file)
+                    if stats is not None:
+                        pending[title].append(_cleaned_path(file, fmt))
+                _append_rejected(parts, fmt)
+            finally:
+                shutil.rmtree(ERRORS_PATH / ".parts", ignore_errors=True)
+
+            try:
+                if session is None:
+                    session = db_loader.LoadSession(logger, method=args.load_method, tarjetas_mode="incremental",
+                                                    fk_check=args.fk_check, workers=args.load_workers)
+                session.load(pending["CLIENTES"], pending["TARJETAS"])
+                pending = {"CLIENTES": [], "TARJETAS": []}
+            except Exception:
+                logger.exception("Fallo en la carga a PostgreSQL")
+                if session is not None:
+                    session.close()
+                    session = None
+                continue
+
+            logger.info(f"Modo watch: {len(files)} fichero(s) procesados y cargados en {time.perf_counter() - start:.2f}s")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        if session is not None:
+            session.close()
+    logger.info("Modo watch: detenido")
+
+
+def _cache_version(clean_engine: str, fmt: str = "csv", validation_mode: str = "soft",
+                   data_profile: bool = False) -> str:
+    # Código y configuración que afectan a cleaned y rechazadas (la sal solo hasheada)
+    etl_dir = PROJECT_ROOT / "etl"
+    sources = [Path(__file__)] + [
+        etl_dir / f"{name}.py"
+        for name in ("reader", "clean_clientes", "clean_tarjetas", "validate_clientes",
+                     "validate_tarjetas", "vector_utils", "schema", "rules", "errors", "formats")
+    ]
+    config = {
+        "clean_engine": clean_engine,
+        "output_format": fmt,
+        "csv_engine": os.getenv("ETL_CSV_ENGINE", "c").strip().lower(),
+        "card_salt": hashlib.sha256(clean_tarjetas_mod.SALT.encode("utf-8")).hexdigest(),
+        "rules": rules.effective_rules(mode=validation_mode),
+        # Con perfil, cada entrada de la caché guarda también el de su fichero
+        "data_profile": data_profile,
+    }
+    if data_profile:
+        sources.append(etl_dir / "profiling.py")
+    return code_version(sources, config)
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline ETL de Clientes y Tarjetas")
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=0,
+        help="Procesa cada fichero en bloques de N filas (0 = fichero completo en memoria)",
+    )
+    parser.add_argument(
+        "--clean-engine",
+        choices=settings.ENGINES,
+        default=settings.CLEAN_ENGINE,
+        help="Motor de limpieza: vectorized (por columnas) o python (apply por fila)",
+    )
+    parser.add_argument(
+        "--validation-mode",
+        choices=settings.VALIDATION_MODES,
+        default=settings.VALIDATION_MODE,
+        help="Validación: soft (solo formato) o strict (además Luhn de tarjetas y letra del DNI)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Procesa los ficheros en paralelo con N procesos (1 = secuencial)",
+    )
+    parser.add_argument(
+        "--load-method",
+        choices=settings.LOAD_METHODS,
+        default=settings.LOAD_METHOD,
+        help="Carga a PostgreSQL: insert (execute_values) o copy (COPY a staging + merge en SQL)",
+    )
+    parser.add_argument(
+        "--tarjetas-mode",
+        choices=settings.TARJETAS_MODES,
+        default=settings.TARJETAS_MODE,
+        help="Carga de tarjetas: full (TRUNCATE + recarga total) o incremental (solo ficheros nuevos)",
+    )
+    parser.add_argument(
+        "--fk-check",
+        choices=settings.FK_CHECKS,
+        default=settings.FK_CHECK,
+        help="Filtro FK de tarjetas (método insert): client (set de clientes en Python) o server (cruce en la BD)",
+    )
+    parser.add_argument(
+        "--load-workers",
+        type=int,
+        default=settings.LOAD_WORKERS,
+        help="Conexiones en paralelo para la carga con el método insert (1 = una sola conexión). "
+             "Cada fichero se confirma cuando han terminado todas sus particiones; si una falla "
+             "se deshacen todas",
+    )
+    parser.add_argument(
+        "--merge-partitions",
+        type=int,
+        default=settings.MERGE_PARTITIONS,
+        help="Recarga total de tarjetas (método insert): particiones en disco para el merge (1 = en memoria)",
+    )
+    parser.add_argument(
+        "--data-profile",
+        action="store_true",
+        default=settings.DATA_PROFILE,
+        help="Añade al informe el perfil de los datos de entrada (nulos, distintos, más frecuentes, longitudes)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="cache",
+        action="store_false",
+        default=CACHE_ENABLED,
+        help="Reprocesa todos los ficheros aunque no hayan cambiado desde la última ejecución",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=settings.OUTPUT_FORMATS,
+        default=settings.OUTPUT_FORMAT,
+        help="Formato de cleaned y rechazadas: csv, parquet (zstd) o feather (Arrow IPC)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Tras la ejecución, sigue vigilando data/raw y procesa y carga cada fichero nuevo al llegar",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=WATCH_INTERVAL,
+        help="Modo watch: segundos entre revisiones de data/raw",
+    )
+    parser.add_argument(
+        "--watch-settle",
+        type=float,
+        default=WATCH_SETTLE,
+        help="Modo watch: segundos sin cambios para dar un fichero por completo",
+    )
+    parser.add_argument(
+        "--log-queue",
+        action="store_true",
+        default=LOG_QUEUE,
+        help="Los logs se encolan y un hilo aparte los escribe en fichero y consola",
+    )
+    parser.add_argument(
+        "--log-format",
+        choices=LOG_FORMATS,
+        default=LOG_FORMAT,
+        help="Formato del fichero de log: text o json (un objeto JSON por línea)",
+    )
+    parser.add_argument(
+        "--report",
+        type=Path,
+        default=REPORT_FILE,
+        help="Fichero JSON con las métricas por etapa y fichero de la ejecución",
+    )
+    parser.add_argument(
+        "--profile",
+        type=_stage_list,
+        default=set(),
+        help=f"Perfila con cProfile estas etapas (separadas por comas, o 'all'): {', '.join(metrics.STAGES)}",
+    )
+    parser.add_argument(
+        "--tracemalloc",
+        type=_stage_list,
+        default=set(),
+        help="Mide con tracemalloc el pico de memoria Python de estas etapas (más lento)",
+    )
+    return parser.parse_args(argv)
+
+
+def _stage_list(value: str) -> set[str]:
+    stages = {v.strip() for v in value.split(",") if v.strip()}
+    unknown = stages - set(metrics.STAGES) - {"all"}
+    if unknown:
+        raise argparse.ArgumentTypeError(f"etapas desconocidas: {', '.join(sorted(unknown))}")
+    return stages
+
+
+def _log_report(logger, report: dict, path: Path):
+    for name, t in report["totals"].items():
+        if name.startswith(metrics.RULE_PREFIX):
+            # Reglas de validación: filas que llegan a la regla y filas que no la cumplen
+            failed = f", fallos {t['rows_in'] - t['rows_out']} de {t['rows_in']}" if t["rows_out"] is not None else ""
+            logger.info(f"Regla {name[len(metrics.RULE_PREFIX):]}: {t['wall_s']:.3f}s reales{failed}")
+            continue
+        counts = [str(t[k]) for k in ("rows_in", "rows_out") if t[k] is not None]
+        rows = f", filas {' -> '.join(counts)}" if counts else ""
+        logger.info(f"Métricas {name}: {t['wall_s']:.3f}s reales, {t['cpu_s']:.3f}s CPU{rows}")
+    logger.info(f"Informe de ejecución: {path} ({report['wall_s']:.3f}s, pico RSS {report['rss_peak_mb']} MB)")
+
+
+def _log_data_profile(logger, summary: dict):
+    for title, data_profile in summary.items():
+        for name, col in data_profile["columns"].items():
+            lengths = list(col["lengths"])
+            span = f", longitud {lengths[0]}..{lengths[-1]}" if lengths else ""
+            null_rate = f"{col['null_rate']:.1%}" if col["null_rate"] is not None else "-"
+            logger.info(f"Perfil {title}.{name}: nulos {null_rate}, ~{col['distinct_approx']} distintos{span}")
+
+
+def _run(args, logger, fmt: str, clientes, tarjetas, cache: ProcessingCache | None,
+         profiles: dict | None = None) -> bool:
+    """
+    Procesado y carga de la ejecución normal. Devuelve True si la carga ha ido bien
+    y todos los ficheros se han procesado (solo se sabe con la caché activa).
+    Con `profiles` (dict) deja en él el perfil de datos de cada tipo de fichero.
+    """
+    if args.chunksize > 0:
+        logger.info(f"Modo streaming: bloques de {args.chunksize} filas")
+    # Las rechazadas se sobrescriben en cada run: se vacían antes de ir añadiendo
+    for name in errors.rejected_file_names(fmt):
+        (ERRORS_PATH / name).unlink(missing_ok=True)
+
+    tasks = _tasks(clientes, tarjetas, args.clean_engine, args.validation_mode)
+
+    if args.workers > 1 and len(tasks) > 1:
+        logger.info(f"Procesamiento en paralelo: {args.workers} procesos")
+        rejected = _run_parallel(tasks, logger, args.workers, args.chunksize, cache, fmt, profiles)
+    else:
+        rejected = _run_sequential(tasks, logger, args.chunksize, cache, fmt, profiles)
 
-            df = clean_tarjetas(df)
-            df, errs = validate_tarjetas(df)
+    # ERRORES (ya escritos en errors/ a medida que se validaba cada fichero o bloque)
+    if cache:
+        _collect_cached_rejected(tasks, cache, fmt)
 
-            rejected = _count_errors(errs)
-            if rejected > 0:
-                logger.warning(f"Filas rechazadas TARJETAS: {rejected}")
-                _log_error_details(logger, errs, title="TARJETAS")
-            else:
-                logger.info("Filas rechazadas TARJETAS: 0")
-
-            all_errors.extend(errs)
-
-            # En cleaned NO guardamos columnas auxiliares
-            df.drop(
-                columns=[
-                    "card_clean",
-                    "CodCliente_OK",
-                    "CodCliente_KO",
-                    "FechaExp_OK",
-                    "FechaExp_KO",
-                    "Tarjeta_OK",
-                    "Tarjeta_KO",
-                ],
-                inplace=True,
-                errors="ignore",
-            )
-
-            out = OUTPUT_PATH / f"{file.stem}.cleaned.csv"
-            df.to_csv(out, index=False, sep=";", encoding="utf-8")
-            logger.info(f"Archivo generado: {out.name}")
-
-        except Exception:
-            logger.exception(f"Error procesando TARJETAS: {file.name}")
-
-    # ERRORES
-    total_rejected = _count_errors(all_errors)
+    total_rejected = sum(rejected.values())
     if total_rejected > 0:
-        write_rows_rejected_clientes_tarjetas(
-            all_errors,
-            output_dir=str(ERRORS_PATH),
-            include_motivo=True,   # pon False si no quieres la columna motivo
-            logger=logger
-        )
+        for title, name in zip(("CLIENTES", "TARJETAS"), errors.rejected_file_names(fmt)):
+            if rejected[title] > 0:
+                logger.warning(f"Generado {ERRORS_PATH / name} -> {rejected[title]} filas rechazadas ({title})")
+            else:
+                logger.info(f"{title}: no hay filas rechazadas. No se genera CSV.")
         logger.warning(f"Total filas erróneas registradas: {total_rejected}")
     else:
         logger.info("No hay filas erróneas. No se generan CSV de rechazadas")
@@ -154,10 +742,103 @@ def main():
     # CARGA A POSTGRESQL
     try:
         logger.info("Iniciando carga de cleaned a PostgreSQL...")
-        db_loader.load_cleaned_to_postgres(OUTPUT_PATH, logger=logger)
+        with metrics.stage("load"):
+            db_loader.load_cleaned_to_postgres(OUTPUT_PATH, logger=logger, method=args.load_method,
+                                               tarjetas_mode=args.tarjetas_mode, fk_check=args.fk_check,
+                                               output_format=fmt, workers=args.load_workers,
+                                               merge_partitions=args.merge_partitions)
         logger.info("Carga a PostgreSQL completada")
     except Exception:
         logger.exception("Fallo en la carga a PostgreSQL")
+        return False
+
+    # Un fichero que ha fallado no tiene entrada en la caché
+    return cache is not None and all(cache.lookup(file, _cleaned_path(file, fmt)) is not None for file, _, _ in tasks)
+
+
+# Opciones que no cambian el resultado de una ejecución
+_RUN_ONLY_OPTIONS = {"watch", "watch_interval", "watch_settle", "log_queue", "log_format", "report"}
+
+
+def _fingerprint_env() -> dict:
+    # Variables de entorno que afectan a la ejecución, tomadas al arrancar (la carga
+    # añade al entorno las de .env, que ya cuentan por la fecha del fichero)
+    env = {k: v for k, v in os.environ.items() if k.startswith(("ETL_", "PG"))}
+    env["CARD_SALT"] = hashlib.sha256(os.getenv("CARD_SALT", "").encode("utf-8")).hexdigest()
+    return env
+
+
+def _run_fingerprint(args, raw_files: list[Path], env: dict) -> str:
+    # Entradas, salidas, código, configuración y opciones de una ejecución (solo stat, sin leer ficheros)
+    paths = list(raw_files) + [p for d in (OUTPUT_PATH, ERRORS_PATH) for p in d.iterdir() if p.is_file()]
+    paths += [Path(__file__), *(PROJECT_ROOT / "etl").glob("*.py"), settings.CONFIG_FILE, PROJECT_ROOT / ".env"]
+    options = {k: sorted(v) if isinstance(v, set) else v for k, v in vars(args).items() if k not in _RUN_ONLY_OPTIONS}
+    return stat_fingerprint(paths, {"options": options, "env": env})
+
+
+def _processing_cache(args, fmt: str) -> ProcessingCache | None:
+    if not args.cache:
+        return None
+    return ProcessingCache(CACHE_PATH, _cache_version(args.clean_engine, fmt, args.validation_mode, args.data_profile))
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    metrics.start(profile=args.profile, tracemalloc_stages=args.tracemalloc, profile_dir=PROFILE_PATH)
+
+    logger = setup_logger(log_file=str(LOG_FILE), use_queue=args.log_queue, log_format=args.log_format)
+    logger.info("Inicio del pipeline ETL")
+
+    INPUT_PATH.mkdir(parents=True, exist_ok=True)
+    OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
+    ERRORS_PATH.mkdir(parents=True, exist_ok=True)
+
+    with metrics.stage("discovery"):
+        clientes, tarjetas, ignored = discover_files(str(INPUT_PATH))
+    # Firmas tomadas al descubrir: lo que llegue durante la ejecución lo recoge el modo watch
+    watch_done = signatures(clientes + tarjetas) if args.watch else None
+    logger.info(f"Clientes encontrados: {len(clientes)}")
+    logger.info(f"Tarjetas encontradas: {len(tarjetas)}")
+    logger.info(f"Ficheros ignorados: {len(ignored)}")
+
+    # Con la caché activa, si nada ha cambiado desde la última ejecución completa (ni
+    # los ficheros ni la BD) se termina aquí, sin importar pandas
+    last_run = LastRun(CACHE_PATH / "last_run.json")
+    env = _fingerprint_env()
+    unchanged = args.cache and last_run.matches(_run_fingerprint(args, clientes + tarjetas, env))
+    if unchanged and (last_run.get("db_state") is None or last_run.get("db_state") != db.db_state()):
+        logger.info("Los ficheros no han cambiado, pero la BD no está como la dejó la última carga: se vuelve a cargar")
+        unchanged = False
+    if unchanged:
+        logger.info("Sin cambios desde la última ejecución completa: nada que procesar ni cargar")
+        if args.data_profile:
+            # Los datos son los mismos: se repite el perfil de esa ejecución
+            metrics.section("data_profile", last_run.get("data_profile"))
+    else:
+        last_run.clear()
+        fmt = formats.check_format(args.output_format)
+        profiles = {} if args.data_profile else None
+        ok = _run(args, logger, fmt, clientes, tarjetas, _processing_cache(args, fmt), profiles)
+        summary = None
+        if profiles is not None:
+            summary = {title: p.summary() for title, p in profiles.items()}
+            metrics.section("data_profile", summary)
+            _log_data_profile(logger, summary)
+        if ok:
+            last_run.save(_run_fingerprint(args, clientes + tarjetas, env), data_profile=summary,
+                          db_state=db.db_state())
+
+    # INFORME DE EJECUCIÓN
+    try:
+        options = {k: sorted(v) if isinstance(v, set) else str(v) for k, v in vars(args).items()}
+        report = metrics.stop().write(args.report, options=options)
+        _log_report(logger, report, args.report)
+    except Exception:
+        logger.exception("No se pudo generar el informe de ejecución")
+
+    if args.watch:
+        fmt = formats.check_format(args.output_format)
+        _watch(args, logger, fmt, _processing_cache(args, fmt), watch_done)
 
     logger.info("Fin del pipeline ETL")
 
@@ -25,3 +25,17 @@ CREATE TABLE IF NOT EXISTS public.tarjetas (
     ON UPDATE CASCADE ON DELETE CASCADE,
     PRIMARY KEY (cod_cliente, numero_tarjeta_hash)
     );
+
+CREATE TABLE IF NOT EXISTS public.etl_load_manifest (
+                                               tabla VARCHAR(20) NOT NULL,
+    archivo VARCHAR(255) NOT NULL,
+    sha256 CHAR(64) NOT NULL,
+    cargado_en TIMESTAMP NOT NULL DEFAULT now(),
+    tamano BIGINT,
+    mtime_ns BIGINT,
+    PRIMARY KEY (tabla, archivo, sha256)
+    );
+
+-- Tamaño y fecha del fichero al registrarlo: si no cambian no se vuelve a calcular el hash
+ALTER TABLE public.etl_load_manifest ADD COLUMN IF NOT EXISTS tamano BIGINT;
+ALTER TABLE public.etl_load_manifest ADD COLUMN IF NOT EXISTS mtime_ns BIGINT;
@@ -0,0 +1,22 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Los módulos se importan como en scripts/: etl desde la raíz del proyecto y los scripts por nombre
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+for path in (PROJECT_ROOT, PROJECT_ROOT / "scripts"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+
+@pytest.fixture
+def write_csv(tmp_path):
+    """Escribe `lines` (sin saltos de línea) en tmp_path/name con la codificación indicada."""
+
+    def write(name: str, lines: list[str], encoding: str = "utf-8", newline: str = "\n") -> Path:
+        path = tmp_path / name
+        path.write_bytes((newline.join(lines) + newline).encode(encoding))
+        return path
+
+    return write
@@ -0,0 +1,129 @@
+import os
+
+import pytest
+
+from etl import cache
+from etl.cache import LastRun, ProcessingCache, code_version, stat_fingerprint
+
+
+def _touch(path, seconds: int = 10):
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 1_000_000_000))
+
+
+@pytest.fixture
+def files(tmp_path):
+    raw = tmp_path / "Clientes-2025-01-01.csv"
+    raw.write_text("cod_cliente\nC001\n", encoding="utf-8")
+    out = tmp_path / "Clientes-2025-01-01.cleaned.csv"
+    out.write_text("cod_cliente\nC001\n", encoding="utf-8")
+    return raw, out
+
+
+def _stored(tmp_path, raw, out, version="v1", stats=None):
+    c = ProcessingCache(tmp_path / ".cache", version)
+    c.store(raw, c.begin(raw), out, stats or {"leidas": 1, "rechazadas": 0, "motivos": []})
+    return c
+
+
+def test_lookup_after_store_survives_reload(tmp_path, files):
+    raw, out = files
+    _stored(tmp_path, raw, out)
+
+    assert ProcessingCache(tmp_path / ".cache", "v1").lookup(raw, out) == {"leidas": 1, "rechazadas": 0, "motivos": []}
+
+
+def test_lookup_misses_on_other_version_or_changed_files(tmp_path, files):
+    raw, out = files
+    _stored(tmp_path, raw, out)
+
+    assert ProcessingCache(tmp_path / ".cache", "v2").lookup(raw, out) is None
+
+    out.write_text("cod_cliente\nC002\n", encoding="utf-8")
+    assert ProcessingCache(tmp_path / ".cache", "v1").lookup(raw, out) is None
+
+
+def test_lookup_misses_when_raw_content_changes(tmp_path, files):
+    raw, out = files
+    c = _stored(tmp_path, raw, out)
+    raw.write_text("cod_cliente\nC009\n", encoding="utf-8")
+    _touch(raw)
+
+    assert c.lookup(raw, out) is None
+
+
+def test_touched_raw_with_same_content_is_rehashed_once(tmp_path, files, monkeypatch):
+    raw, out = files
+    c = _stored(tmp_path, raw, out)
+    _touch(raw)
+    calls = []
+    sha256 = cache.file_sha256
+    monkeypatch.setattr(cache, "file_sha256", lambda p: calls.append(p) or sha256(p))
+
+    assert c.lookup(raw, out) is not None
+    assert c.lookup(raw, out) is not None
+    assert len(calls) == 1
+
+
+def test_profile_is_stored_apart_from_the_index(tmp_path, files):
+    raw, out = files
+    c = _stored(tmp_path, raw, out, stats={"leidas": 1, "perfil": {"rows": 1}})
+
+    assert "perfil" not in (tmp_path / ".cache" / "index.json").read_text(encoding="utf-8")
+    assert c.lookup(raw, out) == {"leidas": 1, "perfil": {"rows": 1}}
+
+
+def test_begin_forgets_the_entry(tmp_path, files):
+    raw, out = files
+    c = _stored(tmp_path, raw, out)
+    c.begin(raw)
+
+    assert ProcessingCache(tmp_path / ".cache", "v1").lookup(raw, out) is None
+
+
+def test_code_version_depends_on_sources_and_config(tmp_path):
+    src = tmp_path / "mod.py"
+    src.write_text("x = 1\n", encoding="utf-8")
+    v = code_version([src], {"engine": "vectorized"})
+
+    assert v == code_version([src], {"engine": "vectorized"})
+    assert v != code_version([src], {"engine": "python"})
+    src.write_text("x = 2\n", encoding="utf-8")
+    assert v != code_version([src], {"engine": "vectorized"})
+
+
+def test_stat_fingerprint(tmp_path, files):
+    raw, out = files
+    missing = tmp_path / "missing.csv"
+    fp = stat_fingerprint([raw, out, missing], {"options": {"workers": 1}})
+
+    # Solo stat: el orden de las rutas no importa y el contenido no se lee
+    assert fp == stat_fingerprint([missing, out, raw], {"options": {"workers": 1}})
+    assert fp != stat_fingerprint([raw, out, missing], {"options": {"workers": 2}})
+    _touch(raw)
+    assert fp != stat_fingerprint([raw, out, missing], {"options": {"workers": 1}})
+    touched = stat_fingerprint([raw, out, missing], {"options": {"workers": 1}})
+    missing.write_text("", encoding="utf-8")
+    assert touched != stat_fingerprint([raw, out, missing], {"options": {"workers": 1}})
+
+
+def test_last_run(tmp_path):
+    last_run = LastRun(tmp_path / ".cache" / "last_run.json")
+    assert not last_run.matches("abc")
+    assert last_run.get("db_state") is None
+
+    last_run.save("abc", db_state=[1, 2, 3, "2026-01-01"])
+    assert LastRun(last_run.path).matches("abc")
+    assert not last_run.matches("abd")
+    assert last_run.get("db_state") == [1, 2, 3, "2026-01-01"]
+
+    last_run.clear()
+    assert not last_run.matches("abc")
+    last_run.clear()
+
+
+def test_last_run_ignores_a_corrupt_file(tmp_path):
+    path = tmp_path / "last_run.json"
+    path.write_text("{no es json", encoding="utf-8")
+
+    assert not LastRun(path).matches("abc")
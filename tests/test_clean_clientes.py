@@ -0,0 +1,63 @@
+import random
+
+import pandas as pd
+import pytest
+
+from etl.clean_clientes import clean_dataframe_clientes
+from etl.settings import ENGINES
+
+TRICKY = [
+    None, "", "   ", " María ", "JOSÉ", "ana-maria", "ANA-MARÍA-", "-luis", "o'neill", "ﬁlomena",
+    "Straße", "İlkay", "Ñandú Pérez", "a  b\tc", "１２３４５６７８Ｚ", "12.345.678-z", " 8765 4321 b ",
+    "+34 612-345-678", "(91) 123 45 67", "AB", "x@EXAMPLE.Com", " Jose.Lopez@Correo.ES ", "ÇA-ÉTÉ",
+]
+
+
+def _frame(values: list) -> pd.DataFrame:
+    cols = ["cod_cliente", "nombre", "apellido1", "apellido2", "dni", "correo", "telefono"]
+    return pd.DataFrame({c: values[i:] + values[:i] for i, c in enumerate(cols)}, dtype=object)
+
+
+def _assert_engines_agree(df: pd.DataFrame):
+    python = clean_dataframe_clientes(df, engine="python")
+    vectorized = clean_dataframe_clientes(df, engine="vectorized")
+    pd.testing.assert_frame_equal(vectorized, python)
+
+
+def test_engines_agree_on_tricky_values():
+    _assert_engines_agree(_frame(TRICKY))
+
+
+def test_engines_agree_on_random_values():
+    rng = random.Random(7)
+    alphabet = "aZñÑáÉü -.\t@_+0123456789  ﬁß"
+    values = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12))) for _ in range(3000)]
+    _assert_engines_agree(_frame(values))
+
+
+def test_empty_frame():
+    _assert_engines_agree(_frame([]))
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_cleaned_values(engine):
+    df = pd.DataFrame([{
+        "cod_cliente": " C001 ", "nombre": " maría-JOSÉ ", "apellido1": "GARCÍA", "apellido2": None,
+        "dni": "12.345.678-z", "correo": " Maria@Example.COM ", "telefono": "+34 612-345-678",
+    }], dtype=object)
+
+    row = clean_dataframe_clientes(df, engine=engine).iloc[0]
+
+    assert row["cod_cliente"] == "C001"
+    assert row["nombre"] == "Maria-Jose"
+    assert row["apellido1"] == "Garcia"
+    assert pd.isna(row["apellido2"])
+    assert row["dni"] == "12345678Z"
+    assert row["dni_masked"] == "******78Z"
+    assert row["correo"] == "maria@example.com"
+    assert row["telefono"] == "34612345678"
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError, match="Motor de limpieza desconocido"):
+        clean_dataframe_clientes(_frame(TRICKY), engine="rust")
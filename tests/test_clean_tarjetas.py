@@ -0,0 +1,57 @@
+import random
+
+import pandas as pd
+import pytest
+
+from etl.clean_tarjetas import clean_tarjetas, hash_card, hash_cards
+from etl.settings import ENGINES
+
+CARDS = [
+    None, "", "  ", " 4532 1234 5678 9012 ", "5500-0000-0000-0004", "4532123456789012", "123",
+    "12", "abc", "４５３２１２３４５６７８９０１２", "4532.1234.5678.9012", "٣٣٣٣٣٣٣٣٣٣٣٣",
+]
+
+
+def _frame(cards: list) -> pd.DataFrame:
+    n = len(cards)
+    return pd.DataFrame({
+        "Cod_Cliente ": [f" C{i:03d} " for i in range(n)],
+        "numero_tarjeta": cards,
+        "fecha_exp": [" 2027-03 "] * n,
+        "cvv": ["123"] * n,
+    }, dtype=object)
+
+
+def _assert_engines_agree(df: pd.DataFrame):
+    python = clean_tarjetas(df, engine="python")
+    vectorized = clean_tarjetas(df, engine="vectorized")
+    pd.testing.assert_frame_equal(vectorized, python)
+
+
+def test_engines_agree_on_tricky_values():
+    _assert_engines_agree(_frame(CARDS))
+
+
+def test_engines_agree_on_random_values():
+    rng = random.Random(3)
+    alphabet = "0123456789 -.x٣"
+    cards = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20))) for _ in range(3000)]
+    _assert_engines_agree(_frame(cards + cards[:500]))
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_mask_and_hash(engine):
+    out = clean_tarjetas(_frame([" 4532 1234 5678 9012 ", "123", None]), engine=engine)
+
+    assert list(out.columns) == ["cod_cliente", "fecha_exp", "card_clean", "numero_tarjeta_masked",
+                                 "numero_tarjeta_hash"]
+    assert out["cod_cliente"].iloc[0] == "C000"
+    assert out["numero_tarjeta_masked"].iloc[0] == "XXXX-XXXX-XXXX-9012"
+    assert out["numero_tarjeta_hash"].iloc[0] == hash_card("4532123456789012")
+    assert pd.isna(out["numero_tarjeta_masked"].iloc[1])
+    assert out[["card_clean", "numero_tarjeta_masked", "numero_tarjeta_hash"]].iloc[2].isna().all()
+
+
+def test_hash_cards_matches_hash_card():
+    cards = ["4532123456789012", None, "4532123456789012", "", "5500000000000004"]
+    assert hash_cards(cards) == [hash_card(c) if c else None for c in cards]
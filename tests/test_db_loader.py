@@ -0,0 +1,192 @@
+import os
+
+import pandas as pd
+import pytest
+
+from etl import db_loader
+from etl.cache import file_sha256
+from etl.formats import suffix, write_frame
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    # Ficheros que se llegan a leer para calcular su hash
+    calls = []
+
+    def sha256(path):
+        calls.append(path.name)
+        return file_sha256(path)
+
+    monkeypatch.setattr(db_loader, "file_sha256", sha256)
+    return calls
+
+
+def test_file_digest_reuses_manifest_hash_when_stat_matches(write_csv, hashed):
+    f = write_csv("Tarjetas-2025-01-01.cleaned.csv", ["cod_cliente", "C001"])
+    st = f.stat()
+    known = {(f.name, st.st_size, st.st_mtime_ns): "a" * 64}
+
+    assert db_loader._file_digest(f, known) == (f, "a" * 64, st.st_size, st.st_mtime_ns)
+    assert hashed == []
+
+
+def test_file_digest_hashes_when_stat_changed(write_csv, hashed):
+    f = write_csv("Tarjetas-2025-01-01.cleaned.csv", ["cod_cliente", "C001"])
+    st = f.stat()
+    known = {(f.name, st.st_size, st.st_mtime_ns): "a" * 64}
+    os.utime(f, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    _, digest, size, mtime_ns = db_loader._file_digest(f, known)
+
+    assert digest == file_sha256(f)
+    assert (size, mtime_ns) == (st.st_size, st.st_mtime_ns + 1_000_000_000)
+    assert hashed == [f.name]
+
+
+def test_sort_tarjetas_by_date(tmp_path):
+    names = ["Tarjetas-2026-01-19.cleaned.csv", "Tarjetas-2025-11-10.cleaned.csv", "Tarjetas-2025-12-01.cleaned.csv"]
+    files = [tmp_path / n for n in names]
+
+    assert [f.name for f in db_loader._sort_tarjetas(files)] == sorted(names)
+
+
+class _FakeConn:
+    def __init__(self):
+        self.log = []
+
+    def commit(self):
+        self.log.append("commit")
+
+    def rollback(self):
+        self.log.append("rollback")
+
+
+class _FakePool:
+    # Como ThreadedConnectionPool: como mucho `maxconn` conexiones prestadas a la vez
+    def __init__(self, minconn, maxconn, **params):
+        self.maxconn = maxconn
+        self.conns = []
+        self.lent = set()
+
+    def getconn(self):
+        free = [c for c in self.conns if id(c) not in self.lent]
+        if not free:
+            assert len(self.conns) < self.maxconn, "pool agotado"
+            free = [_FakeConn()]
+            self.conns.append(free[0])
+        self.lent.add(id(free[0]))
+        return free[0]
+
+    def putconn(self, conn):
+        self.lent.remove(id(conn))
+
+    def closeall(self):
+        pass
+
+
+@pytest.fixture
+def load_pool(monkeypatch):
+    monkeypatch.setattr(db_loader, "ThreadedConnectionPool", _FakePool)
+    monkeypatch.setattr(db_loader, "conn_params", lambda: {})
+    pool = db_loader._LoadPool(3)
+    yield pool
+    pool.close()
+
+
+def test_pool_commits_all_partitions_together(load_pool):
+    results = load_pool.run(lambda conn, part: conn.log.append(part) or len(part), ["a", "bb", "ccc"])
+
+    assert results == [1, 2, 3]
+    assert sorted(log[-1] for log in (c.log for c in load_pool._pool.conns)) == ["commit"] * 3
+    assert not load_pool._pool.lent
+
+
+def test_pool_rolls_back_every_partition_if_one_fails(load_pool):
+    def load(conn, part):
+        conn.log.append(part)
+        if part == "bb":
+            raise RuntimeError("fallo en la partición")
+        return len(part)
+
+    with pytest.raises(RuntimeError, match="fallo en la partición"):
+        load_pool.run(load, ["a", "bb", "ccc"])
+
+    assert all("commit" not in c.log and c.log[-1] == "rollback" for c in load_pool._pool.conns)
+    assert not load_pool._pool.lent
+
+
+def test_partitions_keep_each_key_together_in_order():
+    df = pd.DataFrame({"cod_cliente": [f"C{i % 7:03d}" for i in range(60)], "n": range(60)})
+
+    parts = db_loader._partitions(df, "cod_cliente", 4)
+
+    assert 1 < len(parts) <= 4
+    keys = [set(p["cod_cliente"]) for p in parts]
+    assert all(not (a & b) for i, a in enumerate(keys) for b in keys[i + 1:])
+    assert all(p["n"].is_monotonic_increasing for p in parts)
+    pd.testing.assert_frame_equal(pd.concat(parts).sort_index(), df)
+
+
+def test_partitions_of_small_inputs():
+    df = pd.DataFrame({"cod_cliente": ["C001", "C002"]})
+
+    assert db_loader._partitions(df.iloc[:0], "cod_cliente", 4) == []
+    assert db_loader._partitions(df, "cod_cliente", 1)[0] is df
+
+
+def test_prefetch_keeps_order():
+    assert list(db_loader._prefetch(lambda x: x * 2, [3, 1, 2])) == [(3, 6), (1, 2), (2, 4)]
+    assert list(db_loader._prefetch(lambda x: x, [])) == []
+
+
+def _tarjetas_files(tmp_path, fmt: str) -> list:
+    # Tres días con tarjetas repetidas entre ficheros y dentro de un mismo fichero
+    files = []
+    for day in range(1, 4):
+        df = pd.DataFrame({
+            "cod_cliente": [f"C{i % 40:03d}" for i in range(100)],
+            "fecha_exp": [f"202{day}-0{1 + i % 9}" for i in range(100)],
+            "numero_tarjeta_masked": [f"XXXX-XXXX-XXXX-{i % 55:04d}" for i in range(100)],
+            "numero_tarjeta_hash": [f"h{i % 55}" for i in range(100)],
+        })
+        files.append(tmp_path / f"Tarjetas-2025-01-0{day}.cleaned{suffix(fmt)}")
+        write_frame(df, files[-1])
+    return files
+
+
+def _sorted(df: pd.DataFrame) -> pd.DataFrame:
+    return df.astype(object).sort_values(list(df.columns)).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_spilled_partitions_dedupe_like_the_in_memory_merge(tmp_path, fmt, workers):
+    files = _tarjetas_files(tmp_path, fmt)
+    spill = tmp_path / "spill"
+    spill.mkdir()
+
+    paths = db_loader._spill_tarjetas(files, 4, spill)
+    parts = list(db_loader._dedupe_partitions(paths, workers))
+
+    assert 1 < len(paths) <= 4
+    keys = [set(p["cod_cliente"]) for p in parts]
+    assert all(not (a & b) for i, a in enumerate(keys) for b in keys[i + 1:])
+    pd.testing.assert_frame_equal(_sorted(pd.concat(parts)), _sorted(db_loader._merge_tarjetas_keep_latest(files)))
+    # Cada partición se borra al deduplicarla
+    assert list(spill.iterdir()) == []
+
+
+def test_keep_first_wins_across_files(tmp_path):
+    files = _tarjetas_files(tmp_path, "csv")
+    spill = tmp_path / "spill"
+    spill.mkdir()
+
+    merged = pd.concat(db_loader._dedupe_partitions(db_loader._spill_tarjetas(files, 3, spill), 1))
+
+    # La fecha de una tarjeta repetida es la del fichero más antiguo
+    assert merged["fecha_exp"].str.startswith("2021-").all()
+
+
+def test_spill_without_files(tmp_path):
+    assert db_loader._spill_tarjetas([], 4, tmp_path) == []
+    assert list(db_loader._dedupe_partitions([], 2)) == []
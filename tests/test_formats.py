@@ -0,0 +1,105 @@
+import pandas as pd
+import pytest
+
+from etl.formats import FrameWriter, append_files, check_format, format_of, read_frame, suffix, write_frame
+from etl.settings import OUTPUT_FORMATS
+
+
+def _chunk(start: int, n: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "cod_cliente": [f"C{i:03d}" for i in range(start, start + n)],
+        "nombre": [None if i % 3 == 0 else f"Ana {i}; ñ" for i in range(start, start + n)],
+        "DNI_OK": pd.array([i % 2 == 0 for i in range(start, start + n)], dtype="boolean"),
+    })
+
+
+def _expected(*chunks) -> pd.DataFrame:
+    df = pd.concat(chunks, ignore_index=True)
+    df["DNI_OK"] = df["DNI_OK"].map({True: "Y", False: "N"}).astype(object)
+    return df.astype(object)
+
+
+def _read(path) -> pd.DataFrame:
+    # Nulos como None en los tres formatos (CSV devuelve NaN)
+    df = read_frame(path).astype(object)
+    return df.where(df.notna(), None)
+
+
+@pytest.mark.parametrize("fmt", OUTPUT_FORMATS)
+def test_frame_writer_round_trip(tmp_path, fmt):
+    path = tmp_path / f"out{suffix(fmt)}"
+    with FrameWriter(path, fmt) as writer:
+        writer.write(_chunk(0, 5))
+        writer.write(_chunk(5, 4))
+
+    pd.testing.assert_frame_equal(_read(path), _expected(_chunk(0, 5), _chunk(5, 4)))
+
+
+@pytest.mark.parametrize("fmt", OUTPUT_FORMATS)
+def test_write_frame_matches_frame_writer(tmp_path, fmt):
+    a, b = tmp_path / f"a{suffix(fmt)}", tmp_path / f"b{suffix(fmt)}"
+    write_frame(_chunk(0, 6), a)
+    with FrameWriter(b, fmt) as writer:
+        writer.write(_chunk(0, 6))
+
+    pd.testing.assert_frame_equal(_read(a), _read(b))
+
+
+@pytest.mark.parametrize("fmt", OUTPUT_FORMATS)
+def test_write_file_concatenates_in_order(tmp_path, fmt):
+    parts = []
+    for i, chunk in enumerate((_chunk(0, 3), _chunk(3, 2), _chunk(5, 4))):
+        parts.append(tmp_path / f"part{i}{suffix(fmt)}")
+        write_frame(chunk, parts[-1])
+
+    out = tmp_path / f"all{suffix(fmt)}"
+    with FrameWriter(out, fmt) as writer:
+        for part in parts:
+            writer.write_file(part)
+
+    pd.testing.assert_frame_equal(_read(out), _expected(_chunk(0, 3), _chunk(3, 2), _chunk(5, 4)))
+
+
+@pytest.mark.parametrize("fmt", OUTPUT_FORMATS)
+def test_append_files_to_existing_file(tmp_path, fmt):
+    dst = tmp_path / f"dst{suffix(fmt)}"
+    write_frame(_chunk(0, 2), dst)
+    srcs = [tmp_path / f"src{i}{suffix(fmt)}" for i in range(2)]
+    write_frame(_chunk(2, 3), srcs[0])
+    write_frame(_chunk(5, 1), srcs[1])
+
+    append_files(srcs, dst)
+
+    pd.testing.assert_frame_equal(_read(dst), _expected(_chunk(0, 2), _chunk(2, 3), _chunk(5, 1)))
+
+
+@pytest.mark.parametrize("fmt", OUTPUT_FORMATS)
+def test_append_files_creates_missing_file(tmp_path, fmt):
+    dst = tmp_path / f"dst{suffix(fmt)}"
+    src = tmp_path / f"src{suffix(fmt)}"
+    write_frame(_chunk(0, 3), src)
+
+    append_files([src], dst)
+
+    pd.testing.assert_frame_equal(_read(dst), _expected(_chunk(0, 3)))
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+def test_failed_append_leaves_file_unchanged(tmp_path, fmt):
+    dst = tmp_path / f"dst{suffix(fmt)}"
+    write_frame(_chunk(0, 2), dst)
+    before = dst.read_bytes()
+
+    with pytest.raises(OSError):
+        append_files([tmp_path / f"missing{suffix(fmt)}"], dst)
+
+    assert dst.read_bytes() == before
+    assert list(tmp_path.iterdir()) == [dst]
+
+
+def test_format_names():
+    assert format_of("x/Clientes.cleaned.PARQUET") == "parquet"
+    with pytest.raises(ValueError):
+        format_of("x.json")
+    with pytest.raises(ValueError, match="Formato de salida desconocido"):
+        check_format("json")
@@ -0,0 +1,145 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl.profiling import ColumnProfile, FrameProfile, FrequentValues, HyperLogLog
+
+
+def _hashes(values) -> np.ndarray:
+    return pd.util.hash_array(np.asarray(values, dtype=object), categorize=False)
+
+
+def _zipf(n: int, seed: int = 1) -> np.ndarray:
+    # Muchos valores raros y unos pocos muy frecuentes
+    return np.random.default_rng(seed).zipf(1.3, n).astype(str).astype(object)
+
+
+@pytest.mark.parametrize("n", [10, 1000, 200_000])
+def test_hll_estimate_is_close(n):
+    hll = HyperLogLog()
+    hll.add(_hashes([f"v{i}" for i in range(n)]))
+
+    assert abs(hll.estimate() - n) <= max(1, 0.05 * n)
+
+
+def test_hll_merge_equals_single_pass():
+    values = [f"v{i % 30_000}" for i in range(50_000)]
+    whole, a, b = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    whole.add(_hashes(values))
+    a.add(_hashes(values[:20_000]))
+    b.add(_hashes(values[20_000:]))
+    a.merge(b)
+
+    assert np.array_equal(a.registers, whole.registers)
+    assert a.estimate() == whole.estimate()
+
+
+def _counts(values: np.ndarray):
+    uniques, counts = np.unique(values, return_counts=True)
+    return uniques.astype(object), counts.astype(np.int64)
+
+
+def _check_misra_gries(summary: FrequentValues, values: np.ndarray):
+    true = pd.Series(values).value_counts()
+    # Cotas: recuento - error <= estimado <= recuento, y error <= N / (capacidad + 1)
+    assert summary.error <= len(values) / (summary.capacity + 1)
+    for value, count in summary.counts.items():
+        assert true[value] - summary.error <= count <= true[value]
+    # Un valor que supera N / (capacidad + 1) está siempre en el resumen
+    heavy = true[true > len(values) / (summary.capacity + 1)].index
+    assert set(heavy) <= set(summary.counts.index)
+
+
+def test_misra_gries_bounds_in_one_block():
+    values = _zipf(50_000)
+    summary = FrequentValues(capacity=32)
+    summary.add(*_counts(values))
+
+    assert len(summary.counts) <= 32
+    _check_misra_gries(summary, values)
+
+
+def test_misra_gries_merge_of_blocks_keeps_bounds():
+    values = _zipf(60_000, seed=2)
+    merged = FrequentValues(capacity=32)
+    for block in np.array_split(values, 7):
+        part = FrequentValues(capacity=32)
+        part.add(*_counts(block))
+        merged.merge(part)
+
+    assert len(merged.counts) <= 32
+    _check_misra_gries(merged, values)
+
+
+def test_misra_gries_is_exact_below_capacity():
+    values = np.array(["a"] * 5 + ["b"] * 3 + ["c"], dtype=object)
+    summary = FrequentValues(capacity=8)
+    summary.add(*_counts(values))
+
+    assert summary.error == 0
+    assert summary.top(2) == [("a", 5), ("b", 3)]
+
+
+def _column(n: int, seed: int = 3) -> pd.Series:
+    values = _zipf(n, seed).astype(object)
+    values[::13] = None
+    return pd.Series(values, dtype=object)
+
+
+def test_column_profile_merge_of_chunks_equals_whole():
+    col = _column(30_000)
+    whole = ColumnProfile()
+    whole.update(col)
+    merged = ColumnProfile()
+    for start in range(0, len(col), 7_000):
+        part = ColumnProfile()
+        part.update(col.iloc[start:start + 7_000])
+        merged.merge(part)
+
+    a, b = whole.summary(), merged.summary()
+    for key in ("rows", "nulls", "null_rate", "distinct_approx", "lengths"):
+        assert a[key] == b[key]
+    assert a["nulls"] == col.isna().sum()
+
+
+def test_state_round_trip_through_json():
+    profile = FrameProfile(files=1)
+    profile.update(pd.DataFrame({"cod_cliente": _column(5_000), "dni": _column(5_000, seed=4)}))
+
+    restored = FrameProfile.from_state(json.loads(json.dumps(profile.to_state())))
+
+    assert restored.summary() == profile.summary()
+
+
+def test_frame_profile_merge_counts_files_and_columns():
+    a, b = FrameProfile(files=1), FrameProfile(files=1)
+    a.update(pd.DataFrame({"cod_cliente": ["C001", None]}))
+    b.update(pd.DataFrame({"cod_cliente": ["C001"], "fecha_exp": ["2027-03"]}))
+    a.merge(b)
+
+    summary = a.summary()
+    assert summary["files"] == 2
+    assert summary["columns"]["cod_cliente"]["rows"] == 3
+    assert summary["columns"]["cod_cliente"]["top_k"] == [{"value": "C001", "count": 2}]
+    assert summary["columns"]["fecha_exp"]["rows"] == 1
+
+
+def test_sensitive_columns_only_keep_shapes():
+    df = pd.DataFrame({
+        "nombre": ["Ana", "Eva", "Ñoño", "Ana"],
+        "dni": ["12345678Z", "87654321X", "12345678Z", None],
+        "cod_cliente": ["C001", "C002", "C003", "C004"],
+    })
+    profile = FrameProfile(files=1)
+    profile.update(df)
+
+    text = json.dumps([profile.to_state(), profile.summary()], ensure_ascii=False)
+    for value in ("Ana", "Eva", "Ñoño", "12345678Z", "87654321X"):
+        assert value not in text
+    columns = profile.summary()["columns"]
+    assert columns["nombre"]["top_k"] == [{"value": "XXX", "count": 3}, {"value": "XXXX", "count": 1}]
+    assert columns["dni"]["top_k"] == [{"value": "99999999X", "count": 3}]
+    assert columns["dni"]["distinct_approx"] == 2
+    assert {"value": "C001", "count": 1} in columns["cod_cliente"]["top_k"]
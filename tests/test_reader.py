@@ -0,0 +1,183 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl import reader
+from etl.reader import iter_csv_chunks, read_csv_safe
+
+CLIENTES = ["cod cliente;nombre;apellido1;apellido2;dni;correo;telefono"] + [
+    f"C{i:03d}; Nombre{i} ;Apellido;;{10000000 + i}A;n{i}@example.com;6{i:08d}" for i in range(1, 26)
+] + ["C026;NULL;n/a; none ;;;"]
+
+
+def _concat(chunks) -> pd.DataFrame:
+    return pd.concat(list(chunks), ignore_index=True)
+
+
+@pytest.mark.parametrize("quoted", [False, True])
+@pytest.mark.parametrize("chunksize", [1, 7, 100])
+def test_chunks_equal_full_read(write_csv, quoted, chunksize):
+    lines = [f'"{line}"' for line in CLIENTES] if quoted else CLIENTES
+    path = write_csv("Clientes-2025-01-01.csv", lines)
+
+    chunks = list(iter_csv_chunks(path, chunksize=chunksize))
+
+    assert all(len(c) <= chunksize for c in chunks)
+    pd.testing.assert_frame_equal(_concat(chunks), read_csv_safe(path))
+
+
+def test_chunks_normalize_columns_and_nulls(write_csv):
+    path = write_csv("Clientes-2025-01-01.csv", CLIENTES)
+
+    df = _concat(iter_csv_chunks(path, chunksize=10))
+
+    assert df.columns[0] == "cod_cliente"
+    assert df.iloc[-1][["nombre", "apellido1", "apellido2", "dni"]].isna().all()
+    # Los valores que no son nulos se devuelven sin strip
+    assert df.iloc[0]["nombre"] == " Nombre1 "
+
+
+def test_header_only_gives_no_rows(write_csv):
+    path = write_csv("Clientes-2025-01-01.csv", CLIENTES[:1])
+
+    assert len(_concat(iter_csv_chunks(path, chunksize=10))) == 0
+    assert len(read_csv_safe(path)) == 0
+
+
+@pytest.mark.parametrize(
+    "encoding, expected",
+    [("utf-8-sig", "utf-8-sig"), ("utf-8", "utf-8-sig"), ("cp1252", "cp1252")],
+)
+def test_sniff_encoding(write_csv, encoding, expected):
+    # Sin BOM, utf-8-sig decodifica igual que utf-8 y es la primera opción
+    path = write_csv("Clientes-2025-01-01.csv", ["cod_cliente;nombre", "C001;Álvaro Muñoz"], encoding=encoding)
+
+    assert reader._sniff(path)[0] == expected
+    assert read_csv_safe(path)["nombre"].tolist() == ["Álvaro Muñoz"]
+
+
+@pytest.mark.parametrize(
+    "header, dialect",
+    [
+        ("cod_cliente;nombre", reader.DIALECT_PLAIN),
+        ('"cod_cliente;nombre"', reader.DIALECT_QUOTED),
+        ('cod_cliente;"nombre; completo"', reader.DIALECT_PLAIN),
+    ],
+)
+def test_sniff_dialect(write_csv, header, dialect):
+    path = write_csv("Clientes-2025-01-01.csv", [header, "C001;Ana"])
+
+    assert reader._sniff(path)[1] == dialect
+
+
+def test_sniff_prefix_cuts_multibyte_character(write_csv, monkeypatch):
+    # Un carácter de 2 bytes partido al final del prefijo no descarta utf-8
+    monkeypatch.setattr(reader, "_SNIFF_BYTES", len("cod_cliente;nombre\nC001;") + 1)
+    path = write_csv("Clientes-2025-01-01.csv", ["cod_cliente;nombre", "C001;Ñandú"])
+
+    assert reader._sniff(path)[0] == "utf-8-sig"
+
+
+def test_encoding_error_after_prefix_retries_next_encoding(write_csv, monkeypatch):
+    # El prefijo es ASCII; el resto solo decodifica como cp1252: se parsea otra vez
+    monkeypatch.setattr(reader, "_SNIFF_BYTES", 64)
+    lines = ["cod_cliente;nombre"] + [f"C{i:03d};Ana" for i in range(20)] + ["C999;Peña"]
+    path = write_csv("Clientes-2025-01-01.csv", lines, encoding="cp1252")
+
+    assert reader._sniff(path)[0] == "utf-8-sig"
+    assert read_csv_safe(path)["nombre"].iloc[-1] == "Peña"
+    assert pd.concat(iter_csv_chunks(path, chunksize=5))["nombre"].iloc[-1] == "Peña"
+
+
+def _mapped_text(path, encoding: str, size: int) -> str:
+    out = []
+    with reader._MappedUnquotedLines(path, encoding) as f:
+        while block := f.read(size):
+            out.append(block)
+    return b"".join(out).decode(f.encoding)
+
+
+def _unquoted_text(path, encoding: str) -> str:
+    with open(path, "r", encoding=encoding, newline=None) as f:
+        return reader._UnquotedLines(f).read()
+
+
+QUOTED = ['"cod_cliente;nombre"'] + [f'"C{i:03d};Ñandú {i}"' for i in range(300)]
+IRREGULAR = QUOTED[:150] + ['  "C900;con espacios"  ', "C901;sin comillas", '"C902;cr\rsuelto"', ""] + QUOTED[150:]
+
+
+@pytest.mark.parametrize("lines", [QUOTED, IRREGULAR], ids=["quoted", "irregular"])
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+@pytest.mark.parametrize("encoding", ["utf-8-sig", "cp1252"])
+@pytest.mark.parametrize("block", [64, 1 << 20])
+def test_mapped_lines_match_line_by_line_unquoting(write_csv, monkeypatch, lines, newline, encoding, block):
+    # Bloques pequeños: unos pasan por la máscara de numpy y otros por el camino línea a línea
+    monkeypatch.setattr(reader, "_BLOCK_BYTES", block)
+    path = write_csv("Clientes-2025-01-01.csv", lines, encoding=encoding, newline=newline)
+
+    # Mismas líneas; el camino de numpy conserva los \r\n y la falta de salto final
+    assert _mapped_text(path, encoding, 16).splitlines() == _unquoted_text(path, encoding).splitlines()
+
+
+def test_mapped_lines_without_final_newline_and_empty_file(tmp_path):
+    path = tmp_path / "Clientes-2025-01-01.csv"
+    path.write_bytes(b'"a;b"\n"1;2"')
+    assert _mapped_text(path, "utf-8", -1) == "a;b\n1;2"
+
+    path.write_bytes(b"")
+    assert _mapped_text(path, "utf-8", -1) == ""
+
+
+@pytest.mark.parametrize("block", [64, 1 << 20])
+def test_quoted_file_reads_like_plain_file(write_csv, monkeypatch, block):
+    monkeypatch.setattr(reader, "_BLOCK_BYTES", block)
+    plain = write_csv("Clientes-2025-01-01.csv", CLIENTES)
+    quoted = write_csv("Clientes-2025-01-02.csv", [f'"{line}"' for line in CLIENTES], newline="\r\n")
+
+    pd.testing.assert_frame_equal(read_csv_safe(quoted), read_csv_safe(plain))
+
+
+NULL_LIKE = [
+    None, np.nan, "", " ", "\t", "null", " NULL ", "None", "nan", "NaN", "na", "N/A", " n/a\t", " null ",
+    "\u3000", "nulls", "nada", "0", "C001", " Ana ", "n/a/b", " Ana", "Ana ", "\x0bna\x0b", "\x1cnull",
+]
+
+
+def _assert_like_map(values: list):
+    col = pd.Series(values, dtype=object)
+    got = reader._normalize_nulls(col)
+    expected = col.map(reader._norm)
+
+    assert got.dtype == object
+    assert [None if pd.isna(v) else v for v in got] == [None if pd.isna(v) else v for v in expected]
+    # Los no nulos se devuelven tal cual, sin strip
+    assert all(g is None or g == v for g, v in zip(got, values))
+
+
+def test_normalize_nulls_matches_row_by_row():
+    _assert_like_map(NULL_LIKE)
+
+
+def test_normalize_nulls_on_random_values():
+    rng = random.Random(11)
+    alphabet = ["n", "u", "l", "N", "a", "/", " ", "\t", " ", " ", "x", "é"]
+    _assert_like_map(["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 7))) for _ in range(5000)])
+
+
+def test_normalize_nulls_edge_columns():
+    _assert_like_map([])
+    _assert_like_map([None, np.nan])
+    _assert_like_map(["null"] * 3)
+
+
+def test_read_normalizes_nulls_and_repeated_columns(write_csv):
+    path = write_csv("Clientes-2025-01-01.csv", ["\ufeffcod cliente ; a ;a;b", "C001;NULL; x ;n/a", "C002;;None;ok"])
+
+    df = read_csv_safe(path)
+
+    assert list(df.columns) == ["cod_cliente", "a", "a", "b"]
+    assert df.iloc[:, 1].tolist() == [None, None]
+    assert df.iloc[:, 2].tolist() == [" x ", None]
+    assert df["b"].tolist() == [None, "ok"]
@@ -0,0 +1,157 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import etl.metrics as metrics
+from etl import rules
+from etl.rules import FieldRules, RuleSet, effective_rules
+from etl.vector_utils import STR_DTYPE
+
+RULE_SPECS = [
+    {"regex": r"\s*\d{3}[A-Z]\s*"},
+    {"regex": r"[^\s@]+@[^\s@]+"},
+    {"regex": r"[]a-z]+"},
+    {"longitud": {"min": 3, "max": 6}},
+    {"rango": {"min": -5, "max": 100}},
+    {"fecha": {"formato": "%Y-%m", "min": "2000-01", "max": "2030-12"}},
+    {"fecha": {"formato": "%d/%m/%Y"}},
+    {"luhn": True},
+    {"letra_dni": True},
+]
+
+
+def _values(seed: int, n: int = 4000) -> list[str]:
+    rng = random.Random(seed)
+    alphabet = "0123456789AZaz]@-./ \t\x0b\x1c"
+    values = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 11))) for _ in range(n)]
+    return values + [
+        "2024-02", "1999-12", "2031-01", "2024-13", "29/02/2024", "29/02/2023", "31/04/2024", "7", "-5", "1e2",
+        "nan", " 12 ", "4532015112830366", "4532015112830367", "12345678Z", "12.345.678-z", "123A", " 123A\x0b",
+    ]
+
+
+@pytest.mark.parametrize("spec", RULE_SPECS, ids=lambda s: next(iter(s)))
+def test_column_check_matches_check_value(spec):
+    # check() (ASCII, .str/Arrow) contra check_value() (re de Python, la semántica de referencia)
+    rule = rules._build_rule(spec, set())
+    values = _values(len(str(spec)))
+
+    got = rule.check(pd.Series(values, dtype=STR_DTYPE))
+
+    assert got.tolist() == [rule.check_value(v) for v in values]
+
+
+def test_field_check_matches_check_value_with_non_ascii_and_nulls():
+    field = FieldRules("clientes", "dni", {
+        "normalizar": ["strip", "upper", {"quitar": r"[\s.\-]"}],
+        "reglas": [{"regex": r"\d{8}[A-Z]"}, {"letra_dni": True}],
+    })
+    values = _values(1) + ["١٢٣٤٥٦٧٨Z", "12345678ẞ", " 12345678Z ", "12345678z"]
+    col = pd.Series(values + [None, np.nan], dtype=object)
+
+    got = field.check(col)
+
+    assert got.tolist() == [field.check_value(v) for v in values] + [False, False]
+    assert got[values.index("12345678z")]
+
+
+def test_each_rule_only_sees_values_that_passed_the_previous_ones():
+    field = FieldRules("tarjetas", "card_clean", {"reglas": [{"regex": r"\d+"}, {"longitud": {"min": 12}}]})
+    col = pd.Series(["4532015112830366"] * 3 + ["123"] * 2 + ["abc", None], dtype=object)
+
+    metrics.start()
+    try:
+        assert field.check(col).tolist() == [True] * 3 + [False] * 4
+    finally:
+        report = metrics.stop()
+    counts = {r["stage"]: (r["rows_in"], r["rows_out"]) for r in report.records()}
+
+    assert counts["rule:tarjetas.card_clean.regex"] == (7, 5)
+    assert counts["rule:tarjetas.card_clean.longitud"] == (5, 3)
+
+
+def test_all_null_column():
+    field = FieldRules("tarjetas", "cod_cliente", {"reglas": [{"regex": "C\\d{3}"}]})
+    assert field.check(pd.Series([None, None], dtype=object)).tolist() == [False, False]
+
+
+def test_ascii_pattern():
+    assert rules._ascii_pattern(r"\s+") == f"[{rules.ASCII_SPACE}]+"
+    assert rules._ascii_pattern(r"[\s,]") == f"[{rules.ASCII_SPACE},]"
+    assert rules._ascii_pattern(r"[^]\s]") == f"[^]{rules.ASCII_SPACE}]"
+    with pytest.raises(ValueError):
+        rules._ascii_pattern(r"[\S]")
+
+
+def test_rule_names_and_invalid_specs():
+    field = FieldRules("clientes", "correo", {"reglas": [
+        {"regex": "a.*"}, {"regex": ".*z"}, {"longitud": {"max": 5}, "nombre": "corto"},
+    ]})
+    assert [r.name for r in field.rules] == ["regex", "regex2", "corto"]
+
+    with pytest.raises(ValueError, match="Regla no válida"):
+        FieldRules("clientes", "correo", {"reglas": [{"regex": "a", "luhn": True}]})
+    with pytest.raises(ValueError, match="normalización no válida"):
+        FieldRules("clientes", "correo", {"normalizar": ["title"]})
+    with pytest.raises(ValueError, match="Formato de fecha no soportado"):
+        FieldRules("tarjetas", "fecha_exp", {"reglas": [{"fecha": {"formato": "%m"}}]})
+
+
+def test_effective_rules_from_config(tmp_path):
+    config = tmp_path / "config.yaml"
+    config.write_text(
+        "validacion:\n"
+        "  clientes:\n"
+        "    telefono:\n"
+        "      reglas:\n"
+        "        - regex: '[67]\\d{8}'\n",
+        encoding="utf-8",
+    )
+
+    soft = effective_rules(config, "soft")
+    assert soft["clientes"]["telefono"] == {"reglas": [{"regex": r"[67]\d{8}"}]}
+    assert soft["clientes"]["dni"] == rules.DEFAULT_RULES["clientes"]["dni"]
+
+    strict = effective_rules(config, "strict")
+    assert strict["clientes"]["dni"]["reglas"][-1] == {"letra_dni": True}
+    assert strict["tarjetas"]["card_clean"]["reglas"][-1] == {"luhn": True}
+
+    checker = RuleSet("clientes", soft["clientes"])
+    assert checker.check("telefono", pd.Series(["612345678", "912345678"])).tolist() == [True, False]
+
+
+def test_strict_does_not_repeat_a_rule_already_in_config(tmp_path):
+    config = tmp_path / "config.yaml"
+    config.write_text(
+        "validacion:\n  tarjetas:\n    card_clean:\n      reglas:\n        - luhn: true\n          nombre: luhn_cfg\n",
+        encoding="utf-8",
+    )
+
+    assert effective_rules(config, "strict")["tarjetas"]["card_clean"]["reglas"] == [
+        {"luhn": True, "nombre": "luhn_cfg"},
+    ]
+
+
+@pytest.mark.parametrize("text, message", [
+    ("validacion:\n  cuentas: {}\n", "tipo desconocido"),
+    ("validacion:\n  clientes:\n    nombre: {}\n", "campo sin validación"),
+])
+def test_effective_rules_rejects_unknown_sections(tmp_path, text, message):
+    config = tmp_path / "config.yaml"
+    config.write_text(text, encoding="utf-8")
+
+    with pytest.raises(ValueError, match=message):
+        effective_rules(config)
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError, match="Modo de validación desconocido"):
+        rules.check_mode("estricto")
+
+
+def test_config_yaml_matches_default_rules(tmp_path):
+    # config.yaml documenta las reglas por defecto: deben ser las mismas
+    for mode in ("soft", "strict"):
+        assert effective_rules(rules.CONFIG_FILE, mode) == effective_rules(tmp_path / "missing.yaml", mode)
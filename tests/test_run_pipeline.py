@@ -0,0 +1,51 @@
+import logging
+
+import pytest
+
+import run_pipeline
+
+CLIENTES = ["cod cliente;nombre;apellido1;apellido2;dni;correo;telefono"]
+TARJETAS = ["cod_cliente;numero_tarjeta;fecha_exp;cvv"]
+
+
+@pytest.fixture
+def raw_files(write_csv):
+    files = []
+    for day in range(1, 4):
+        clientes = CLIENTES + [
+            f"C{day}{i:02d};Ana{i};Pérez;;{10000000 + i}Z;ana{i}@example.com;{600000000 + i}" for i in range(20)
+        ] + [f"C{day}99;Sin;Dni;;X;mal;1"]
+        tarjetas = TARJETAS + [f"C{day}{i:02d};4532 0151 1283 {i:04d};2027-0{1 + i % 9};123" for i in range(20)]
+        tarjetas += [f"X{day};12;2027-13;1"]
+        files.append(write_csv(f"Clientes-2025-01-0{day}.csv", clientes))
+        files.append(write_csv(f"Tarjetas-2025-01-0{day}.csv", tarjetas))
+    return [f for f in files if f.name.startswith("Clientes")], [f for f in files if f.name.startswith("Tarjetas")]
+
+
+def _run(tmp_path, monkeypatch, raw_files, name: str, workers: int, chunksize: int = 0, fmt: str = "csv"):
+    out, errors_dir = tmp_path / name / "output", tmp_path / name / "errors"
+    out.mkdir(parents=True)
+    errors_dir.mkdir()
+    monkeypatch.setattr(run_pipeline, "OUTPUT_PATH", out)
+    monkeypatch.setattr(run_pipeline, "ERRORS_PATH", errors_dir)
+
+    tasks = run_pipeline._tasks(*raw_files, "vectorized", "soft")
+    logger = logging.getLogger(f"test.{name}")
+    if workers > 1:
+        rejected = run_pipeline._run_parallel(tasks, logger, workers, chunksize, fmt=fmt)
+    else:
+        rejected = run_pipeline._run_sequential(tasks, logger, chunksize, fmt=fmt)
+    contents = {p.relative_to(tmp_path / name).as_posix(): p.read_bytes()
+                for p in sorted((tmp_path / name).rglob("*")) if p.is_file()}
+    return rejected, contents
+
+
+@pytest.mark.parametrize("chunksize, fmt", [(0, "csv"), (7, "csv"), (7, "parquet")])
+def test_workers_write_the_same_files_as_sequential(tmp_path, monkeypatch, raw_files, chunksize, fmt):
+    sequential = _run(tmp_path, monkeypatch, raw_files, "sequential", 1, chunksize, fmt)
+    parallel = _run(tmp_path, monkeypatch, raw_files, "parallel", 3, chunksize, fmt)
+
+    assert sequential[0] == parallel[0] == {"CLIENTES": 3, "TARJETAS": 3}
+    assert sorted(sequential[1]) == sorted(parallel[1])
+    assert sequential[1] == parallel[1]
+    assert f"errors/Clientes.rows_rejected.{fmt}" in parallel[1]
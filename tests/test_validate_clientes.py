@@ -0,0 +1,64 @@
+import random
+
+import pandas as pd
+import pytest
+
+from etl.settings import VALIDATION_MODES
+from etl.validate_clientes import is_valid_dni, is_valid_email, is_valid_phone, validate_clientes
+
+DNIS = ["12345678Z", " 12.345.678-z ", "12345678", "1234567Z", "١٢٣٤٥٦٧٨Z", "12345678 Z", None, ""]
+PHONES = ["612345678", "612 345 678", "+34 612345678", "61234567", "٦١٢٣٤٥٦٧٨", None, ""]
+EMAILS = ["ana@example.com", " ANA@Example.COM ", "ana@example", "a@b@c.es", "ñ@ñ.es", None, ""]
+
+
+def _frame(n: int, seed: int = 5) -> pd.DataFrame:
+    rng = random.Random(seed)
+    rows = [{
+        "cod_cliente": f"C{i:03d}",
+        "dni": rng.choice(DNIS),
+        "telefono": rng.choice(PHONES),
+        "correo": rng.choice(EMAILS),
+    } for i in range(n)]
+    return pd.DataFrame(rows, dtype=object)
+
+
+@pytest.mark.parametrize("mode", VALIDATION_MODES)
+def test_columns_agree_with_single_value_validators(mode):
+    # La validación por columna (valores distintos, .str) contra la de un solo valor (re)
+    df = _frame(500)
+    valid, errors = validate_clientes(df, mode=mode)
+    rejected = pd.concat(errors) if errors else df.iloc[:0]
+
+    expected = pd.DataFrame({
+        "DNI_OK": [is_valid_dni(v, mode) for v in df["dni"].astype(str)],
+        "Telefono_OK": [is_valid_phone(v, mode) for v in df["telefono"].astype(str)],
+        "Correo_OK": [is_valid_email(v, mode) for v in df["correo"].astype(str)],
+    })
+    ok = expected.all(axis=1)
+    assert ok.any() and not ok.all()
+
+    assert valid["cod_cliente"].tolist() == df["cod_cliente"][ok].tolist()
+    assert rejected["cod_cliente"].tolist() == df["cod_cliente"][~ok].tolist()
+    for col in expected.columns:
+        assert rejected[col].astype(bool).tolist() == expected[col][~ok].tolist()
+        assert valid[col].all()
+
+
+def test_rejection_reasons():
+    df = pd.DataFrame([
+        {"cod_cliente": "C001", "dni": "12345678Z", "telefono": "612345678", "correo": "a@b.es"},
+        {"cod_cliente": "C002", "dni": "X", "telefono": "612345678", "correo": "a@b.es"},
+        {"cod_cliente": "C003", "dni": "X", "telefono": "6", "correo": "ab.es"},
+    ], dtype=object)
+
+    valid, errors = validate_clientes(df, mode="soft")
+
+    assert valid["dni"].tolist() == ["******78Z"]
+    assert errors[0]["error_detalle"].tolist() == ["dni_invalido", "dni_invalido|telefono_invalido|correo_invalido"]
+    assert (errors[0]["origen"] == "CLIENTES").all()
+
+
+def test_strict_checks_dni_letter():
+    assert is_valid_dni("12345678A", "soft")
+    assert not is_valid_dni("12345678A", "strict")
+    assert is_valid_dni("12345678Z", "strict")
@@ -0,0 +1,65 @@
+import random
+
+import pandas as pd
+import pytest
+
+from etl.settings import VALIDATION_MODES
+from etl.validate_tarjetas import is_valid_card, is_valid_cod_cliente, is_valid_fecha_exp, validate_tarjetas
+
+CODES = ["C001", " C002 ", "C01", "c003", "C0004", "C٠٠٥", None, ""]
+DATES = ["2027-03", " 2027-12 ", "2027-13", "2027-00", "1899-12", "2101-01", "2027-3", "٢٠٢٧-٠٣", None]
+CARDS = ["4532015112830366", "4532015112830367", "453201511283", "45320151128", "4532 0151", "٤٥٣٢٠١٥١١٢٨٣٠٣٦٦",
+         None, ""]
+
+
+def _frame(n: int, seed: int = 9) -> pd.DataFrame:
+    rng = random.Random(seed)
+    rows = [{
+        "cod_cliente": rng.choice(CODES),
+        "fecha_exp": rng.choice(DATES),
+        "card_clean": rng.choice(CARDS),
+        "numero_tarjeta_masked": None,
+        "numero_tarjeta_hash": f"h{i}",
+    } for i in range(n)]
+    return pd.DataFrame(rows, dtype=object)
+
+
+@pytest.mark.parametrize("mode", VALIDATION_MODES)
+def test_columns_agree_with_single_value_validators(mode):
+    df = _frame(500)
+    valid, errors = validate_tarjetas(df, mode=mode)
+    rejected = pd.concat(errors) if errors else df.iloc[:0]
+
+    expected = pd.DataFrame({
+        "CodCliente_OK": [is_valid_cod_cliente(v, mode) for v in df["cod_cliente"]],
+        "FechaExp_OK": [is_valid_fecha_exp(v, mode) for v in df["fecha_exp"]],
+        "Tarjeta_OK": [is_valid_card(v, mode) for v in df["card_clean"]],
+    })
+    ok = expected.all(axis=1)
+    assert ok.any() and not ok.all()
+
+    assert valid["numero_tarjeta_hash"].tolist() == df["numero_tarjeta_hash"][ok].tolist()
+    assert rejected["numero_tarjeta_hash"].tolist() == df["numero_tarjeta_hash"][~ok].tolist()
+    for col in expected.columns:
+        assert rejected[col].astype(bool).tolist() == expected[col][~ok].tolist()
+
+
+def test_rejection_reasons():
+    df = pd.DataFrame(
+        [["C001", "2027-03", "4532015112830366", None, "h0"],
+         ["X", "2027-13", "4532015112830366", None, "h1"],
+         ["C001", "2027-03", "123", None, "h2"]],
+        columns=["cod_cliente", "fecha_exp", "card_clean", "numero_tarjeta_masked", "numero_tarjeta_hash"],
+        dtype=object,
+    )
+
+    valid, errors = validate_tarjetas(df, mode="soft")
+
+    assert valid["numero_tarjeta_hash"].tolist() == ["h0"]
+    assert errors[0]["error_detalle"].tolist() == ["cod_cliente_invalido|fecha_exp_invalida", "tarjeta_invalida"]
+
+
+def test_strict_checks_luhn():
+    assert is_valid_card("4532015112830367", "soft")
+    assert not is_valid_card("4532015112830367", "strict")
+    assert is_valid_card("4532015112830366", "strict")